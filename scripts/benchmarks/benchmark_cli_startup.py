@@ -0,0 +1,169 @@
+"""
+Times `planning-data <command> --help` for every command in a fresh interpreter and
+fails if one takes too long or loads a heavy dependency before the command runs.
+
+`--help` never reaches the imports each command makes when it runs, so the modules a
+command imports are also loaded in a fresh interpreter after the CLI, with
+`python -X importtime`, to show what the command costs on first use and which
+packages take longest.
+
+    python scripts/benchmarks/benchmark_cli_startup.py [--repeat 5] [--max-seconds 0.5]
+"""
+
+import argparse
+import ast
+import inspect
+import json
+import subprocess
+import sys
+import textwrap
+
+from planning_data_analysis.cli import cli
+
+# Modules that only the commands themselves should load
+HEAVY_MODULES = {
+    "docx",
+    "geopandas",
+    "joblib",
+    "matplotlib",
+    "numpy",
+    "pandas",
+    "pdfplumber",
+    "playwright",
+    "pyarrow",
+    "pyogrio",
+    "pyproj",
+    "requests",
+    "shapely",
+    "sklearn",
+}
+
+# Run in the child interpreter: time the import and the help output, then report
+# which heavy modules were loaded along the way
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+from planning_data_analysis.cli import cli
+try:
+    cli(sys.argv[2:], standalone_mode=False)
+except SystemExit:
+    pass
+seconds = time.perf_counter() - started
+heavy = sorted({name.split(".")[0] for name in sys.modules} & set(sys.argv[1].split(",")))
+print(json.dumps({"seconds": seconds, "heavy": heavy}))
+"""
+
+
+# Run in the child interpreter: load the CLI, then time importing the modules a command
+# imports when it runs
+IMPORT_CHILD = """
+import importlib, json, sys, time
+import planning_data_analysis.cli
+started = time.perf_counter()
+for module in sys.argv[1:]:
+    importlib.import_module(module)
+print(json.dumps({"seconds": time.perf_counter() - started}))
+"""
+
+
+def command_imports(command):
+    """Returns the modules a command's callback imports inside its body."""
+    source = textwrap.dedent(inspect.getsource(command.callback))
+    modules = []
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.ImportFrom) and node.module:
+            modules.append(node.module)
+        elif isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+    return sorted(set(modules))
+
+
+def slowest_imports(stderr, top=3):
+    """
+    Returns the packages that took longest to import, adding up the self time of
+    every module in each package from `-X importtime` output.
+    """
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_time, _, name = line[len("import time:") :].split("|")
+        if self_time.strip().isdigit():
+            package = name.strip().split(".")[0]
+            times[package] = times.get(package, 0) + int(self_time)
+    ranked = sorted(times.items(), key=lambda item: -item[1])[:top]
+    return [f"{package} {micros / 1e6:.2f} s" for package, micros in ranked]
+
+
+def time_imports(modules, repeat):
+    """
+    Returns the fastest of `repeat` first-use imports of `modules` after the CLI, and
+    the slowest packages from one more run under `-X importtime`, which slows the
+    imports it reports on.
+    """
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_CHILD, *modules],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1])["seconds"])
+    profile = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_CHILD, *modules],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return min(runs), slowest_imports(profile.stderr)
+
+
+def time_help(args, repeat):
+    """Returns the fastest of `repeat` runs and the heavy modules they loaded."""
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD, ",".join(sorted(HEAVY_MODULES)), *args],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return min(run["seconds"] for run in runs), runs[0]["heavy"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=0.5)
+    args = parser.parse_args()
+
+    failures = []
+    for command in [None, *sorted(cli.commands)]:
+        name = command or "(group)"
+        seconds, heavy = time_help(
+            [command, "--help"] if command else ["--help"], args.repeat
+        )
+        print(f"{name:<22} {seconds:6.3f} s  {', '.join(heavy) or '-'}")
+        if seconds > args.max_seconds:
+            failures.append(f"{name} took {seconds:.3f} s")
+        if heavy:
+            failures.append(f"{name} imported {', '.join(heavy)}")
+
+    print("\nFirst use, imports each command makes when it runs:")
+    for command in sorted(cli.commands):
+        modules = command_imports(cli.commands[command])
+        if not modules:
+            print(f"{command:<22} {0:6.3f} s  -")
+            continue
+        seconds, slowest = time_imports(modules, args.repeat)
+        print(f"{command:<22} {seconds:6.3f} s  {', '.join(slowest) or '-'}")
+
+    if failures:
+        print("\n".join(["", *failures]))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
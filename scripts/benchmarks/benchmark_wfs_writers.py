@@ -0,0 +1,140 @@
+"""
+Times the collect-wfs writers on synthetic polygon layers and reports seconds per
+million features written.
+
+    python scripts/benchmarks/benchmark_wfs_writers.py [--features 1000000]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import geopandas as gpd
+import numpy as np
+import pyarrow as pa
+import pyogrio
+import shapely
+
+from planning_data_analysis.geo_writers import LayerWriter, layer_output, write_layer
+
+HABITATS = np.array(["woodland", "grassland", "heath", "wetland", "arable", "urban"])
+
+
+def synthetic_batches(features, batch_size):
+    """Builds record batches of square polygons laid out on a grid, like a WFS page."""
+    index = np.arange(features)
+    x = 400000 + (index % 1000) * 100.0
+    y = 100000 + (index // 1000) * 100.0
+    geometries = shapely.box(x - 20, y - 20, x + 20, y + 20)
+    table = pa.table(
+        {
+            "id": pa.array([f"layer.{i}" for i in index]),
+            "fid": pa.array(index, pa.int32()),
+            "habitat": pa.array(HABITATS[index % len(HABITATS)]),
+            "area_ha": pa.array(0.16 + (index % 97) / 1000),
+            "wkb_geometry": pa.array(shapely.to_wkb(geometries)),
+        }
+    )
+    return table.to_batches(max_chunksize=batch_size)
+
+
+def write_per_batch_geopandas(batches, output_file):
+    """The writer before streaming: GeoDataFrame.to_file per batch, appending."""
+    for i, batch in enumerate(batches):
+        data = gpd.GeoDataFrame(
+            batch.drop_columns(["wkb_geometry"]).to_pandas(),
+            geometry=shapely.from_wkb(batch.column("wkb_geometry").to_numpy(False)),
+            crs="EPSG:3067",
+        )
+        data.to_file(
+            output_file,
+            driver="GPKG",
+            mode="a" if i else "w",
+            layer_options={"FID": "gpkg_fid"},
+        )
+
+
+def write_per_batch_arrow(batches, output_file):
+    """One pyogrio.write_arrow call, and so one transaction, per batch."""
+    for i, batch in enumerate(batches):
+        pyogrio.write_arrow(
+            batch,
+            output_file,
+            driver="GPKG",
+            geometry_name="wkb_geometry",
+            geometry_type="Polygon",
+            crs="EPSG:3067",
+            append=i > 0,
+            layer_options={"FID": "gpkg_fid"},
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--features", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=20000)
+    parser.add_argument("--page-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    batches = synthetic_batches(args.features, args.batch_size)
+    pages = synthetic_batches(args.features, args.page_size)
+    meta = {"geometry_name": "wkb_geometry", "geometry_type": "Polygon"}
+    millions = args.features / 1e6
+
+    with tempfile.TemporaryDirectory() as output_dir:
+
+        def streamed(writer, layer_name="bench:layer"):
+            output_file, layer = layer_output(output_dir, layer_name, writer)
+            write_layer(
+                ((meta, batch) for batch in batches), output_file, layer, "EPSG:3067"
+            )
+
+        def paged(writer):
+            """Commits a page at a time, as collect-wfs does when paging."""
+            output_file, layer = layer_output(output_dir, "bench:paged", writer)
+            with LayerWriter(output_file, layer, "EPSG:3067") as layer_writer:
+                for page in pages:
+                    layer_writer.write([(meta, page)])
+
+        # (name, setup that is not timed, write that is timed)
+        cases = [
+            (
+                "geopandas to_file per batch",
+                None,
+                lambda: write_per_batch_geopandas(
+                    batches, os.path.join(output_dir, "geopandas.gpkg")
+                ),
+            ),
+            (
+                "write_arrow per batch",
+                None,
+                lambda: write_per_batch_arrow(
+                    batches, os.path.join(output_dir, "arrow.gpkg")
+                ),
+            ),
+            ("gpkg", None, lambda: streamed("gpkg")),
+            (
+                "single-gpkg (second layer)",
+                lambda: streamed("single-gpkg", "bench:first"),
+                lambda: streamed("single-gpkg"),
+            ),
+            ("parquet", None, lambda: streamed("parquet")),
+            ("gpkg per page", None, lambda: paged("gpkg")),
+            ("parquet per page", None, lambda: paged("parquet")),
+        ]
+        print(
+            f"{args.features} features in batches of {args.batch_size}, "
+            f"pages of {args.page_size}"
+        )
+        for name, setup, write in cases:
+            if setup:
+                setup()
+            started = time.perf_counter()
+            write()
+            seconds = time.perf_counter() - started
+            print(f"{name:<28} {seconds / millions:7.2f} s per million features")
+
+
+if __name__ == "__main__":
+    main()
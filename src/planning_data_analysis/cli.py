@@ -1,13 +1,15 @@
 import click
+from click.core import ParameterSource
 
-from planning_data_analysis.cil_process import process_and_save
-from planning_data_analysis.cluster_analysis import analyze_clusters
-from planning_data_analysis.collect_plan_data import collect_plan_data
-from planning_data_analysis.eda_report import generate_eda_report
-from planning_data_analysis.extract import extract_table
-from planning_data_analysis.utils import save_to_csv
-from planning_data_analysis.validators import validate_pdf, validate_url
-from planning_data_analysis.wfs_collect import collect_wfs_layers
+# Command modules pull in geopandas, scikit-learn, playwright and the like, so each
+# command imports its own only when it runs. `--help` and the other commands then
+# start without loading them. scripts/benchmarks/benchmark_cli_startup.py checks this.
+from planning_data_analysis.validators import (
+    validate_crs,
+    validate_k,
+    validate_pdf,
+    validate_url,
+)
 
 
 @click.group()
@@ -33,6 +35,9 @@ def extract_from_file_command(pdf_path, table_index, output_folder, key_words):
     """
     CLI wrapper around planning_data_analysis.extract_pdf_tables.extract from pdf file
     """
+    from planning_data_analysis.extract import extract_table
+    from planning_data_analysis.utils import save_to_csv
+
     tables = extract_table(pdf_path, table_index, from_file=True, key_words=key_words)
     if tables:
         save_to_csv(tables, output_folder)
@@ -51,6 +56,9 @@ def extract_from_web_command(url, table_index, output_folder, key_words):
     """
     CLI wrapper around planning_data_analysis.extract_pdf_tables.extract from web page
     """
+    from planning_data_analysis.extract import extract_table
+    from planning_data_analysis.utils import save_to_csv
+
     tables = extract_table(url, table_index, from_web=True, key_words=key_words)
     if tables:
         save_to_csv(tables, output_folder)
@@ -82,6 +90,8 @@ def collect_plan_data_command(input_csv, reference_csv, output_path, failed_urls
     """
     Collect plan data from URLs and save to CSV.
     """
+    from planning_data_analysis.collect_plan_data import collect_plan_data
+
     collect_plan_data(input_csv, reference_csv, output_path, failed_urls_path)
 
 
@@ -108,6 +118,8 @@ def process_cil_command(input_csv, reference_csv, output_dir):
     """
     Process Community Infrastructure Levy (CIL) data and save separate datasets for CIL and IFS.
     """
+    from planning_data_analysis.cil_process import process_and_save
+
     process_and_save(input_csv, reference_csv, output_dir)
 
 
@@ -124,11 +136,123 @@ def process_cil_command(input_csv, reference_csv, output_dir):
     default="output_clusters",
     help="Directory to save output files",
 )
-def analyze_clusters_command(input_csv, output_dir):
+@click.option(
+    "--k",
+    "n_clusters",
+    default="10",
+    show_default=True,
+    callback=validate_k,
+    help="Number of KMeans clusters, a range 'min:max' to sweep in parallel, or 'auto' (2:20).",
+)
+@click.option(
+    "--dedup",
+    "dedup",
+    is_flag=True,
+    default=False,
+    help="Collapse exact and near-duplicate reasons before vectorising and clustering.",
+)
+@click.option(
+    "--dedup-threshold",
+    "dedup_threshold",
+    default=0.8,
+    show_default=True,
+    type=click.FloatRange(0, 1),
+    help="Minimum estimated similarity for two reasons to count as near-duplicates.",
+)
+@click.option(
+    "--embed",
+    "embed",
+    type=click.Choice(["exact", "fast"]),
+    default="exact",
+    show_default=True,
+    help="TSNE on every reason, or on a stratified sample with the rest interpolated.",
+)
+@click.option(
+    "--streaming",
+    "streaming",
+    is_flag=True,
+    default=False,
+    help="Read the CSV in chunks and cluster out of core, for inputs too large for memory.",
+)
+@click.option(
+    "--chunksize",
+    "chunksize",
+    default=50000,
+    show_default=True,
+    help="Number of CSV rows read per chunk in streaming mode.",
+)
+def analyze_clusters_command(
+    input_csv,
+    output_dir,
+    n_clusters,
+    dedup,
+    dedup_threshold,
+    embed,
+    streaming,
+    chunksize,
+):
     """
     Analyze clusters in invalid application reasons and generate visualizations and reports.
     """
-    analyze_clusters(input_csv, output_dir)
+    if streaming and (
+        click.get_current_context().get_parameter_source("embed")
+        is not ParameterSource.DEFAULT
+    ):
+        raise click.UsageError(
+            "--embed cannot be used with --streaming, which produces no TSNE plot."
+        )
+
+    from planning_data_analysis.cluster_analysis import (
+        analyze_clusters,
+        analyze_clusters_streaming,
+    )
+
+    if streaming:
+        analyze_clusters_streaming(
+            input_csv,
+            output_dir,
+            n_clusters=n_clusters,
+            chunksize=chunksize,
+            dedup=dedup,
+            dedup_threshold=dedup_threshold,
+        )
+    else:
+        analyze_clusters(
+            input_csv,
+            output_dir,
+            n_clusters=n_clusters,
+            dedup=dedup,
+            dedup_threshold=dedup_threshold,
+            embed=embed,
+        )
+
+
+@cli.command(name="classify-reasons")
+@click.option(
+    "--model",
+    "model_path",
+    required=True,
+    help="Path to the cluster_model.joblib file saved by analyze-clusters",
+)
+@click.option(
+    "--input",
+    "input_csv",
+    required=True,
+    help="Path to input CSV file containing invalid application reasons",
+)
+@click.option(
+    "--output",
+    "output_csv",
+    default="classified_reasons.csv",
+    help="Path to save the classified reasons CSV",
+)
+def classify_reasons_command(model_path, input_csv, output_csv):
+    """
+    Assign themes and clusters to new invalid application reasons using a saved model.
+    """
+    from planning_data_analysis.cluster_analysis import classify_reasons
+
+    classify_reasons(model_path, input_csv, output_csv)
 
 
 @cli.command(name="generate-eda-report")
@@ -150,11 +274,143 @@ def analyze_clusters_command(input_csv, output_dir):
     default="output_eda",
     help="Directory to save reports and visualizations",
 )
-def generate_eda_report_command(dataset, input_dir, output_dir):
+@click.option(
+    "--render-concurrency",
+    "render_concurrency",
+    default=4,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Maximum number of maps rendered at the same time in the shared browser.",
+)
+@click.option(
+    "--renderer",
+    "renderer",
+    type=click.Choice(["browser", "static"]),
+    default="browser",
+    show_default=True,
+    help="Screenshot folium maps in headless Chromium, or draw static PNGs offline.",
+)
+@click.option(
+    "--overview",
+    "overview",
+    is_flag=True,
+    default=False,
+    help="Add a rasterised density map of every feature in each layer to the report.",
+)
+@click.option(
+    "--batch-size",
+    "batch_size",
+    default=100000,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of features read at a time when streaming a layer.",
+)
+@click.option(
+    "--summary",
+    "summary",
+    type=click.Choice(["full", "metadata"]),
+    default="full",
+    show_default=True,
+    help="Load each layer in full, or summarise it from layer metadata and sample rows.",
+)
+@click.option(
+    "--profile",
+    "profile",
+    is_flag=True,
+    default=False,
+    help="Profile every column in batches and write the profile to the report and JSON.",
+)
+@click.option(
+    "--workers",
+    "workers",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of processes analysing files in parallel.",
+)
+@click.option(
+    "--incremental",
+    "incremental",
+    is_flag=True,
+    default=False,
+    help="Only analyse files that are new or changed since the last run.",
+)
+@click.option(
+    "--recursive",
+    "recursive",
+    is_flag=True,
+    default=False,
+    help="Include geospatial files in nested folders of the input directory.",
+)
+@click.option(
+    "--per-file-reports",
+    "per_file_reports",
+    is_flag=True,
+    default=False,
+    help="Also save a separate report for each file alongside the merged report.",
+)
+@click.option(
+    "--geometry-checks",
+    "geometry_checks",
+    is_flag=True,
+    default=False,
+    help="Report invalid, empty, duplicate and overlapping geometries in each layer.",
+)
+@click.option(
+    "--sample-method",
+    "sample_method",
+    type=click.Choice(["head", "reservoir", "stratified"]),
+    default="head",
+    show_default=True,
+    help="Sample the first rows, a uniform random sample, or a stratified sample.",
+)
+@click.option(
+    "--sample-column",
+    "sample_column",
+    default=None,
+    help="Column to stratify the sample by (default: geometry type).",
+)
+def generate_eda_report_command(
+    dataset,
+    input_dir,
+    output_dir,
+    render_concurrency,
+    renderer,
+    overview,
+    batch_size,
+    summary,
+    profile,
+    workers,
+    incremental,
+    recursive,
+    per_file_reports,
+    geometry_checks,
+    sample_method,
+    sample_column,
+):
     """
     Generate an exploratory data analysis report for geospatial data.
     """
-    generate_eda_report(dataset, input_dir, output_dir)
+    from planning_data_analysis.eda_report import generate_eda_report
+
+    generate_eda_report(
+        dataset,
+        input_dir,
+        output_dir,
+        render_concurrency=render_concurrency,
+        renderer=renderer,
+        overview=overview,
+        batch_size=batch_size,
+        summary=summary,
+        profile=profile,
+        workers=workers,
+        incremental=incremental,
+        recursive=recursive,
+        per_file_reports=per_file_reports,
+        geometry_checks=geometry_checks,
+        sample_method=sample_method,
+        sample_column=sample_column,
+    )
 
 
 @cli.command(name="collect-wfs")
@@ -176,13 +432,122 @@ def generate_eda_report_command(dataset, input_dir, output_dir):
     default="output_wfs",
     help="Directory to save the output GeoPackage files",
 )
-def collect_wfs_command(capabilities_url, wfs_url, output_dir):
+@click.option(
+    "--page-size",
+    "page_size",
+    default=10000,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of features per GetFeature request.",
+)
+@click.option(
+    "--workers",
+    "workers",
+    default=4,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Maximum number of pages downloaded at the same time for each layer.",
+)
+@click.option(
+    "--parallel-layers",
+    "parallel_layers",
+    default=2,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Maximum number of layers harvested at the same time, largest first.",
+)
+@click.option(
+    "--max-requests",
+    "max_requests",
+    default=8,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Maximum number of requests in flight across all layers.",
+)
+@click.option(
+    "--max-host-requests",
+    "max_host_requests",
+    default=4,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Maximum number of requests in flight to one host.",
+)
+@click.option(
+    "--batch-size",
+    "batch_size",
+    default=20000,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of features parsed and written to the GeoPackage at a time.",
+)
+@click.option(
+    "--restart",
+    "restart",
+    is_flag=True,
+    default=False,
+    help="Ignore the checkpoint from earlier runs and download every layer again.",
+)
+@click.option(
+    "--tiling",
+    "tiling",
+    type=click.Choice(["auto", "always", "never"]),
+    default="auto",
+    show_default=True,
+    help="When to fetch layers in BBOX tiles: 'auto' when the server cannot page them.",
+)
+@click.option(
+    "--writer",
+    "writer",
+    # geo_writers.OUTPUT_WRITERS, listed here so --help does not import pyarrow
+    type=click.Choice(["gpkg", "single-gpkg", "parquet"]),
+    default="gpkg",
+    show_default=True,
+    help="Save a GeoPackage per layer, one GeoPackage with every layer, or GeoParquet.",
+)
+@click.option(
+    "--target-crs",
+    "target_crs",
+    default=None,
+    callback=validate_crs,
+    help="Reproject every layer to this CRS, e.g. EPSG:27700. Defaults to each layer's own.",
+)
+def collect_wfs_command(
+    capabilities_url,
+    wfs_url,
+    output_dir,
+    page_size,
+    workers,
+    parallel_layers,
+    max_requests,
+    max_host_requests,
+    batch_size,
+    restart,
+    tiling,
+    writer,
+    target_crs,
+):
     """
     Collect data from all available WFS layers and save as GeoPackage files.
     The default URLs point to the CASI and LiDAR habitat map service, but these can be overridden
     to collect data from other WFS services.
     """
-    collect_wfs_layers(capabilities_url, wfs_url, output_dir)
+    from planning_data_analysis.wfs_collect import collect_wfs_layers
+
+    collect_wfs_layers(
+        capabilities_url,
+        wfs_url,
+        output_dir,
+        page_size=page_size,
+        workers=workers,
+        parallel_layers=parallel_layers,
+        max_requests=max_requests,
+        max_host_requests=max_host_requests,
+        batch_size=batch_size,
+        resume=not restart,
+        tiling=tiling,
+        writer=writer,
+        target_crs=target_crs,
+    )
 
 
 if __name__ == "__main__":
@@ -1,16 +1,587 @@
 import os
 import re
+import time
+import zlib
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import repeat
 
+import joblib
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 from docx import Document
-from sklearn.cluster import KMeans
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
 from sklearn.manifold import TSNE
+from sklearn.metrics import silhouette_score
+from sklearn.neighbors import NearestNeighbors
+from threadpoolctl import threadpool_limits
 
+REASON_COLUMN = "Invalid Reason Details"
 
-def analyze_clusters(input_csv, output_dir):
+MODEL_FILE = "cluster_model.joblib"
+MODEL_FORMAT_VERSION = 1
+
+# Themes for clustering with more granular categories for Missing Documents
+THEMES = {
+    "Incorrect Fee": r"(fee|payment|underpayment|overpayment)",
+    "Missing Plans": r"(site plan|floor plan|elevation)",
+    "Missing Reports": r"(report|statement|assessment|survey)",
+    "Missing Forms": r"(form|certificate|ownership)",
+    "Validation Checklist": r"(checklist|validation|requirement)",
+    "Missing Details": r"(details|clarify|information)",
+    "Missing Drawings": r"(drawing|design|sketch|diagram)",
+    "Other": r".*",
+}
+
+# Incorrect Fee reasons matching this are split out as underpayments
+UNDERPAYMENT_PATTERN = r"insufficient|further fee"
+
+# Fee amounts, reference numbers and other figures that vary between templated reasons
+NUMBER_PATTERN = re.compile(r"[£$]?\d[\d,]*(?:\.\d+)?")
+
+# Plots with more points than this are drawn as density bins rather than a scatter
+DENSITY_PLOT_THRESHOLD = 50000
+
+# Modulus for the MinHash permutations, small enough that hash * a fits in uint64
+MINHASH_PRIME = (1 << 31) - 1
+
+
+def classify_theme(reason, themes=THEMES, underpayment_pattern=UNDERPAYMENT_PATTERN):
+    """
+    Return the theme for a single reason, splitting "Incorrect Fee" into
+    "Incorrect Fee - Underpayment" and "Incorrect Fee - Other".
+    """
+    for theme, pattern in themes.items():
+        if re.search(pattern, reason, re.IGNORECASE):
+            break
+    if theme == "Incorrect Fee":
+        if re.search(underpayment_pattern, reason, re.IGNORECASE):
+            return "Incorrect Fee - Underpayment"
+        return "Incorrect Fee - Other"
+    return theme
+
+
+def normalise_reason(reason):
+    """Lower-cases a reason, replaces numbers with a placeholder and collapses whitespace."""
+    return " ".join(NUMBER_PATTERN.sub(" 0 ", reason.lower()).split())
+
+
+def minhash_signatures(texts, num_perm=64, shingle_size=3, seed=42):
+    """
+    Computes MinHash signatures over word shingles for each text.
+
+    Returns:
+    -------
+    numpy.ndarray
+        Array of shape (len(texts), num_perm)
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MINHASH_PRIME, num_perm, dtype=np.uint64)
+    b = rng.integers(0, MINHASH_PRIME, num_perm, dtype=np.uint64)
+
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint64)
+    for row, text in enumerate(texts):
+        words = text.split() or [""]
+        shingles = {
+            " ".join(words[start : start + shingle_size])
+            for start in range(max(1, len(words) - shingle_size + 1))
+        }
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode()) for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        signatures[row] = ((hashes[:, None] * a + b) % MINHASH_PRIME).min(axis=0)
+    return signatures
+
+
+def collapse_duplicates(reasons, threshold=0.8, num_perm=64, bands=16):
+    """
+    Groups exact and near-duplicate reasons so the expensive steps run once per group.
+
+    Reasons are first normalised with normalise_reason and exact matches merged. The
+    remaining unique texts are grouped with MinHash locality-sensitive hashing: texts
+    sharing any band of their signature are candidates, and are merged when their
+    estimated Jaccard similarity is at least `threshold`.
+
+    Parameters:
+    ----------
+    reasons : list of str
+        Invalid reasons, one per row
+    threshold : float
+        Minimum estimated Jaccard similarity of word shingles to merge two reasons
+    num_perm : int
+        Number of MinHash permutations
+    bands : int
+        Number of LSH bands, must divide `num_perm`
+
+    Returns:
+    -------
+    tuple
+        (representatives, weights, row_group): the normalised representative text of each
+        group, the number of rows in each group, and the group index of every input row
+    """
+    codes, unique_texts = pd.factorize(
+        pd.Series([normalise_reason(reason) for reason in reasons])
+    )
+    unique_counts = np.bincount(codes, minlength=len(unique_texts))
+
+    signatures = minhash_signatures(unique_texts, num_perm=num_perm)
+    parent = np.arange(len(unique_texts))
+
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    rows_per_band = num_perm // bands
+    for band in range(bands):
+        columns = slice(band * rows_per_band, (band + 1) * rows_per_band)
+        buckets = defaultdict(list)
+        for index, key in enumerate(map(bytes, signatures[:, columns])):
+            buckets[key].append(index)
+        for members in buckets.values():
+            first = members[0]
+            for other in members[1:]:
+                similarity = np.mean(signatures[first] == signatures[other])
+                if similarity >= threshold:
+                    parent[find(other)] = find(first)
+
+    roots = np.array([find(index) for index in range(len(unique_texts))])
+    # Most frequent text in each group is its representative
+    order = np.argsort(-unique_counts, kind="stable")
+    group_roots, first_seen = np.unique(roots[order], return_index=True)
+    group_of_root = dict(zip(group_roots, range(len(group_roots))))
+    unique_group = np.array([group_of_root[root] for root in roots])
+
+    representatives = [unique_texts[order[position]] for position in first_seen]
+    weights = np.bincount(unique_group, weights=unique_counts).astype(int)
+    row_group = unique_group[codes]
+    return representatives, weights, row_group
+
+
+def reduce_dimensions(tfidf_matrix, n_components=50, random_state=42):
+    """
+    Reduce a sparse TF-IDF matrix to a small dense embedding for TSNE.
+
+    TruncatedSVD works on the sparse matrix directly, so the full
+    n x vocabulary matrix is never densified.
+
+    Parameters:
+    ----------
+    tfidf_matrix : scipy.sparse matrix
+        TF-IDF features, one row per reason
+    n_components : int
+        Number of SVD components to keep
+    random_state : int
+        Seed for the randomised SVD solver
+
+    Returns:
+    -------
+    numpy.ndarray
+        Dense array of shape (n_rows, n_components)
+    """
+    n_components = min(n_components, tfidf_matrix.shape[1] - 1)
+    if n_components < 2:
+        # Vocabulary too small for SVD, the matrix is tiny so densify it
+        return tfidf_matrix.toarray()
+
+    svd = TruncatedSVD(n_components=n_components, random_state=random_state)
+    return svd.fit_transform(tfidf_matrix)
+
+
+def assign_clusters(matrix, centroids):
+    """
+    Assign each row of a (sparse) feature matrix to its nearest centroid.
+
+    Uses ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2, where ||x||^2 is the same for every
+    centroid, so the assignment is one sparse matrix multiply and an argmin.
+
+    Parameters:
+    ----------
+    matrix : scipy.sparse matrix
+        Features for each reason, from the model's vectoriser
+    centroids : numpy.ndarray
+        Cluster centroids of shape (n_clusters, n_features)
+
+    Returns:
+    -------
+    numpy.ndarray
+        Cluster index for each row
+    """
+    distances = np.asarray(matrix @ centroids.T) * -2 + (centroids**2).sum(axis=1)
+    return distances.argmin(axis=1)
+
+
+def save_cluster_model(output_dir, vectorizer, centroids, normalise=False):
+    """
+    Save the fitted vectoriser, cluster centroids and theme rules as a versioned model
+    artifact that classify_reasons can load.
+
+    Parameters:
+    ----------
+    output_dir : str
+        Directory to save the model file
+    vectorizer : sklearn vectoriser
+        Fitted TfidfVectorizer or HashingVectorizer
+    centroids : numpy.ndarray
+        Cluster centroids in the vectoriser's feature space
+    normalise : bool
+        Whether reasons were passed through normalise_reason before vectorising
+
+    Returns:
+    -------
+    str
+        Path to the saved model
+    """
+    model = {
+        "format_version": MODEL_FORMAT_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "vectorizer": vectorizer,
+        "centroids": np.asarray(centroids),
+        "themes": dict(THEMES),
+        "underpayment_pattern": UNDERPAYMENT_PATTERN,
+        "normalise": normalise,
+    }
+    model_path = os.path.join(output_dir, MODEL_FILE)
+    joblib.dump(model, model_path)
+    return model_path
+
+
+def load_cluster_model(model_path):
+    """Loads a model artifact saved by save_cluster_model and checks its version."""
+    model = joblib.load(model_path)
+    version = model.get("format_version")
+    if version != MODEL_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported cluster model version {version} in '{model_path}', "
+            f"expected {MODEL_FORMAT_VERSION}. Re-run analyze-clusters to rebuild it."
+        )
+    return model
+
+
+def predict_clusters(model, reasons):
+    """Assigns raw reasons to the clusters of a loaded model, as classify_reasons does."""
+    if model.get("normalise"):
+        reasons = [normalise_reason(reason) for reason in reasons]
+    return assign_clusters(model["vectorizer"].transform(reasons), model["centroids"])
+
+
+def check_saved_model(model_path, reasons, refit_clusters):
+    """
+    Loads a saved model back from disk, classifies every reason with it as
+    classify_reasons would, and prints how many labels match a fresh refit.
+
+    Parameters:
+    ----------
+    model_path : str
+        Path to the model file saved by save_cluster_model
+    reasons : list of str
+        Raw invalid reasons, one per row
+    refit_clusters : numpy.ndarray
+        Cluster of each row from KMeans refitted on the same features with the same
+        seed, so its cluster numbers are the ones the saved centroids should have
+
+    Returns:
+    -------
+    int
+        Number of reasons the saved model labels the same as the refit
+    """
+    model_clusters = predict_clusters(load_cluster_model(model_path), reasons)
+    matches = int((model_clusters == refit_clusters).sum())
+    print(f"Saved model matches a fresh refit on {matches}/{len(reasons)} reasons.")
+    if matches != len(reasons):
+        print("Warning: saved model labels differ from a fresh refit.")
+    return matches
+
+
+def embed_tsne(embedding, random_state=42):
+    """Embeds every row in two dimensions with TSNE."""
+    if embedding.shape[0] < 2:
+        # TSNE needs a perplexity below the number of rows, so a single row (e.g. after
+        # collapsing duplicates) is placed at the origin
+        return np.zeros((embedding.shape[0], 2))
+    perplexity = min(30, embedding.shape[0] - 1)
+    tsne = TSNE(n_components=2, random_state=random_state, perplexity=perplexity)
+    return tsne.fit_transform(embedding)
+
+
+def embed_fast(embedding, clusters, sample_size=5000, n_neighbors=5, random_state=42):
+    """
+    Approximates a TSNE embedding for large inputs.
+
+    TSNE runs on a sample stratified by cluster, with each cluster sampled in proportion
+    to its size. Every other row is placed at the distance-weighted mean position of its
+    nearest sampled neighbours in the SVD embedding.
+
+    Parameters:
+    ----------
+    embedding : numpy.ndarray
+        Dense reduced features for each row, from reduce_dimensions
+    clusters : numpy.ndarray
+        KMeans cluster for each row
+    sample_size : int
+        Approximate number of rows to run TSNE on
+    n_neighbors : int
+        Number of sampled neighbours used to place each remaining row
+    random_state : int
+        Seed for the sample and TSNE
+
+    Returns:
+    -------
+    numpy.ndarray
+        Two-dimensional coordinates of shape (n_rows, 2)
+    """
+    n_rows = embedding.shape[0]
+    if n_rows <= sample_size:
+        return embed_tsne(embedding, random_state)
+
+    rng = np.random.default_rng(random_state)
+    sample_rows = []
+    for cluster in np.unique(clusters):
+        rows = np.flatnonzero(clusters == cluster)
+        quota = max(n_neighbors, round(sample_size * len(rows) / n_rows))
+        sample_rows.append(rng.choice(rows, min(quota, len(rows)), replace=False))
+    sample_rows = np.sort(np.concatenate(sample_rows))
+
+    coordinates = np.empty((n_rows, 2))
+    coordinates[sample_rows] = embed_tsne(embedding[sample_rows], random_state)
+
+    remaining_rows = np.setdiff1d(np.arange(n_rows), sample_rows)
+    neighbours = NearestNeighbors(n_neighbors=n_neighbors).fit(embedding[sample_rows])
+    distances, indices = neighbours.kneighbors(embedding[remaining_rows])
+    neighbour_weights = 1 / (distances + 1e-9)
+    neighbour_weights /= neighbour_weights.sum(axis=1, keepdims=True)
+    coordinates[remaining_rows] = np.einsum(
+        "ij,ijk->ik", neighbour_weights, coordinates[sample_rows][indices]
+    )
+    return coordinates
+
+
+def plot_clusters(coordinates, clusters, weights, n_clusters, plot_path, bins=200):
+    """
+    Plots the two-dimensional embedding coloured by cluster and saves it as a PNG.
+
+    Up to DENSITY_PLOT_THRESHOLD points are drawn as a scatter with each point sized by
+    the number of reasons it represents. Above that the points are binned into a grid:
+    each bin takes the colour of its most common cluster and an opacity from its density.
+    """
+    cmap = plt.get_cmap("tab10" if n_clusters <= 10 else "tab20")
+    norm = plt.Normalize(-0.5, n_clusters - 0.5)
+
+    plt.figure(figsize=(10, 8))
+    if len(coordinates) <= DENSITY_PLOT_THRESHOLD:
+        mappable = plt.scatter(
+            coordinates[:, 0],
+            coordinates[:, 1],
+            s=36 * np.sqrt(weights),
+            c=clusters,
+            cmap=cmap,
+            norm=norm,
+            alpha=0.7,
+        )
+    else:
+        x_edges = np.linspace(
+            coordinates[:, 0].min(), coordinates[:, 0].max(), bins + 1
+        )
+        y_edges = np.linspace(
+            coordinates[:, 1].min(), coordinates[:, 1].max(), bins + 1
+        )
+        counts = np.stack(
+            [
+                np.histogram2d(
+                    coordinates[clusters == cluster, 0],
+                    coordinates[clusters == cluster, 1],
+                    bins=(x_edges, y_edges),
+                    weights=weights[clusters == cluster],
+                )[0]
+                for cluster in range(n_clusters)
+            ]
+        )
+        density = np.log1p(counts.sum(axis=0))
+        image = cmap(norm(counts.argmax(axis=0)))
+        # Any occupied bin stays visible, denser bins are more opaque
+        image[..., 3] = np.where(density > 0, 0.3 + 0.7 * density / density.max(), 0)
+        plt.imshow(
+            image.transpose(1, 0, 2),
+            origin="lower",
+            extent=(x_edges[0], x_edges[-1], y_edges[0], y_edges[-1]),
+            aspect="auto",
+            interpolation="nearest",
+        )
+        mappable = plt.cm.ScalarMappable(norm=norm, cmap=cmap)
+
+    plt.colorbar(mappable, ax=plt.gca(), ticks=range(n_clusters), label="Clusters")
+    plt.title("TSNE Visualization of Clusters")
+    plt.xlabel("TSNE Dimension 1")
+    plt.ylabel("TSNE Dimension 2")
+    plt.savefig(plot_path)
+    plt.close()
+
+
+def score_k(sample, k, random_state=42):
+    """
+    Fit KMeans with `k` clusters on a sample and score it.
+
+    Runs in a worker process, so BLAS/OpenMP threads are limited to one to avoid
+    oversubscribing the cores shared with other workers.
+
+    Returns:
+    -------
+    dict
+        k, inertia, silhouette score and fit time in seconds
+    """
+    start = time.perf_counter()
+    with threadpool_limits(limits=1):
+        kmeans = KMeans(n_clusters=k, random_state=random_state)
+        labels = kmeans.fit_predict(sample)
+        silhouette = (
+            silhouette_score(sample, labels) if len(set(labels)) > 1 else float("nan")
+        )
+    return {
+        "k": k,
+        "inertia": kmeans.inertia_,
+        "silhouette": silhouette,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def select_k(matrix, k_min, k_max, output_dir, sample_size=5000, workers=None):
+    """
+    Sweep candidate numbers of clusters in parallel and pick the best by silhouette score.
+
+    Each candidate is fitted and scored on the same fixed random sample of rows so the sweep
+    stays cheap for large inputs. The sweep curve and per-k timings are written to
+    `k_sweep.csv` and `k_sweep.png` in the output directory.
+
+    Parameters:
+    ----------
+    matrix : scipy.sparse matrix
+        Features for each reason
+    k_min, k_max : int
+        Inclusive range of k to sweep
+    output_dir : str
+        Directory to save the sweep results
+    sample_size : int
+        Number of rows to fit and score each candidate on
+    workers : int, optional
+        Number of worker processes, defaults to the number of cores
+
+    Returns:
+    -------
+    int
+        Selected number of clusters
+    """
+    rng = np.random.default_rng(42)
+    n_rows = matrix.shape[0]
+    sample_rows = np.sort(rng.choice(n_rows, min(sample_size, n_rows), replace=False))
+    sample = matrix[sample_rows]
+
+    # Silhouette needs fewer clusters than samples
+    candidates = list(range(k_min, min(k_max, sample.shape[0] - 1) + 1))
+    if not candidates:
+        raise ValueError(f"Not enough reasons to sweep k from {k_min} to {k_max}.")
+
+    print(
+        f"Sweeping k from {candidates[0]} to {candidates[-1]} on {len(sample_rows)} rows"
+    )
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(score_k, repeat(sample), candidates))
+
+    sweep = pd.DataFrame(results)
+    sweep.to_csv(os.path.join(output_dir, "k_sweep.csv"), index=False)
+
+    fig, inertia_axis = plt.subplots(figsize=(10, 6))
+    inertia_axis.plot(sweep["k"], sweep["inertia"], "o-", color="tab:blue")
+    inertia_axis.set_xlabel("Number of clusters (k)")
+    inertia_axis.set_ylabel("Inertia", color="tab:blue")
+    silhouette_axis = inertia_axis.twinx()
+    silhouette_axis.plot(sweep["k"], sweep["silhouette"], "s-", color="tab:orange")
+    silhouette_axis.set_ylabel("Silhouette score", color="tab:orange")
+    plt.title("KMeans k Sweep")
+    fig.savefig(os.path.join(output_dir, "k_sweep.png"))
+    plt.close(fig)
+
+    if sweep["silhouette"].isna().all():
+        raise ValueError(
+            f"No k from {candidates[0]} to {candidates[-1]} gives more than one "
+            "cluster, so none can be scored. The sampled reasons may all be the same."
+        )
+    best = sweep.loc[sweep["silhouette"].idxmax()]
+    print(f"Selected k={int(best['k'])} (silhouette {best['silhouette']:.3f})")
+    return int(best["k"])
+
+
+def resolve_n_clusters(matrix, n_clusters, output_dir):
+    """Returns `n_clusters` if it is an integer, otherwise sweeps the (min, max) range."""
+    if isinstance(n_clusters, tuple):
+        return select_k(matrix, *n_clusters, output_dir)
+    return n_clusters
+
+
+def order_theme_counts(theme_counts):
+    """
+    Order theme counts so "Incorrect Fee - Underpayment", "Incorrect Fee - Other" and
+    "Other" appear at the end, dropping empty themes apart from those last two.
+    """
+    tail = ["Incorrect Fee - Underpayment", "Incorrect Fee - Other", "Other"]
+    ordered_keys = [
+        theme for theme in THEMES if theme in theme_counts and theme not in tail
+    ]
+    if theme_counts.get("Incorrect Fee - Underpayment"):
+        ordered_keys.append("Incorrect Fee - Underpayment")
+    ordered_keys += ["Incorrect Fee - Other", "Other"]
+    return {theme: theme_counts.get(theme, 0) for theme in ordered_keys}
+
+
+def save_theme_document(theme_counts, doc_path):
+    """
+    Save a Word document listing each theme and its number of instances.
+
+    Parameters:
+    ----------
+    theme_counts : dict
+        Number of reasons per theme, in the order they should appear
+    doc_path : str
+        Path to save the document
+    """
+    doc = Document()
+    doc.add_heading("Grouped Invalid Reason Details", level=1)
+
+    for theme, count in theme_counts.items():
+        if theme == "Incorrect Fee - Other":
+            underpayment_count = theme_counts.get("Incorrect Fee - Underpayment", 0)
+            doc.add_heading(
+                f"{theme} ({count} instances, Underpayment: {underpayment_count} instances):",
+                level=2,
+            )
+        else:
+            doc.add_heading(f"{theme} ({count} instances):", level=2)
+
+    doc.save(doc_path)
+
+
+def iter_reason_chunks(input_csv, chunksize):
+    """Yields non-empty invalid reasons from the input CSV in lists of up to `chunksize`."""
+    for chunk in pd.read_csv(input_csv, usecols=[REASON_COLUMN], chunksize=chunksize):
+        reasons = chunk[REASON_COLUMN].dropna().astype(str).tolist()
+        if reasons:
+            yield reasons
+
+
+def analyze_clusters(
+    input_csv,
+    output_dir,
+    n_clusters=10,
+    dedup=False,
+    dedup_threshold=0.8,
+    embed="exact",
+):
     """
     Analyze clusters in invalid application reasons and generate visualizations and reports.
 
@@ -20,6 +591,16 @@ def analyze_clusters(input_csv, output_dir):
         Path to input CSV file containing invalid application reasons
     output_dir : str
         Directory to save output files
+    n_clusters : int or tuple
+        Number of KMeans clusters, or a (min, max) range to sweep and select from
+    dedup : bool
+        Collapse exact and near-duplicate reasons before vectorising, clustering and
+        plotting, using the group sizes as sample weights
+    dedup_threshold : float
+        Minimum estimated similarity for two reasons to be treated as near-duplicates
+    embed : str
+        "exact" runs TSNE on every point, "fast" runs it on a stratified sample and
+        places the rest by nearest-neighbour interpolation
     """
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
@@ -27,18 +608,6 @@ def analyze_clusters(input_csv, output_dir):
     # Load data
     df = pd.read_csv(input_csv)
 
-    # Define themes for clustering with more granular categories for Missing Documents
-    themes = {
-        "Incorrect Fee": r"(fee|payment|underpayment|overpayment)",
-        "Missing Plans": r"(site plan|floor plan|elevation)",
-        "Missing Reports": r"(report|statement|assessment|survey)",
-        "Missing Forms": r"(form|certificate|ownership)",
-        "Validation Checklist": r"(checklist|validation|requirement)",
-        "Missing Details": r"(details|clarify|information)",
-        "Missing Drawings": r"(drawing|design|sketch|diagram)",
-        "Other": r".*",
-    }
-
     # Initialise a dictionary to hold the themes and their corresponding rows
     grouped_reasons = defaultdict(list)
 
@@ -48,7 +617,7 @@ def analyze_clusters(input_csv, output_dir):
         if pd.isna(reason):
             continue
         matched = False
-        for theme, pattern in themes.items():
+        for theme, pattern in THEMES.items():
             if re.search(pattern, reason, re.IGNORECASE):
                 grouped_reasons[theme].append(reason)
                 matched = True
@@ -61,7 +630,7 @@ def analyze_clusters(input_csv, output_dir):
     underpayment_fee = [
         reason
         for reason in incorrect_fee
-        if re.search(r"insufficient|further fee", reason, re.IGNORECASE)
+        if re.search(UNDERPAYMENT_PATTERN, reason, re.IGNORECASE)
     ]
     remaining_fee = [
         reason for reason in incorrect_fee if reason not in underpayment_fee
@@ -78,62 +647,57 @@ def analyze_clusters(input_csv, output_dir):
     ]
     ordered_keys += ["Incorrect Fee - Other", "Other"]
 
-    # Create a Word document
-    doc = Document()
-    doc.add_heading("Grouped Invalid Reason Details", level=1)
-
-    # Add each group and its count to the document
-    for theme in ordered_keys:
-        reasons = grouped_reasons[theme]
-        count = len(reasons)
-        if theme == "Incorrect Fee - Other":
-            underpayment_count = len(
-                grouped_reasons.get("Incorrect Fee - Underpayment", [])
-            )
-            doc.add_heading(
-                f"{theme} ({count} instances, Underpayment: {underpayment_count} instances):",
-                level=2,
-            )
-        else:
-            doc.add_heading(f"{theme} ({count} instances):", level=2)
-
-    # Save the document
+    # Save a Word document with each group and its count
     doc_path = os.path.join(output_dir, "Grouped_Invalid_Reason_Details.docx")
-    doc.save(doc_path)
+    save_theme_document(
+        {theme: len(grouped_reasons[theme]) for theme in ordered_keys}, doc_path
+    )
 
-    # Perform TF-IDF vectorisation
+    # Collapse duplicate reasons so the steps below run once per unique reason
     all_reasons = df["Invalid Reason Details"].dropna().tolist()
-    vectorizer = TfidfVectorizer(stop_words="english", max_features=500)
-    tfidf_matrix = vectorizer.fit_transform(all_reasons)
+    if dedup:
+        representatives, weights, row_group = collapse_duplicates(
+            all_reasons, threshold=dedup_threshold
+        )
+        print(
+            f"Collapsed {len(all_reasons)} reasons into {len(representatives)} "
+            f"unique and near-duplicate groups"
+        )
+    else:
+        representatives = all_reasons
+        weights = np.ones(len(all_reasons), dtype=int)
+        row_group = np.arange(len(all_reasons))
 
-    # Reduce dimensions using TSNE
-    tsne = TSNE(n_components=2, random_state=42, perplexity=30, n_iter=1000)
-    tsne_results = tsne.fit_transform(tfidf_matrix.toarray())
+    # Perform TF-IDF vectorisation
+    vectorizer = TfidfVectorizer(stop_words="english", max_features=500)
+    tfidf_matrix = vectorizer.fit_transform(representatives)
 
-    # Cluster the data into 10 groups using KMeans
-    kmeans = KMeans(n_clusters=10, random_state=42)
-    clusters = kmeans.fit_predict(tfidf_matrix)
+    # Reduce dimensions with TruncatedSVD on the sparse matrix
+    embedding = reduce_dimensions(tfidf_matrix)
 
-    # Prepare data for visualization
-    cluster_colors = clusters
+    # Cluster the data using KMeans, selecting the number of clusters if a range is given
+    n_clusters = resolve_n_clusters(tfidf_matrix, n_clusters, output_dir)
+    kmeans = KMeans(n_clusters=n_clusters, random_state=42)
+    clusters = kmeans.fit_predict(tfidf_matrix, sample_weight=weights)
 
-    plt.figure(figsize=(10, 8))
-    scatter = plt.scatter(
-        tsne_results[:, 0],
-        tsne_results[:, 1],
-        c=cluster_colors,
-        cmap="tab10",
-        alpha=0.7,
+    # Save the fitted model so new reasons can be classified without refitting, and
+    # check that what classify-reasons loads reproduces a fresh fit of the same data
+    model_path = save_cluster_model(
+        output_dir, vectorizer, kmeans.cluster_centers_, normalise=dedup
     )
-    plt.colorbar(scatter, ticks=range(10), label="Clusters")
-    plt.title("TSNE Visualization of Clusters")
-    plt.xlabel("TSNE Dimension 1")
-    plt.ylabel("TSNE Dimension 2")
+    refit = KMeans(n_clusters=n_clusters, random_state=42)
+    refit_clusters = refit.fit_predict(tfidf_matrix, sample_weight=weights)
+    check_saved_model(model_path, all_reasons, refit_clusters[row_group])
+
+    # Embed in two dimensions with TSNE, exactly or on a stratified sample
+    if embed == "fast":
+        tsne_results = embed_fast(embedding, clusters)
+    else:
+        tsne_results = embed_tsne(embedding)
 
     # Save the plot
     plot_path = os.path.join(output_dir, "TSNE_Clusters.png")
-    plt.savefig(plot_path)
-    plt.close()
+    plot_clusters(tsne_results, clusters, weights, n_clusters, plot_path)
 
     # Create a CSV file with themes as columns and reasons as rows
     max_rows = max(len(reasons) for reasons in grouped_reasons.values())
@@ -148,6 +712,17 @@ def analyze_clusters(input_csv, output_dir):
     csv_path = os.path.join(output_dir, "Grouped_Invalid_Reason_Details.csv")
     output_df.to_csv(csv_path, index=False)
 
+    # Spread the cluster labels back to every reason and save them with their themes
+    clustered_df = pd.DataFrame(
+        {
+            REASON_COLUMN: all_reasons,
+            "Theme": [classify_theme(reason) for reason in all_reasons],
+            "Cluster": clusters[row_group],
+        }
+    )
+    clustered_path = os.path.join(output_dir, "Clustered_Invalid_Reason_Details.csv")
+    clustered_df.to_csv(clustered_path, index=False)
+
     print(f"Outputs generated in {output_dir}:")
     print(
         "1. Document 'Grouped_Invalid_Reason_Details.docx' created with grouped reasons."
@@ -156,3 +731,165 @@ def analyze_clusters(input_csv, output_dir):
     print(
         "3. CSV file 'Grouped_Invalid_Reason_Details.csv' created with grouped reasons."
     )
+    print(f"4. Model '{MODEL_FILE}' saved for classify-reasons.")
+    print(
+        "5. CSV file 'Clustered_Invalid_Reason_Details.csv' created with a theme and "
+        "cluster for every reason."
+    )
+
+
+def analyze_clusters_streaming(
+    input_csv,
+    output_dir,
+    n_clusters=10,
+    chunksize=50000,
+    batch_size=4096,
+    dedup=False,
+    dedup_threshold=0.8,
+):
+    """
+    Cluster invalid application reasons out of core, for inputs too large to load at once.
+
+    The CSV is read twice in chunks. The first pass vectorises each chunk with a stateless
+    HashingVectorizer and updates a MiniBatchKMeans model with partial_fit. The second pass
+    assigns clusters and themes and appends them to the output CSV. Memory depends on
+    `chunksize` rather than the size of the input. No TSNE plot is produced in this mode.
+
+    Parameters:
+    ----------
+    input_csv : str
+        Path to input CSV file containing invalid application reasons
+    output_dir : str
+        Directory to save output files
+    n_clusters : int or tuple
+        Number of KMeans clusters, or a (min, max) range to sweep on the first chunk
+    chunksize : int
+        Number of CSV rows read per chunk
+    batch_size : int
+        Number of rows per mini-batch update
+    dedup : bool
+        Collapse exact and near-duplicate reasons within each chunk, using the group sizes
+        as sample weights
+    dedup_threshold : float
+        Minimum estimated similarity for two reasons to be treated as near-duplicates
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    def collapse(reasons):
+        if dedup:
+            return collapse_duplicates(reasons, threshold=dedup_threshold)
+        return reasons, np.ones(len(reasons), dtype=int), np.arange(len(reasons))
+
+    vectorizer = HashingVectorizer(
+        stop_words="english", n_features=2**18, alternate_sign=False
+    )
+    # Select the number of clusters on the first chunk if a range is given
+    if isinstance(n_clusters, tuple):
+        first_chunk = next(iter_reason_chunks(input_csv, chunksize), None)
+        if first_chunk is None:
+            print("No invalid reasons to cluster.")
+            return
+        representatives = collapse(first_chunk)[0]
+        n_clusters = select_k(
+            vectorizer.transform(representatives), *n_clusters, output_dir
+        )
+
+    kmeans = MiniBatchKMeans(
+        n_clusters=n_clusters, random_state=42, batch_size=batch_size, n_init=3
+    )
+
+    # First pass: fit the model with mini-batch partial updates
+    fitted = False
+    for reasons in iter_reason_chunks(input_csv, chunksize):
+        representatives, weights, _ = collapse(reasons)
+        matrix = vectorizer.transform(representatives)
+        for start in range(0, matrix.shape[0], batch_size):
+            batch = matrix[start : start + batch_size]
+            # The first update needs at least one row per cluster
+            if fitted or batch.shape[0] >= n_clusters:
+                kmeans.partial_fit(
+                    batch, sample_weight=weights[start : start + batch_size]
+                )
+                fitted = True
+
+    if not fitted:
+        print(f"Not enough invalid reasons to fit {n_clusters} clusters.")
+        return
+
+    # Second pass: assign clusters and themes, appending to the output CSV
+    csv_path = os.path.join(output_dir, "Clustered_Invalid_Reason_Details.csv")
+    theme_counts = defaultdict(int)
+    cluster_counts = defaultdict(int)
+    header = True
+    for reasons in iter_reason_chunks(input_csv, chunksize):
+        representatives, _, row_group = collapse(reasons)
+        matrix = vectorizer.transform(representatives)
+        clusters = kmeans.predict(matrix)[row_group]
+        themes = [classify_theme(reason) for reason in reasons]
+        for theme in themes:
+            theme_counts[theme] += 1
+        for cluster in clusters:
+            cluster_counts[int(cluster)] += 1
+
+        pd.DataFrame(
+            {REASON_COLUMN: reasons, "Theme": themes, "Cluster": clusters}
+        ).to_csv(csv_path, mode="w" if header else "a", header=header, index=False)
+        header = False
+
+    doc_path = os.path.join(output_dir, "Grouped_Invalid_Reason_Details.docx")
+    save_theme_document(order_theme_counts(theme_counts), doc_path)
+
+    save_cluster_model(output_dir, vectorizer, kmeans.cluster_centers_, normalise=dedup)
+
+    print(f"Outputs generated in {output_dir}:")
+    print(
+        "1. Document 'Grouped_Invalid_Reason_Details.docx' created with grouped reasons."
+    )
+    print(
+        "2. CSV file 'Clustered_Invalid_Reason_Details.csv' created with a theme and "
+        "cluster for every reason."
+    )
+    print(f"3. Model '{MODEL_FILE}' saved for classify-reasons.")
+    print("Cluster sizes:")
+    for cluster in sorted(cluster_counts):
+        print(f"  Cluster {cluster}: {cluster_counts[cluster]}")
+
+
+def classify_reasons(model_path, input_csv, output_csv, chunksize=50000):
+    """
+    Assign themes and clusters to new invalid application reasons using a model saved
+    by analyze-clusters, without refitting anything.
+
+    Parameters:
+    ----------
+    model_path : str
+        Path to the model file saved by analyze-clusters
+    input_csv : str
+        Path to input CSV file containing invalid application reasons
+    output_csv : str
+        Path to save the classified reasons
+    chunksize : int
+        Number of CSV rows read per chunk
+    """
+    model = load_cluster_model(model_path)
+
+    output_folder = os.path.dirname(output_csv)
+    if output_folder:
+        os.makedirs(output_folder, exist_ok=True)
+
+    total = 0
+    header = True
+    for reasons in iter_reason_chunks(input_csv, chunksize):
+        clusters = predict_clusters(model, reasons)
+        themes = [
+            classify_theme(reason, model["themes"], model["underpayment_pattern"])
+            for reason in reasons
+        ]
+        pd.DataFrame(
+            {REASON_COLUMN: reasons, "Theme": themes, "Cluster": clusters}
+        ).to_csv(output_csv, mode="w" if header else "a", header=header, index=False)
+        header = False
+        total += len(reasons)
+
+    print(f"Classified {total} reasons with model created {model['created']}.")
+    print(f"Output saved to {output_csv}")
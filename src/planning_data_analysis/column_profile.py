@@ -0,0 +1,256 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import shapely
+
+NUMBER_TYPES = (int, float, np.integer, np.floating)
+
+
+def leading_zeros(values):
+    """Counts the leading zero bits of each value in a uint64 array."""
+    values = values.copy()
+    zeros = np.zeros(len(values), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        mask = values < (np.uint64(1) << np.uint64(64 - shift))
+        zeros[mask] += shift
+        values[mask] <<= np.uint64(shift)
+    return zeros
+
+
+class HyperLogLog:
+    """
+    Mergeable approximate distinct count over 64-bit hashes.
+
+    Uses 2**precision one-byte registers, so memory is fixed (4 KB at the default
+    precision) and the standard error is about 1.04 / sqrt(2**precision), roughly 1.6%.
+    """
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, hashes):
+        """Adds an array of uint64 hashes."""
+        precision = np.uint64(self.precision)
+        index = hashes >> (np.uint64(64) - precision)
+        # A guard bit below the remaining bits bounds the rank for all-zero remainders
+        remainder = (hashes << precision) | (np.uint64(1) << (precision - np.uint64(1)))
+        np.maximum.at(self.registers, index, leading_zeros(remainder) + 1)
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self):
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        raw = alpha * size * size / np.sum(np.ldexp(1.0, -self.registers.astype(int)))
+        empty = int(np.sum(self.registers == 0))
+        if raw <= 2.5 * size and empty:
+            # Linear counting is more accurate for small cardinalities
+            return round(size * math.log(size / empty))
+        return round(raw)
+
+
+def canonical_value(value):
+    """Formats one value of an object column as canonical_text does."""
+    if isinstance(value, NUMBER_TYPES) and not isinstance(value, (bool, np.bool_)):
+        try:
+            return pa.scalar(value).cast(pa.string()).as_py()
+        except (OverflowError, pa.ArrowException):
+            # Integers too large for pyarrow keep Python's formatting
+            pass
+    return str(value)
+
+
+def canonical_text(values):
+    """
+    Converts values to strings that are the same whatever dtype a batch read them
+    as, so equal values hash alike: numbers are formatted by pyarrow, which writes
+    whole floats as integers (1.0 as "1"), and datetimes as nanoseconds since the
+    epoch.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        values = values.dt.tz_convert(None) if values.dt.tz else values
+        values = values.astype("datetime64[ns]").astype("int64")
+    if values.dtype == object:
+        # Numbers mixed with text are formatted one at a time in the same way
+        return values.map(canonical_value)
+    if pd.api.types.is_bool_dtype(values) or not pd.api.types.is_numeric_dtype(values):
+        return values.astype(str).astype(object)
+    text = pa.array(values).cast(pa.string())
+    return pd.Series(text.to_numpy(zero_copy_only=False), dtype=object)
+
+
+def to_json_value(value):
+    """Converts NumPy and pandas scalars to values json can serialise."""
+    if value is None:
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+class ColumnProfile:
+    """
+    Running, mergeable aggregates for one attribute column.
+
+    Distinct values are counted on canonical_text, as a column can be read with a
+    different dtype in each batch.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.dtype = None
+        self.count = 0
+        self.nulls = 0
+        self.distinct = HyperLogLog()
+        self.min = None
+        self.max = None
+        self.min_length = None
+        self.max_length = None
+
+    def update(self, series):
+        """Adds one batch of values."""
+        self.dtype = self.dtype or str(series.dtype)
+        self.count += len(series)
+        values = series.dropna()
+        self.nulls += len(series) - len(values)
+        if values.empty:
+            return
+
+        self.distinct.update(
+            pd.util.hash_pandas_object(
+                canonical_text(values), index=False, categorize=False
+            ).to_numpy()
+        )
+
+        if pd.api.types.is_numeric_dtype(
+            values
+        ) or pd.api.types.is_datetime64_any_dtype(values):
+            self.merge_range(values.min(), values.max())
+        else:
+            text = values.astype(str)
+            lengths = text.str.len()
+            self.merge_range(text.min(), text.max())
+            self.merge_lengths(lengths.min(), lengths.max())
+
+    def merge_range(self, low, high):
+        if self.min is None:
+            self.min, self.max = low, high
+            return
+        try:
+            self.min = min(self.min, low)
+            self.max = max(self.max, high)
+        except TypeError:
+            # Batches disagree on the column type (numbers in one, text or dates in
+            # another), so the column is ranged as text from then on
+            self.min = min(str(self.min), str(low))
+            self.max = max(str(self.max), str(high))
+
+    def merge_lengths(self, low, high):
+        self.min_length = low if self.min_length is None else min(self.min_length, low)
+        self.max_length = (
+            high if self.max_length is None else max(self.max_length, high)
+        )
+
+    def merge(self, other):
+        """Combines the aggregates of another profile of the same column."""
+        self.dtype = self.dtype or other.dtype
+        self.count += other.count
+        self.nulls += other.nulls
+        self.distinct.merge(other.distinct)
+        if other.min is not None:
+            self.merge_range(other.min, other.max)
+        if other.min_length is not None:
+            self.merge_lengths(other.min_length, other.max_length)
+
+    def to_dict(self):
+        return {
+            "column": self.name,
+            "dtype": self.dtype,
+            "count": self.count,
+            "nulls": self.nulls,
+            "null_rate": self.nulls / self.count if self.count else 0.0,
+            "distinct_estimate": self.distinct.estimate(),
+            "min": to_json_value(self.min),
+            "max": to_json_value(self.max),
+            "min_length": to_json_value(self.min_length),
+            "max_length": to_json_value(self.max_length),
+        }
+
+
+class LayerProfile:
+    """Running, mergeable profile of every column in a layer, plus its bounding box."""
+
+    def __init__(self):
+        self.row_count = 0
+        self.columns = {}
+        self.bounds = None
+        self.empty_geometries = 0
+
+    def update(self, batch):
+        """Adds one batch of rows (a DataFrame or GeoDataFrame)."""
+        self.row_count += len(batch)
+        geometry_name = getattr(batch, "_geometry_column_name", None)
+        for name in batch.columns:
+            if name == geometry_name:
+                continue
+            if name not in self.columns:
+                self.columns[name] = ColumnProfile(name)
+            self.columns[name].update(batch[name])
+
+        if geometry_name in batch.columns:
+            geoms = np.asarray(batch.geometry.values)
+            empty = shapely.is_missing(geoms) | shapely.is_empty(geoms)
+            self.empty_geometries += int(empty.sum())
+            if not empty.all():
+                self.merge_bounds(shapely.total_bounds(geoms[~empty]))
+
+    def merge_bounds(self, bounds):
+        if self.bounds is None:
+            self.bounds = [float(value) for value in bounds]
+        else:
+            self.bounds = [
+                min(self.bounds[0], bounds[0]),
+                min(self.bounds[1], bounds[1]),
+                max(self.bounds[2], bounds[2]),
+                max(self.bounds[3], bounds[3]),
+            ]
+
+    def merge(self, other):
+        """Combines the aggregates of another profile of the same layer."""
+        self.row_count += other.row_count
+        self.empty_geometries += other.empty_geometries
+        for name, column in other.columns.items():
+            if name in self.columns:
+                self.columns[name].merge(column)
+            else:
+                self.columns[name] = column
+        if other.bounds is not None:
+            self.merge_bounds(other.bounds)
+
+    def to_dict(self):
+        return {
+            "row_count": self.row_count,
+            "bounds": self.bounds,
+            "empty_geometries": self.empty_geometries,
+            "columns": [column.to_dict() for column in self.columns.values()],
+        }
+
+
+def profile_batches(batches):
+    """
+    Profiles a layer from an iterable of DataFrame batches, keeping only running aggregates
+    so memory does not grow with the layer size.
+
+    Returns:
+        LayerProfile: The merged profile.
+    """
+    profile = LayerProfile()
+    for batch in batches:
+        profile.update(batch)
+    return profile
@@ -0,0 +1,157 @@
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+CATALOG_FILE = "eda_catalog.sqlite"
+
+
+def open_catalog(output_dir):
+    """Opens (creating if needed) the SQLite catalog of analysed files in `output_dir`."""
+    connection = sqlite3.connect(os.path.join(output_dir, CATALOG_FILE))
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS analysed_files (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            content_hash TEXT NOT NULL,
+            options TEXT NOT NULL,
+            result TEXT NOT NULL,
+            analysed_at TEXT NOT NULL
+        )
+        """)
+    return connection
+
+
+def related_files(file_path):
+    """
+    Returns the files that make up a layer: a shapefile's sidecars (.dbf, .shx, .prj,
+    ...) as well as the file itself.
+    """
+    if file_path.endswith(".shp"):
+        stem = glob.escape(os.path.splitext(file_path)[0])
+        return sorted(glob.glob(f"{stem}.*"))
+    return [file_path]
+
+
+def file_signature(file_path):
+    """Returns the total size and latest modification time (ns) of a layer's files."""
+    stats = [os.stat(path) for path in related_files(file_path)]
+    return sum(stat.st_size for stat in stats), max(stat.st_mtime_ns for stat in stats)
+
+
+def content_hash(file_path, chunk_size=1 << 20):
+    """Hashes the contents of a layer's files with BLAKE2b."""
+    digest = hashlib.blake2b(digest_size=32)
+    for path in related_files(file_path):
+        digest.update(os.path.basename(path).encode())
+        with open(path, "rb") as f:
+            while chunk := f.read(chunk_size):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Keys of the analysis results that hold the path of a written file
+ASSET_KEYS = ("geojson_file", "overview_file", "profile_file")
+
+
+def convert_paths(result, convert):
+    """Applies `convert` to every output path in an analysis result."""
+    geospatial_file, geospatial_data, report_file, plot_file, map_file = result
+    geospatial_data = dict(geospatial_data)
+    for key in ASSET_KEYS:
+        if geospatial_data.get(key):
+            geospatial_data[key] = convert(geospatial_data[key])
+    if map_file is not None:
+        map_file = tuple(convert(path) for path in map_file)
+    return (
+        geospatial_file,
+        geospatial_data,
+        convert(report_file),
+        convert(plot_file),
+        map_file,
+    )
+
+
+def assets_exist(geospatial_data, plot_file, map_file):
+    """
+    Checks that the files written for a cached analysis are still on disk. A missing
+    plot is accepted if the map it is screenshot from can be rendered again.
+    """
+    assets = [geospatial_data.get(key) for key in ASSET_KEYS]
+    if not os.path.exists(plot_file):
+        assets.append(map_file[0] if map_file else plot_file)
+    return all(os.path.exists(asset) for asset in assets if asset)
+
+
+def lookup_analysis(connection, output_dir, file_path, options):
+    """
+    Returns the cached analysis result for a file, or None if it is new, has changed,
+    was analysed with different options, or its assets are missing.
+
+    Asset paths are stored relative to `output_dir`, so the output directory can be
+    moved or reached from a different working directory.
+
+    Size and modification time are checked first. The content hash is only computed
+    when the modification time differs, so a file that was touched but not changed is
+    still reused.
+    """
+    row = connection.execute(
+        "SELECT size, mtime_ns, content_hash, options, result "
+        "FROM analysed_files WHERE path = ?",
+        (os.path.abspath(file_path),),
+    ).fetchone()
+    if row is None:
+        return None
+
+    size, mtime_ns, stored_hash, stored_options, result = row
+    if stored_options != json.dumps(options, sort_keys=True):
+        return None
+
+    current_size, current_mtime_ns = file_signature(file_path)
+    if current_size != size:
+        return None
+    if current_mtime_ns != mtime_ns:
+        if content_hash(file_path) != stored_hash:
+            return None
+        connection.execute(
+            "UPDATE analysed_files SET mtime_ns = ? WHERE path = ?",
+            (current_mtime_ns, os.path.abspath(file_path)),
+        )
+        connection.commit()
+
+    geospatial_file, geospatial_data, report_file, plot_file, map_file = convert_paths(
+        json.loads(result), lambda path: os.path.join(output_dir, path)
+    )
+    if not assets_exist(geospatial_data, plot_file, map_file):
+        return None
+    # Only re-render the map if its screenshot is missing
+    if os.path.exists(plot_file):
+        map_file = None
+    return geospatial_file, geospatial_data, report_file, plot_file, map_file
+
+
+def store_analysis(connection, output_dir, file_path, options, result):
+    """
+    Records the analysis result of a file with its size, mtime and content hash, and
+    the paths of its assets relative to `output_dir`.
+    """
+    result = convert_paths(result, lambda path: os.path.relpath(path, output_dir))
+    size, mtime_ns = file_signature(file_path)
+    connection.execute(
+        "INSERT OR REPLACE INTO analysed_files "
+        "(path, size, mtime_ns, content_hash, options, result, analysed_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            os.path.abspath(file_path),
+            size,
+            mtime_ns,
+            content_hash(file_path),
+            json.dumps(options, sort_keys=True),
+            json.dumps(result, default=str),
+            datetime.now(timezone.utc).isoformat(),
+        ),
+    )
+    connection.commit()
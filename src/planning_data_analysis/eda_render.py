@@ -0,0 +1,173 @@
+import numpy as np
+import shapely
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection, PathCollection
+from matplotlib.figure import Figure
+from matplotlib.path import Path
+
+
+def split_by_index(values, index):
+    """Splits `values` into consecutive runs that share the same `index` value."""
+    return np.split(values, np.flatnonzero(np.diff(index)) + 1)
+
+
+def polygon_paths(polygons):
+    """
+    Builds one compound matplotlib Path per polygon, holes included.
+
+    Polygons are normalised so exterior rings run clockwise and interior rings
+    anticlockwise, which matplotlib's non-zero fill rule draws as holes.
+    """
+    rings, polygon_index = shapely.get_rings(
+        shapely.normalize(polygons), return_index=True
+    )
+    coords, ring_index = shapely.get_coordinates(rings, return_index=True)
+
+    codes = np.full(len(coords), Path.LINETO, dtype=Path.code_type)
+    starts = np.flatnonzero(np.diff(ring_index, prepend=-1))
+    codes[starts] = Path.MOVETO
+    codes[np.append(starts[1:], len(coords)) - 1] = Path.CLOSEPOLY
+
+    coord_polygon = polygon_index[ring_index]
+    return [
+        Path(vertices, path_codes)
+        for vertices, path_codes in zip(
+            split_by_index(coords, coord_polygon), split_by_index(codes, coord_polygon)
+        )
+    ]
+
+
+def render_static_map(gdf, image_file, title=None, figsize=(8, 8), dpi=100):
+    """
+    Draws the geometries of a GeoDataFrame straight to a PNG without a browser or tiles.
+
+    Multi-part geometries are exploded and coordinates extracted with vectorised shapely
+    calls, then drawn as one collection per geometry type.
+
+    Args:
+        gdf (GeoDataFrame): Geometries to draw.
+        image_file (str): Path to save the PNG.
+        title (str): Optional title for the plot.
+        figsize (tuple): Figure size in inches.
+        dpi (int): Resolution of the PNG.
+    """
+    parts = shapely.get_parts(np.asarray(gdf.geometry.values))
+    parts = parts[~shapely.is_empty(parts)]
+    type_ids = shapely.get_type_id(parts)
+
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    polygons = parts[type_ids == 3]
+    if len(polygons):
+        ax.add_collection(
+            PathCollection(
+                polygon_paths(polygons),
+                facecolor="#3388ff55",
+                edgecolor="#3388ff",
+                linewidth=0.8,
+            )
+        )
+
+    lines = parts[(type_ids == 1) | (type_ids == 2)]
+    if len(lines):
+        coords, line_index = shapely.get_coordinates(lines, return_index=True)
+        ax.add_collection(
+            LineCollection(
+                split_by_index(coords, line_index), colors="#3388ff", linewidths=1
+            )
+        )
+
+    points = parts[type_ids == 0]
+    if len(points):
+        coords = shapely.get_coordinates(points)
+        ax.scatter(coords[:, 0], coords[:, 1], s=12, color="#3388ff")
+
+    if len(parts):
+        min_x, min_y, max_x, max_y = shapely.total_bounds(parts)
+        pad = max(max_x - min_x, max_y - min_y) * 0.05 or 1
+        ax.set_xlim(min_x - pad, max_x + pad)
+        ax.set_ylim(min_y - pad, max_y + pad)
+        if gdf.crs is not None and gdf.crs.is_geographic:
+            # Keep shapes undistorted at the layer's latitude
+            ax.set_aspect(1 / np.cos(np.radians((min_y + max_y) / 2)))
+        else:
+            ax.set_aspect("equal")
+
+    if title:
+        ax.set_title(title)
+    fig.savefig(image_file)
+    print(f"Map saved: {image_file}")
+
+
+def render_overview_map(
+    batches, bounds, image_file, title=None, grid_size=1024, crs=None
+):
+    """
+    Renders whole-layer coverage as a density raster, for layers too large to draw feature
+    by feature.
+
+    Feature batches are consumed one at a time. Lines and polygon edges are densified to
+    the raster cell size so outlines stay continuous, every vertex is binned into a fixed
+    grid with NumPy, and the batch is released, so memory depends on the batch size and
+    grid rather than the layer size.
+
+    Args:
+        batches (iterable): GeoDataFrames covering the layer, e.g. from iter_feature_batches.
+        bounds (tuple): Layer extent as (min_x, min_y, max_x, max_y).
+        image_file (str): Path to save the PNG.
+        title (str): Optional title for the plot.
+        grid_size (int): Number of cells along the longer side of the extent.
+        crs (pyproj.CRS): Layer CRS, used to correct the aspect ratio of geographic data.
+
+    Returns:
+        int: Number of features binned.
+    """
+    min_x, min_y, max_x, max_y = bounds
+    # Give single points or straight lines a non-zero extent
+    if max_x - min_x == 0:
+        min_x, max_x = min_x - 0.5, max_x + 0.5
+    if max_y - min_y == 0:
+        min_y, max_y = min_y - 0.5, max_y + 0.5
+    width, height = max_x - min_x, max_y - min_y
+    cell_size = max(width, height) / grid_size
+    shape = (
+        max(1, round(height / cell_size)),
+        max(1, round(width / cell_size)),
+    )
+
+    grid = np.zeros(shape, dtype=np.float64)
+    feature_count = 0
+    for batch in batches:
+        geoms = np.asarray(batch.geometry.values)
+        geoms = geoms[~shapely.is_missing(geoms)]
+        not_points = ~np.isin(shapely.get_type_id(geoms), (0, 4))
+        geoms[not_points] = shapely.segmentize(geoms[not_points], cell_size)
+        coords = shapely.get_coordinates(geoms)
+        counts, _, _ = np.histogram2d(
+            coords[:, 1],
+            coords[:, 0],
+            bins=shape,
+            range=((min_y, max_y), (min_x, max_x)),
+        )
+        grid += counts
+        feature_count += len(geoms)
+
+    fig = Figure(figsize=(8, 8 * min(2, max(0.5, height / width))), dpi=120)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    image = ax.imshow(
+        np.ma.masked_equal(np.log10(grid + 1), 0),
+        origin="lower",
+        extent=(min_x, max_x, min_y, max_y),
+        cmap="viridis",
+        interpolation="nearest",
+    )
+    if crs is not None and crs.is_geographic:
+        ax.set_aspect(1 / np.cos(np.radians((min_y + max_y) / 2)))
+    fig.colorbar(image, ax=ax, shrink=0.8, label="log10(vertices per cell + 1)")
+    ax.set_title(title or f"Coverage of {feature_count} features")
+    fig.savefig(image_file)
+    print(f"Overview map saved: {image_file}")
+    return feature_count
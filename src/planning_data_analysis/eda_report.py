@@ -1,42 +1,112 @@
 import asyncio
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
 import geopandas as gpd
-import pandas as pd
+import pyproj
 from docx import Document
 from docx.shared import Inches
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from playwright.async_api import async_playwright
 
+from planning_data_analysis.column_profile import profile_batches
+from planning_data_analysis.eda_catalog import (
+    lookup_analysis,
+    open_catalog,
+    store_analysis,
+)
+from planning_data_analysis.eda_render import render_overview_map, render_static_map
+from planning_data_analysis.geo_io import (
+    iter_feature_batches,
+    iter_frame_batches,
+    read_csv_layer,
+    read_layer_info,
+)
+from planning_data_analysis.geometry_quality import check_geometry_quality
+from planning_data_analysis.sampling import GEOMETRY_TYPE, sample_batches
+
+# True once the Leaflet map exists and every tile has finished loading (or failed)
+MAP_LOADED_JS = """
+() => {
+    const container = document.querySelector(".leaflet-container");
+    if (!container) return false;
+    const pending = container.querySelectorAll("img.leaflet-tile:not(.leaflet-tile-loaded)");
+    return pending.length === 0;
+}
+"""
+
+
+GEOSPATIAL_EXTENSIONS = (".shp", ".gpkg", ".csv")
+
+
+def scan_folder(folder_path, recursive=False):
+    """
+    Lists a folder in a single os.scandir pass, or every nested folder if `recursive`.
 
-def find_geospatial_files(folder_path):
-    """Finds geospatial files (.shp, .gpkg, .csv) in the folder."""
+    Returns:
+        list: (relative_path, size, is_file) for every entry, sorted by path.
+    """
+    entries = []
+    pending = [folder_path]
+    while pending:
+        with os.scandir(pending.pop()) as scan:
+            for entry in scan:
+                if recursive and entry.is_dir():
+                    pending.append(entry.path)
+                    continue
+                entries.append(
+                    (
+                        os.path.relpath(entry.path, folder_path),
+                        entry.stat().st_size,
+                        entry.is_file(),
+                    )
+                )
+    return sorted(entries)
+
+
+def find_geospatial_files(folder_path, recursive=False):
+    """
+    Finds geospatial files (.shp, .gpkg, .csv) in the folder, or in every nested folder
+    if `recursive`, as paths relative to the folder.
+    """
     return [
-        file
-        for file in os.listdir(folder_path)
-        if file.endswith((".shp", ".gpkg", ".csv"))
+        path
+        for path, _, is_file in scan_folder(folder_path, recursive)
+        if is_file and path.endswith(GEOSPATIAL_EXTENSIONS)
     ]
 
 
-def analyse_folder(folder_path):
+def analyse_folder(folder_path, recursive=False):
     """Analyses the folder and returns file sizes."""
-    details = {
-        file: f"Size: {os.path.getsize(os.path.join(folder_path, file))} bytes"
-        for file in os.listdir(folder_path)
-    }
-    details[
-        "Total Folder Size"
-    ] = f"{sum(os.path.getsize(os.path.join(folder_path, file)) for file in os.listdir(folder_path))} bytes"
+    entries = scan_folder(folder_path, recursive)
+    details = {path: f"Size: {size} bytes" for path, size, _ in entries}
+    details["Total Folder Size"] = f"{sum(size for _, size, _ in entries)} bytes"
     return details
 
 
-def load_geospatial_file(folder_path, file_name):
-    """Loads a geospatial file (.shp, .gpkg, .csv) into a GeoDataFrame."""
+def output_name(geospatial_file):
+    """Flattens a relative file path into a name usable for output files."""
+    return geospatial_file.replace(os.sep, "__")
+
+
+def load_geospatial_file(folder_path, file_name, max_features=None):
+    """
+    Loads a geospatial file (.shp, .gpkg, .csv) into a GeoDataFrame, optionally only
+    the first `max_features` rows.
+    """
     file_path = os.path.join(folder_path, file_name)
     try:
         if file_name.endswith((".shp", ".gpkg")):
-            return gpd.read_file(file_path, engine="pyogrio", on_invalid="ignore")
+            return gpd.read_file(
+                file_path,
+                engine="pyogrio",
+                on_invalid="ignore",
+                max_features=max_features,
+            )
         elif file_name.endswith(".csv"):
-            return pd.read_csv(file_path)
+            return read_csv_layer(file_path, max_features=max_features)
         else:
             raise ValueError("Unsupported file format.")
     except Exception as e:
@@ -44,7 +114,9 @@ def load_geospatial_file(folder_path, file_name):
         return None
 
 
-def analyse_geospatial_file(gdf, geojson_output_file, folder_path, geospatial_file):
+def analyse_geospatial_file(
+    gdf, geojson_output_file, folder_path, geospatial_file, sample=None
+):
     """
     Analyses geospatial data and saves a sample as GeoJSON.
 
@@ -58,16 +130,16 @@ def analyse_geospatial_file(gdf, geojson_output_file, folder_path, geospatial_fi
         Path to the folder containing the original file
     geospatial_file : str
         Name of the geospatial file being analyzed
+    sample : GeoDataFrame
+        Sample rows to save, or None for the first 50 rows
     """
-    try:
-        gdf.head(50).to_file(geojson_output_file, driver="GeoJSON")
-        print(f"Sample GeoJSON saved: {geojson_output_file}")
-    except Exception as e:
-        print(f"Error saving GeoJSON: {e}")
+    if sample is None:
+        sample = gdf.head(50)
+    if not save_geojson_sample(sample, geojson_output_file):
         return None
 
     return {
-        "geometry_type": ", ".join(gdf.geom_type.unique()),
+        "geometry_type": ", ".join(gdf.geom_type.dropna().unique()),
         "record_count": len(gdf),
         "features": ", ".join(gdf.columns),
         "crs": str(gdf.crs) if gdf.crs else "Unknown",
@@ -76,38 +148,290 @@ def analyse_geospatial_file(gdf, geojson_output_file, folder_path, geospatial_fi
     }
 
 
-def generate_report(
-    folder_data,
-    geospatial_data,
-    output_file,
-    image_file,
-    first_report,
-    dataset,
-    geospatial_file,
+def summarise_geospatial_file(
+    folder_path, geospatial_file, geojson_output_file, sample_size=50, sample=None
 ):
     """
-    Generates a report summarising the dataset, including metadata, folder contents,
-    a map plot, and a GeoJSON sample.
+    Summarises a geospatial file from its layer metadata without loading every feature.
+
+    Geometry type, record count, columns and CRS are read from the layer metadata, and
+    only the first `sample_size` rows are read for the GeoJSON sample. CSVs have no
+    metadata, so they are streamed in batches to work it out.
+
+    Parameters:
+    ----------
+    folder_path : str
+        Path to the folder containing the file
+    geospatial_file : str
+        Name of the geospatial file being analyzed
+    geojson_output_file : str
+        Path to save the GeoJSON sample
+    sample_size : int
+        Number of rows to read for the sample
+    sample : GeoDataFrame
+        Sample rows already drawn, or None to read the first `sample_size` rows
+
+    Returns:
+    -------
+    tuple
+        The same summary as analyse_geospatial_file and the sample rows, or (None, None)
+    """
+    file_path = os.path.join(folder_path, geospatial_file)
+    try:
+        layer_info = read_layer_info(file_path)
+    except Exception as e:
+        print(f"Error reading layer metadata: {e}")
+        return None, None
+
+    if sample is None:
+        sample = load_geospatial_file(folder_path, geospatial_file, sample_size)
+    if sample is None or not save_geojson_sample(sample, geojson_output_file):
+        return None, None
+
+    columns = list(layer_info["fields"])
+    if layer_info["geometry_type"]:
+        columns.append("geometry")
+    record_count = layer_info["features"]
+
+    return {
+        "geometry_type": layer_info["geometry_type"] or "None",
+        "record_count": record_count if record_count >= 0 else "Unknown",
+        "features": ", ".join(columns),
+        "crs": layer_info["crs"] or "Unknown",
+        "file_size": os.path.getsize(file_path),
+        "geojson_file": geojson_output_file,
+    }, sample
+
+
+def save_geojson_sample(sample, geojson_output_file):
+    """Saves sample rows as GeoJSON, returning whether it succeeded."""
+    try:
+        sample.to_file(geojson_output_file, driver="GeoJSON")
+        print(f"Sample GeoJSON saved: {geojson_output_file}")
+        return True
+    except Exception as e:
+        print(f"Error saving GeoJSON: {e}")
+        return False
+
+
+def create_overview_map(folder_path, file_name, image_file, batch_size=100000):
+    """
+    Renders a coverage overview of every feature in a file, streaming it in batches.
+
+    Returns:
+        str: Path to the overview image, or None if it could not be created.
+    """
+    file_path = os.path.join(folder_path, file_name)
+    try:
+        layer_info = read_layer_info(file_path, force_total_bounds=True)
+        if layer_info["total_bounds"] is None:
+            print(f"No geometry extent available for overview of {file_name}")
+            return None
+
+        render_overview_map(
+            iter_feature_batches(file_path, batch_size, columns=[]),
+            layer_info["total_bounds"],
+            image_file,
+            title=f"{file_name} coverage ({layer_info['features']} features)",
+            crs=pyproj.CRS(layer_info["crs"]) if layer_info["crs"] else None,
+        )
+        return image_file
+    except Exception as e:
+        print(f"Error creating overview map for {file_name}: {e}")
+        return None
+
+
+def draw_sample(
+    folder_path,
+    file_name,
+    method,
+    column=None,
+    sample_size=50,
+    batch_size=100000,
+    gdf=None,
+):
+    """
+    Draws a reproducible reservoir or stratified sample in one pass over a file's
+    feature batches, or over slices of an already loaded GeoDataFrame.
+
+    Stratified samples are split by `column`, or by geometry type if no column is given.
+
+    Returns:
+        GeoDataFrame: The sample, or None if it could not be drawn.
+    """
+    try:
+        if gdf is not None:
+            batches = iter_frame_batches(gdf, batch_size)
+        else:
+            batches = iter_feature_batches(
+                os.path.join(folder_path, file_name), batch_size
+            )
+        stratify_by = None
+        if method == "stratified":
+            stratify_by = column or GEOMETRY_TYPE
+        return sample_batches(batches, sample_size, stratify_by=stratify_by)
+    except Exception as e:
+        print(
+            f"Error drawing {method} sample of {file_name}, using the first rows: {e}"
+        )
+        return None
+
+
+def profile_geospatial_file(
+    folder_path, file_name, profile_file, batch_size=100000, gdf=None
+):
+    """
+    Profiles every column of a file in batches and writes the profile to a JSON sidecar.
+
+    Only running aggregates are kept between batches, so memory stays constant for any
+    layer size. An already loaded GeoDataFrame is profiled in slices instead of being
+    read again.
+
+    Returns:
+        dict: The layer profile, or None if it could not be created.
+    """
+    try:
+        if gdf is not None:
+            batches = iter_frame_batches(gdf, batch_size)
+        else:
+            batches = iter_feature_batches(
+                os.path.join(folder_path, file_name), batch_size
+            )
+        profile = profile_batches(batches).to_dict()
+
+        with open(profile_file, "w") as f:
+            json.dump(profile, f, indent=2)
+        print(f"Column profile saved: {profile_file}")
+        return profile
+    except Exception as e:
+        print(f"Error profiling {file_name}: {e}")
+        return None
+
+
+def check_geospatial_file(folder_path, file_name, gdf=None):
+    """
+    Runs the geometry quality checks on a file, reading only its geometries unless an
+    already loaded GeoDataFrame is given.
+
+    Returns:
+        dict: Counts and sample offenders per check, or None if they could not be run.
+    """
+    file_path = os.path.join(folder_path, file_name)
+    try:
+        if gdf is None and file_name.endswith(".csv"):
+            gdf = read_csv_layer(file_path)
+        elif gdf is None:
+            gdf = gpd.read_file(
+                file_path, engine="pyogrio", on_invalid="ignore", columns=[]
+            )
+        if not isinstance(gdf, gpd.GeoDataFrame):
+            print(f"No geometry found in {file_name} to check")
+            return None
+        return check_geometry_quality(gdf)
+    except Exception as e:
+        print(f"Error checking geometries of {file_name}: {e}")
+        return None
+
+
+def add_geometry_quality(doc, quality):
+    """Adds geometry quality counts and sample offenders to a report document."""
+    doc.add_heading("Geometry Quality", level=1)
+    doc.add_paragraph(f"Geometries Checked: {quality['checked']}", style="List Bullet")
+    for check, label in [
+        ("missing", "Missing"),
+        ("empty", "Empty"),
+        ("invalid", "Invalid"),
+        ("self_intersecting", "Self-intersecting"),
+        ("duplicates", "Exact Duplicates"),
+        ("overlapping_pairs", "Overlapping Pairs"),
+    ]:
+        doc.add_paragraph(f"{label}: {quality[check]}", style="List Bullet")
+
+    samples = quality["samples"]
+    if samples["invalid"]:
+        doc.add_paragraph(
+            "Sample invalid rows: "
+            + "; ".join(
+                f"{item['row']} ({item['reason']})" for item in samples["invalid"]
+            )
+        )
+    if samples["self_intersecting"]:
+        doc.add_paragraph(
+            "Sample self-intersecting rows: "
+            + ", ".join(map(str, samples["self_intersecting"]))
+        )
+    if samples["duplicates"]:
+        doc.add_paragraph(
+            "Sample duplicate rows: " + ", ".join(map(str, samples["duplicates"]))
+        )
+    if samples["overlapping_pairs"]:
+        doc.add_paragraph(
+            "Sample overlapping row pairs: "
+            + ", ".join(f"{a}/{b}" for a, b in samples["overlapping_pairs"])
+        )
+
+
+def add_profile_table(doc, profile):
+    """Adds a column profile as a table to a report document."""
+    doc.add_heading("Column Profile", level=1)
+    doc.add_paragraph(f"Rows profiled: {profile['row_count']}", style="List Bullet")
+    doc.add_paragraph(f"Bounding Box: {profile['bounds']}", style="List Bullet")
+    doc.add_paragraph(
+        f"Empty Geometries: {profile['empty_geometries']}", style="List Bullet"
+    )
+
+    headings = [
+        "Column",
+        "Type",
+        "Null %",
+        "Distinct (approx.)",
+        "Min",
+        "Max",
+        "Length",
+    ]
+    table = doc.add_table(rows=1, cols=len(headings))
+    table.style = "Table Grid"
+    for cell, heading in zip(table.rows[0].cells, headings):
+        cell.text = heading
+    for column in profile["columns"]:
+        length = (
+            f"{column['min_length']}-{column['max_length']}"
+            if column["min_length"] is not None
+            else ""
+        )
+        values = [
+            column["column"],
+            column["dtype"],
+            f"{column['null_rate']:.1%}",
+            str(column["distinct_estimate"]),
+            str(column["min"])[:40] if column["min"] is not None else "",
+            str(column["max"])[:40] if column["max"] is not None else "",
+            length,
+        ]
+        for cell, value in zip(table.add_row().cells, values):
+            cell.text = value
+
+
+def add_report_heading(doc, dataset, folder_data):
+    """Adds the report title and the folder contents to a report document."""
+    doc.add_heading(f"{dataset} Analysis Report", 0)
+
+    doc.add_heading("Folder Contents:", level=1)
+    for file, details in folder_data.items():
+        doc.add_paragraph(f"{file}: {details}", style="List Bullet")
+
+
+def add_file_section(doc, geospatial_data, image_file, geospatial_file):
+    """
+    Adds the analysis of one geospatial file to a report document: metadata, the
+    dataset plot, coverage overview, column profile and a GeoJSON sample.
 
     Args:
-        folder_data (dict): Folder contents.
+        doc (Document): Report document to add to.
         geospatial_data (dict): Geospatial metadata.
-        output_file (str): Report file path.
         image_file (str): Dataset plot path.
-        first_report (bool): Whether this is the first report (keeps the main heading & folder contents).
-        dataset (str): Name of the dataset.
         geospatial_file (str): Name of the geospatial file being analyzed.
     """
-    doc = Document()
-
-    if first_report:
-        doc.add_heading(f"{dataset} Analysis Report", 0)
-
-        # Folder contents only in the first report
-        doc.add_heading("Folder Contents:", level=1)
-        for file, details in folder_data.items():
-            doc.add_paragraph(f"{file}: {details}", style="List Bullet")
-
     doc.add_heading(f"{geospatial_file} Analysis:", level=1)
     doc.add_paragraph(
         f"Geometry Type: {geospatial_data['geometry_type']}", style="List Bullet"
@@ -128,6 +452,20 @@ def generate_report(
     else:
         doc.add_paragraph("No image available for visualisation.")
 
+    overview_file = geospatial_data.get("overview_file")
+    if overview_file and os.path.exists(overview_file):
+        doc.add_heading("Coverage Overview", level=1)
+        doc.add_picture(overview_file, width=Inches(6))
+        doc.add_paragraph(
+            f"Figure: Density of all feature vertices in the layer ({overview_file})"
+        )
+
+    if geospatial_data.get("geometry_quality"):
+        add_geometry_quality(doc, geospatial_data["geometry_quality"])
+
+    if geospatial_data.get("profile"):
+        add_profile_table(doc, geospatial_data["profile"])
+
     doc.add_heading("GeoJSON Sample Data", level=1)
     if os.path.exists(geospatial_data["geojson_file"]):
         with open(geospatial_data["geojson_file"], "r") as geojson_file:
@@ -136,103 +474,397 @@ def generate_report(
     else:
         doc.add_paragraph("No GeoJSON file available.")
 
+
+def generate_report(
+    folder_data,
+    geospatial_data,
+    output_file,
+    image_file,
+    first_report,
+    dataset,
+    geospatial_file,
+):
+    """
+    Generates a report summarising the dataset, including metadata, folder contents,
+    a map plot, and a GeoJSON sample.
+
+    Args:
+        folder_data (dict): Folder contents.
+        geospatial_data (dict): Geospatial metadata.
+        output_file (str): Report file path.
+        image_file (str): Dataset plot path.
+        first_report (bool): Whether this is the first report (keeps the main heading & folder contents).
+        dataset (str): Name of the dataset.
+        geospatial_file (str): Name of the geospatial file being analyzed.
+    """
+    doc = Document()
+
+    if first_report:
+        add_report_heading(doc, dataset, folder_data)
+
+    add_file_section(doc, geospatial_data, image_file, geospatial_file)
+
     doc.save(output_file)
     print(f"Report saved: {output_file}")
     return doc
 
 
-async def process_dataset(dataset, input_dir, output_dir):
+async def render_map(browser, semaphore, map_html_path, image_file, timeout=10000):
     """
-    Processes all shapefiles in a dataset folder by analysing each, generating individual reports,
-    and then merging them into a single consolidated DOCX report.
+    Renders a map HTML file to a PNG screenshot in a new page of a shared browser.
+
+    Waits until the map tiles report they are loaded rather than for a fixed time,
+    giving up after `timeout` milliseconds and taking the screenshot anyway.
+    """
+    async with semaphore:
+        page = await browser.new_page()
+        try:
+            await page.goto(f"file://{os.path.abspath(map_html_path)}")
+            try:
+                await page.wait_for_function(MAP_LOADED_JS, timeout=timeout)
+            except PlaywrightTimeoutError:
+                print(f"Map tiles still loading after {timeout} ms: {map_html_path}")
+            await page.screenshot(path=image_file, full_page=True)
+            print(f"Map saved: {image_file}")
+        except Exception as e:
+            print(f"Error rendering map {map_html_path}: {e}")
+        finally:
+            await page.close()
+
+
+async def render_maps(map_files, max_pages=4):
+    """
+    Renders map HTML files to PNG screenshots with a single headless browser.
 
     Args:
-        dataset (str): Name of the dataset folder.
-        input_dir (str): Path to input directory containing geospatial files.
-        output_dir (str): Path to output directory for reports and visualizations.
+        map_files (list): (map_html_path, image_file) pairs to render.
+        max_pages (int): Maximum number of pages rendering at the same time.
     """
-    # Create output directory if it doesn't exist
-    os.makedirs(output_dir, exist_ok=True)
+    if not map_files:
+        return
 
-    print(f"Looking for geospatial files in: {input_dir}")
-    geospatial_files = find_geospatial_files(input_dir)
+    semaphore = asyncio.Semaphore(max_pages)
+    async with async_playwright() as p:
+        try:
+            browser = await p.chromium.launch()
+        except Exception as e:
+            print(f"Error launching browser, maps will not be rendered: {e}")
+            return
+        try:
+            await asyncio.gather(
+                *(
+                    render_map(browser, semaphore, map_html_path, image_file)
+                    for map_html_path, image_file in map_files
+                )
+            )
+        finally:
+            await browser.close()
 
-    if not geospatial_files:
-        print("No geospatial files found.")
-        return
 
-    print("Geospatial files found:", geospatial_files)
+def analyse_dataset_file(
+    dataset,
+    input_dir,
+    output_dir,
+    geospatial_file,
+    renderer="browser",
+    overview=False,
+    batch_size=100000,
+    summary="full",
+    profile=False,
+    geometry_checks=False,
+    sample_method="head",
+    sample_column=None,
+):
+    """
+    Loads and analyses one geospatial file and writes its sample, overview, profile and
+    plot (or, for the browser renderer, the map HTML to screenshot later).
 
-    report_files = []
-    folder_description = analyse_folder(input_dir)
+    Kept at module level and independent of other files so it can run in a worker
+    process.
 
-    for index, geospatial_file in enumerate(geospatial_files):
-        print(f"\nProcessing: {geospatial_file} ({index + 1}/{len(geospatial_files)})")
+    Returns:
+        tuple: (geospatial_file, geospatial_data, report_output_file, data_plot_file,
+            map_file), where map_file is a (map_html_path, image_file) pair to render in
+            the browser or None, or None if the file could not be analysed.
+    """
+    name = output_name(geospatial_file)
+    geojson_output_file = os.path.join(output_dir, f"{dataset}_{name}_sample.geojson")
+    data_plot_file = os.path.join(output_dir, f"{dataset}_{name}_plot.png")
+    report_output_file = os.path.join(
+        output_dir, f"{dataset}_{name}_analysis_report.docx"
+    )
 
-        geojson_output_file = os.path.join(
-            output_dir, f"{dataset}_{geospatial_file}_sample.geojson"
+    if summary == "metadata":
+        sample = None
+        if sample_method != "head":
+            sample = draw_sample(
+                input_dir, geospatial_file, sample_method, sample_column, 50, batch_size
+            )
+        geospatial_data, gdf = summarise_geospatial_file(
+            input_dir, geospatial_file, geojson_output_file, sample=sample
         )
-        data_plot_file = os.path.join(
-            output_dir, f"{dataset}_{geospatial_file}_plot.png"
+    else:
+        gdf = load_geospatial_file(input_dir, geospatial_file)
+        if gdf is None:
+            return None
+
+        sample = None
+        if sample_method != "head":
+            sample = draw_sample(
+                input_dir,
+                geospatial_file,
+                sample_method,
+                sample_column,
+                50,
+                batch_size,
+                gdf=gdf,
+            )
+        geospatial_data = analyse_geospatial_file(
+            gdf, geojson_output_file, input_dir, geospatial_file, sample=sample
         )
-        report_output_file = os.path.join(
-            output_dir, f"{dataset}_{geospatial_file}_analysis_report.docx"
+    if geospatial_data is None:
+        return None
+
+    if overview:
+        geospatial_data["overview_file"] = create_overview_map(
+            input_dir,
+            geospatial_file,
+            os.path.join(output_dir, f"{dataset}_{name}_overview.png"),
+            batch_size,
         )
 
-        gdf = load_geospatial_file(input_dir, geospatial_file)
-        if gdf is None:
-            continue
+    if profile:
+        profile_file = os.path.join(output_dir, f"{dataset}_{name}_profile.json")
+        geospatial_data["profile"] = profile_geospatial_file(
+            input_dir,
+            geospatial_file,
+            profile_file,
+            batch_size,
+            gdf=gdf if summary == "full" else None,
+        )
+        if geospatial_data["profile"] is not None:
+            geospatial_data["profile_file"] = profile_file
 
-        geospatial_data = analyse_geospatial_file(
-            gdf, geojson_output_file, input_dir, geospatial_file
+    if geometry_checks:
+        geospatial_data["geometry_quality"] = check_geospatial_file(
+            input_dir, geospatial_file, gdf=gdf if summary == "full" else None
         )
-        if geospatial_data is None:
-            continue
 
+    map_file = None
+    if renderer == "static":
+        try:
+            render_static_map(gdf.iloc[:1], data_plot_file, title=geospatial_file)
+        except Exception as e:
+            print(f"Error rendering map for {geospatial_file}: {e}")
+    else:
         m = gdf.iloc[:1].explore()
-        map_html_path = os.path.join(output_dir, f"map_{geospatial_file}.html")
+        map_html_path = os.path.join(output_dir, f"map_{name}.html")
         m.save(map_html_path)
+        map_file = (map_html_path, data_plot_file)
+
+    return (
+        geospatial_file,
+        geospatial_data,
+        report_output_file,
+        data_plot_file,
+        map_file,
+    )
 
-        async with async_playwright() as p:
-            browser = await p.chromium.launch()
-            page = await browser.new_page()
-            await page.goto(f"file://{os.path.abspath(map_html_path)}")
-            await page.wait_for_timeout(3000)  # Wait for 3 seconds
-            await page.screenshot(path=data_plot_file, full_page=True)
-            print(f"Map saved: {data_plot_file}")
-            await browser.close()
 
-        first_report = index == 0
-        generate_report(
-            folder_description,
-            geospatial_data,
-            report_output_file,
-            data_plot_file,
-            first_report,
-            dataset,
-            geospatial_file,
-        )
-        report_files.append(report_output_file)
+async def process_dataset(
+    dataset,
+    input_dir,
+    output_dir,
+    render_concurrency=4,
+    renderer="browser",
+    overview=False,
+    batch_size=100000,
+    summary="full",
+    profile=False,
+    workers=1,
+    incremental=False,
+    recursive=False,
+    per_file_reports=False,
+    geometry_checks=False,
+    sample_method="head",
+    sample_column=None,
+):
+    """
+    Processes all shapefiles in a dataset folder by analysing each and building a single
+    consolidated DOCX report with a section per file, optionally with individual reports.
 
-    if len(report_files) > 1:
-        final_report_path = os.path.join(
-            output_dir, f"{dataset}_final_analysis_report.docx"
+    Args:
+        dataset (str): Name of the dataset folder.
+        input_dir (str): Path to input directory containing geospatial files.
+        output_dir (str): Path to output directory for reports and visualizations.
+        render_concurrency (int): Maximum number of maps rendered at the same time.
+        renderer (str): "browser" to screenshot a folium map in headless Chromium, or
+            "static" to draw the geometries straight to PNG with matplotlib.
+        overview (bool): Whether to add a rasterised coverage map of every feature.
+        batch_size (int): Number of features read at a time when streaming a layer.
+        summary (str): "full" to load each layer, or "metadata" to summarise it from
+            layer metadata and read only the sample rows.
+        profile (bool): Whether to profile every column and write a JSON sidecar.
+        workers (int): Number of processes analysing files in parallel.
+        incremental (bool): Whether to reuse results from the catalog in the output
+            directory for files that have not changed since the last run.
+        recursive (bool): Whether to include files in nested folders.
+        per_file_reports (bool): Whether to also save a separate report for each file.
+        geometry_checks (bool): Whether to check for invalid, empty, self-intersecting,
+            duplicate and overlapping geometries.
+        sample_method (str): "head" for the first rows, "reservoir" for a uniform
+            random sample, or "stratified" for a sample split by `sample_column`.
+        sample_column (str): Column to stratify by, or None for geometry type.
+    """
+    # Create output directory if it doesn't exist
+    os.makedirs(output_dir, exist_ok=True)
+
+    print(f"Looking for geospatial files in: {input_dir}")
+    geospatial_files = find_geospatial_files(input_dir, recursive)
+
+    if not geospatial_files:
+        print("No geospatial files found.")
+        return
+
+    print("Geospatial files found:", geospatial_files)
+
+    folder_description = analyse_folder(input_dir, recursive)
+    options = dict(
+        renderer=renderer,
+        overview=overview,
+        batch_size=batch_size,
+        summary=summary,
+        profile=profile,
+        geometry_checks=geometry_checks,
+        sample_method=sample_method,
+        sample_column=sample_column,
+    )
+
+    results = [None] * len(geospatial_files)
+    pending = list(range(len(geospatial_files)))
+    catalog = None
+    if incremental:
+        catalog = open_catalog(output_dir)
+        catalog_options = dict(options, dataset=dataset)
+        pending = []
+        for index, geospatial_file in enumerate(geospatial_files):
+            results[index] = lookup_analysis(
+                catalog,
+                output_dir,
+                os.path.join(input_dir, geospatial_file),
+                catalog_options,
+            )
+            if results[index] is None:
+                pending.append(index)
+        print(
+            f"{len(geospatial_files) - len(pending)} unchanged files reused from the "
+            f"catalog, {len(pending)} to analyse"
         )
-        merged_doc = Document(report_files[0])
 
-        for report in report_files[1:]:
-            doc_to_merge = Document(report)
-            merged_doc.add_page_break()
-            doc_heading = f"{geospatial_files[report_files.index(report)]} Analysis:"
-            merged_doc.add_heading(doc_heading, level=1)
-            for element in doc_to_merge.paragraphs:
-                merged_doc.add_paragraph(element.text)
+    if workers > 1 and len(pending) > 1:
+        print(f"Analysing {len(pending)} files with {workers} workers")
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # gather keeps results in file order whatever order the workers finish in
+            analysed = await asyncio.gather(
+                *(
+                    loop.run_in_executor(
+                        executor,
+                        partial(
+                            analyse_dataset_file,
+                            dataset,
+                            input_dir,
+                            output_dir,
+                            geospatial_files[index],
+                            **options,
+                        ),
+                    )
+                    for index in pending
+                )
+            )
+        for index, result in zip(pending, analysed):
+            results[index] = result
+    else:
+        for count, index in enumerate(pending):
+            geospatial_file = geospatial_files[index]
+            print(f"\nProcessing: {geospatial_file} ({count + 1}/{len(pending)})")
+            results[index] = analyse_dataset_file(
+                dataset, input_dir, output_dir, geospatial_file, **options
+            )
+
+    if catalog is not None:
+        for index in pending:
+            if results[index] is not None:
+                store_analysis(
+                    catalog,
+                    output_dir,
+                    os.path.join(input_dir, geospatial_files[index]),
+                    catalog_options,
+                    results[index],
+                )
+        catalog.close()
+
+    analysed_files = [result for result in results if result is not None]
+
+    # Render every map with one shared browser
+    await render_maps(
+        [map_file for *_, map_file in analysed_files if map_file is not None],
+        max_pages=render_concurrency,
+    )
 
-        merged_doc.save(final_report_path)
-        print(f"\nFinal merged report saved: {final_report_path}")
+    if not analysed_files:
+        return
 
+    # Build the merged report in memory, one section per file in the original order
+    final_report = Document()
+    add_report_heading(final_report, dataset, folder_description)
+    for index, (
+        geospatial_file,
+        geospatial_data,
+        report_output_file,
+        data_plot_file,
+        _,
+    ) in enumerate(analysed_files):
+        if index > 0:
+            final_report.add_page_break()
+        add_file_section(final_report, geospatial_data, data_plot_file, geospatial_file)
+
+        if per_file_reports:
+            generate_report(
+                folder_description,
+                geospatial_data,
+                report_output_file,
+                data_plot_file,
+                index == 0,
+                dataset,
+                geospatial_file,
+            )
+
+    final_report_path = os.path.join(
+        output_dir, f"{dataset}_final_analysis_report.docx"
+    )
+    final_report.save(final_report_path)
+    print(f"\nFinal merged report saved: {final_report_path}")
 
-def generate_eda_report(dataset, input_dir, output_dir):
+
+def generate_eda_report(
+    dataset,
+    input_dir,
+    output_dir,
+    render_concurrency=4,
+    renderer="browser",
+    overview=False,
+    batch_size=100000,
+    summary="full",
+    profile=False,
+    workers=1,
+    incremental=False,
+    recursive=False,
+    per_file_reports=False,
+    geometry_checks=False,
+    sample_method="head",
+    sample_column=None,
+):
     """
     Generate an exploratory data analysis report for geospatial data.
 
@@ -244,5 +876,58 @@ def generate_eda_report(dataset, input_dir, output_dir):
         Path to input directory containing geospatial files
     output_dir : str
         Path to output directory for reports and visualizations
+    render_concurrency : int
+        Maximum number of maps rendered at the same time in the shared browser
+    renderer : str
+        "browser" for folium maps screenshotted in headless Chromium, or "static" for
+        offline matplotlib rendering without a browser or map tiles
+    overview : bool
+        Add a rasterised coverage map of every feature in each layer to the report
+    batch_size : int
+        Number of features read at a time when streaming a layer
+    summary : str
+        "full" to load each layer, or "metadata" to summarise it from layer metadata
+        and read only the sample rows
+    profile : bool
+        Profile every column in batches (null rates, approximate distinct counts,
+        min/max, value lengths and bounding box) into the report and a JSON sidecar
+    workers : int
+        Number of processes analysing files in parallel; maps are still rendered by one
+        shared browser or the static renderer, and the report keeps the file order
+    incremental : bool
+        Keep a catalog of analysed files (keyed on path, size, mtime and content hash)
+        in the output directory and only analyse new or changed files
+    recursive : bool
+        Include geospatial files in nested folders of the input directory
+    per_file_reports : bool
+        Also save a separate report for each file alongside the merged report
+    geometry_checks : bool
+        Count invalid, empty, self-intersecting, duplicate and overlapping geometries in
+        each layer and list sample offenders in the report
+    sample_method : str
+        "head" to sample the first rows, "reservoir" for a uniform random sample or
+        "stratified" for a sample split evenly by `sample_column`, both drawn in one
+        streaming pass with a fixed seed
+    sample_column : str
+        Column to stratify the sample by, or None to stratify by geometry type
     """
-    asyncio.run(process_dataset(dataset, input_dir, output_dir))
+    asyncio.run(
+        process_dataset(
+            dataset,
+            input_dir,
+            output_dir,
+            render_concurrency=render_concurrency,
+            renderer=renderer,
+            overview=overview,
+            batch_size=batch_size,
+            summary=summary,
+            profile=profile,
+            workers=workers,
+            incremental=incremental,
+            recursive=recursive,
+            per_file_reports=per_file_reports,
+            geometry_checks=geometry_checks,
+            sample_method=sample_method,
+            sample_column=sample_column,
+        )
+    )
@@ -0,0 +1,301 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyogrio
+import shapely
+from pyarrow import csv as pa_csv
+
+WKT_COLUMNS = ("wkt", "geometry", "geom", "the_geom")
+
+# pyarrow column types matching the dtypes from infer_csv_dtypes
+PYARROW_TYPES = {
+    "boolean": pa.bool_,
+    "Int64": pa.int64,
+    "float64": pa.float64,
+    "str": pa.string,
+}
+
+# Values pandas reads as missing by default, so pyarrow's CSV reader agrees with it
+CSV_NULL_VALUES = [
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "None",
+    "n/a",
+    "nan",
+    "null",
+]
+
+# Numbers with a leading zero, such as codes and identifiers, which must stay text
+LEADING_ZERO = r"[+-]?0\d"
+
+# Candidate (x column, y column, CRS) names for point coordinates, in order of preference
+COORDINATE_COLUMNS = [
+    (("longitude", "long", "lon", "lng"), ("latitude", "lat"), "EPSG:4326"),
+    (("easting", "x_coordinate"), ("northing", "y_coordinate"), "EPSG:27700"),
+]
+
+
+def read_layer_info(file_path, force_total_bounds=False):
+    """
+    Reads layer metadata (CRS, geometry type, feature count, fields and total bounds)
+    without reading any features.
+
+    Total bounds are only returned when the driver stores them, unless
+    `force_total_bounds` is set, in which case drivers without them scan the layer.
+    CSVs store no metadata and their geometry is detected from their columns, so they
+    are always scanned, see read_csv_info.
+    """
+    if file_path.endswith(".csv"):
+        return read_csv_info(file_path)
+    return pyogrio.read_info(file_path, force_total_bounds=force_total_bounds)
+
+
+def infer_csv_dtypes(file_path, sample_rows=10000):
+    """
+    Infers column dtypes from the first `sample_rows` rows of a CSV.
+
+    Integer and boolean columns use pandas' nullable dtypes so missing values later in
+    the file keep the column type. Text columns, and numeric columns with leading zeros
+    such as codes and identifiers, are read as strings so they keep them.
+    """
+    sample = pd.read_csv(file_path, nrows=sample_rows)
+    text = pd.read_csv(file_path, nrows=sample_rows, dtype=str)
+    dtypes = {}
+    for column, dtype in sample.dtypes.items():
+        if pd.api.types.is_bool_dtype(dtype):
+            dtypes[column] = "boolean"
+        elif text[column].str.match(LEADING_ZERO).any():
+            dtypes[column] = "str"
+        elif pd.api.types.is_integer_dtype(dtype):
+            dtypes[column] = "Int64"
+        elif pd.api.types.is_float_dtype(dtype):
+            dtypes[column] = "float64"
+        else:
+            dtypes[column] = "str"
+    return dtypes
+
+
+def apply_csv_dtypes(df, dtypes):
+    """
+    Converts a DataFrame read as strings to the dtypes inferred from a sample.
+
+    A column with a value that does not fit its dtype, such as text further down a
+    column that looked numeric, is kept as strings instead, and `dtypes` is updated so
+    the rest of the file is read the same way.
+    """
+    for column, dtype in list(dtypes.items()):
+        if dtype == "str" or column not in df.columns:
+            continue
+        values = df[column]
+        try:
+            if dtype == "boolean":
+                converted = values.str.lower().map({"true": True, "false": False})
+                if converted.isna().sum() != values.isna().sum():
+                    raise ValueError(f"not all values of '{column}' are true or false")
+                converted = converted.astype("boolean")
+            else:
+                converted = pd.to_numeric(values).astype(dtype)
+        except (TypeError, ValueError) as e:
+            print(f"Reading column '{column}' as text, not {dtype}: {e}")
+            dtypes[column] = "str"
+            continue
+        df[column] = converted
+    return df
+
+
+def read_csv_frame(file_path, dtypes):
+    """
+    Reads a whole CSV with pyarrow's multithreaded reader using the given dtypes, with
+    the same missing values as pandas.
+
+    Falls back to reading it with pandas as strings and converting column by column if
+    a value later in the file does not fit the dtype inferred from the sample.
+    """
+    column_types = {column: PYARROW_TYPES[dtype]() for column, dtype in dtypes.items()}
+    try:
+        table = pa_csv.read_csv(
+            file_path,
+            convert_options=pa_csv.ConvertOptions(
+                column_types=column_types,
+                null_values=CSV_NULL_VALUES,
+                strings_can_be_null=True,
+            ),
+        )
+    except pa.ArrowInvalid as e:
+        print(f"Column types inferred from the sample do not fit {file_path}: {e}")
+        return apply_csv_dtypes(pd.read_csv(file_path, dtype=str), dtypes)
+    return table.to_pandas(
+        types_mapper={pa.int64(): pd.Int64Dtype(), pa.bool_(): pd.BooleanDtype()}.get
+    )
+
+
+def find_column(columns, names):
+    """Returns the first column whose lower-cased name is one of `names`, or None."""
+    lookup = {column.lower(): column for column in columns}
+    return next((lookup[name] for name in names if name in lookup), None)
+
+
+def csv_to_geodataframe(df):
+    """
+    Builds a GeoDataFrame from a DataFrame with a WKT column, longitude/latitude columns
+    (EPSG:4326) or easting/northing columns (EPSG:27700), in one vectorised step.
+
+    Rows with missing or unparseable geometry get a missing geometry. Returns the
+    DataFrame unchanged if no geometry columns are found.
+    """
+    wkt_column = find_column(df.columns, WKT_COLUMNS)
+    if wkt_column is not None:
+        geometry = gpd.GeoSeries.from_wkt(
+            df[wkt_column].astype(object), on_invalid="ignore"
+        )
+        bounds = geometry.total_bounds
+        # WKT carries no CRS, so assume WGS84 when every coordinate fits it
+        geographic = not np.isnan(bounds).any() and (
+            bounds[0] >= -180
+            and bounds[2] <= 180
+            and bounds[1] >= -90
+            and bounds[3] <= 90
+        )
+        return gpd.GeoDataFrame(
+            df.drop(columns=wkt_column),
+            geometry=geometry.values,
+            crs="EPSG:4326" if geographic else None,
+        )
+
+    for x_names, y_names, crs in COORDINATE_COLUMNS:
+        x_column = find_column(df.columns, x_names)
+        y_column = find_column(df.columns, y_names)
+        if x_column is None or y_column is None:
+            continue
+        x = pd.to_numeric(df[x_column], errors="coerce").to_numpy(dtype=float)
+        y = pd.to_numeric(df[y_column], errors="coerce").to_numpy(dtype=float)
+        geometry = gpd.points_from_xy(x, y, crs=crs)
+        geometry[np.isnan(x) | np.isnan(y)] = None
+        return gpd.GeoDataFrame(df, geometry=geometry)
+
+    return df
+
+
+def read_csv_layer(file_path, max_features=None):
+    """
+    Reads a CSV into a GeoDataFrame, detecting its geometry columns.
+
+    Dtypes are inferred from a sample and the file is read with pyarrow's multithreaded
+    CSV reader, or with pandas when only the first `max_features` rows are wanted.
+    """
+    dtypes = infer_csv_dtypes(file_path)
+    if max_features is not None:
+        df = apply_csv_dtypes(
+            pd.read_csv(file_path, dtype=str, nrows=max_features), dtypes
+        )
+    else:
+        df = read_csv_frame(file_path, dtypes)
+    return csv_to_geodataframe(df)
+
+
+def read_csv_info(file_path, batch_size=100000):
+    """
+    Reads the same metadata as read_layer_info from a CSV by streaming it in batches
+    with the geometry detected as in read_csv_layer: the CRS, geometry types, row
+    count, attribute columns and the bounds of the geometries that are present.
+    """
+    info = {
+        "crs": None,
+        "geometry_type": None,
+        "features": 0,
+        "fields": [],
+        "total_bounds": None,
+    }
+    geometry_types = set()
+    bounds = []
+    for batch in iter_feature_batches(file_path, batch_size):
+        info["features"] += len(batch)
+        if not isinstance(batch, gpd.GeoDataFrame):
+            info["fields"] = list(batch.columns)
+            continue
+        info["fields"] = [
+            column for column in batch.columns if column != batch.geometry.name
+        ]
+        if info["crs"] is None and batch.crs is not None:
+            info["crs"] = batch.crs.to_string()
+        geometry_types.update(batch.geom_type.dropna())
+        geoms = np.asarray(batch.geometry.values)
+        present = geoms[~(shapely.is_missing(geoms) | shapely.is_empty(geoms))]
+        if len(present):
+            bounds.append(shapely.total_bounds(present))
+
+    if geometry_types:
+        info["geometry_type"] = ", ".join(sorted(geometry_types))
+    if bounds:
+        bounds = np.array(bounds)
+        info["total_bounds"] = (
+            *bounds[:, :2].min(axis=0).tolist(),
+            *bounds[:, 2:].max(axis=0).tolist(),
+        )
+    return info
+
+
+def record_batch_to_geodataframe(batch, geometry_name, crs):
+    """
+    Converts a record batch from pyogrio.open_arrow to a GeoDataFrame like the ones
+    gpd.read_file returns, with unparseable geometries as missing. Batches of layers
+    without geometry become DataFrames.
+    """
+    if geometry_name not in batch.schema.names:
+        return batch.to_pandas()
+    geometry = shapely.from_wkb(
+        batch.column(geometry_name).to_numpy(zero_copy_only=False), on_invalid="ignore"
+    )
+    return gpd.GeoDataFrame(
+        batch.drop_columns([geometry_name]).to_pandas(), geometry=geometry, crs=crs
+    )
+
+
+def iter_feature_batches(file_path, batch_size=100000, columns=None):
+    """
+    Yields a geospatial file (.shp, .gpkg, .csv) in batches of up to `batch_size` features,
+    so the whole layer is never held in memory at once.
+
+    Args:
+        file_path (str): Path to the file.
+        batch_size (int): Maximum number of features per batch.
+        columns (list): Attribute columns to read, None for all or [] for geometry only.
+    """
+    if file_path.endswith(".csv"):
+        dtypes = infer_csv_dtypes(file_path)
+        for batch in pd.read_csv(file_path, dtype=str, chunksize=batch_size):
+            batch = csv_to_geodataframe(apply_csv_dtypes(batch, dtypes))
+            if columns is not None and isinstance(batch, gpd.GeoDataFrame):
+                batch = batch[list(columns) + [batch.geometry.name]]
+            yield batch
+        return
+
+    # Stream record batches rather than skipping to each offset, which costs a scan
+    # of the features before it for many drivers
+    with pyogrio.open_arrow(
+        file_path, batch_size=batch_size, columns=columns, use_pyarrow=True
+    ) as (meta, reader):
+        geometry_name = meta["geometry_name"] or "wkb_geometry"
+        for batch in reader:
+            if batch.num_rows:
+                yield record_batch_to_geodataframe(batch, geometry_name, meta["crs"])
+
+
+def iter_frame_batches(gdf, batch_size=100000):
+    """Yields an already loaded (Geo)DataFrame in slices of up to `batch_size` rows."""
+    for start in range(0, len(gdf), batch_size):
+        yield gdf.iloc[start : start + batch_size]
@@ -0,0 +1,280 @@
+import json
+import os
+import sqlite3
+from contextlib import closing
+from itertools import chain
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyogrio
+import shapely
+from pyproj import CRS, Transformer
+
+# Ways of saving harvested layers: a GeoPackage per layer, one GeoPackage with a layer
+# per harvested layer, or a GeoParquet file per layer
+OUTPUT_WRITERS = ("gpkg", "single-gpkg", "parquet")
+
+# GeoPackage holding every layer with the "single-gpkg" writer
+SINGLE_GEOPACKAGE = "wfs_layers.gpkg"
+
+# Primary key of GeoPackage layers, so a "fid" attribute is kept as a column
+GPKG_FID = "gpkg_fid"
+
+
+def layer_output(output_dir, layer_name, writer="gpkg"):
+    """
+    Returns the file a layer is saved to with `writer` and the layer name within it.
+    """
+    name = layer_name.replace(":", "_")
+    if writer == "single-gpkg":
+        return os.path.join(output_dir, SINGLE_GEOPACKAGE), name
+    if writer == "parquet":
+        return os.path.join(output_dir, f"{name}.parquet"), name
+    return os.path.join(output_dir, f"{name}.gpkg"), name
+
+
+def count_saved_features(output_file, layer=None):
+    """
+    Returns the number of features saved in a layer, or 0 if it does not exist.
+
+    GeoPackages are counted through sqlite3, which rolls back a page left half
+    written by a killed harvest, where GDAL would refuse to open them read-only.
+    """
+    try:
+        if output_file.endswith(".parquet"):
+            return pq.ParquetFile(output_file).metadata.num_rows
+        if not os.path.exists(output_file):
+            return 0
+        with closing(sqlite3.connect(output_file)) as connection:
+            table = quote_identifier(layer)
+            return connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    except Exception:
+        return 0
+
+
+def quote_identifier(name):
+    """Quotes a table or column name for SQLite."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def last_feature_id(output_file, layer):
+    """Returns the highest FID in a GeoPackage layer, or 0 if it has none."""
+    try:
+        with closing(sqlite3.connect(output_file)) as connection:
+            return (
+                connection.execute(
+                    f"SELECT MAX({GPKG_FID}) FROM {quote_identifier(layer)}"
+                ).fetchone()[0]
+                or 0
+            )
+    except sqlite3.Error:
+        return 0
+
+
+def delete_features_after(output_file, layer, fid):
+    """
+    Deletes the features written to a GeoPackage layer after FID `fid`. The
+    GeoPackage triggers keep its spatial index and feature count in step.
+    """
+    with closing(sqlite3.connect(output_file)) as connection, connection:
+        connection.execute(
+            f"DELETE FROM {quote_identifier(layer)} WHERE {GPKG_FID} > ?", (fid,)
+        )
+
+
+def conform_batch(batch, schema):
+    """
+    Casts a record batch to `schema`, adding missing columns as nulls and dropping
+    columns that are not in it, so batches parsed from separate responses can be
+    written to the same layer.
+    """
+    if batch.schema.equals(schema):
+        return batch
+    columns = []
+    for field in schema:
+        if field.name in batch.schema.names:
+            columns.append(batch.column(field.name).cast(field.type, safe=False))
+        else:
+            columns.append(pa.nulls(batch.num_rows, field.type))
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def reproject_batch(batch, geometry_name, transformer):
+    """
+    Reprojects the WKB geometries of a record batch with a pyproj Transformer, one
+    vectorised call over every coordinate in the batch.
+    """
+    index = batch.schema.get_field_index(geometry_name)
+    field = batch.schema.field(index)
+    geometries = shapely.from_wkb(batch.column(index).to_numpy(zero_copy_only=False))
+    geometries = shapely.transform(
+        geometries, transformer.transform, include_z=None, interleaved=False
+    )
+    return batch.set_column(
+        index, field, pa.array(shapely.to_wkb(geometries), type=field.type)
+    )
+
+
+def geoparquet_metadata(geometry_name, geometry_type, crs):
+    """Builds the GeoParquet 1.1 "geo" metadata for a WKB geometry column."""
+    geometry_types = [] if geometry_type in (None, "Unknown") else [geometry_type]
+    return {
+        "version": "1.1.0",
+        "primary_column": geometry_name,
+        "columns": {
+            geometry_name: {
+                "encoding": "WKB",
+                "geometry_types": geometry_types,
+                "crs": CRS.from_user_input(crs).to_json_dict() if crs else None,
+            }
+        },
+    }
+
+
+class LayerWriter:
+    """
+    Writes a layer from record batches without converting them to GeoDataFrames.
+
+    Each call to write() streams its batches into a single pyogrio.write_arrow call,
+    which GDAL commits as one transaction, so a harvest that writes a page at a time
+    keeps every page written before a crash. If the batches fail partway, the ones
+    pyogrio already committed are deleted again, so a layer only ever holds whole
+    calls. A GeoPackage layer created by the first
+    call has its spatial index built once at the end of that call; later calls append
+    to it. GeoParquet files get one row group per batch and are only complete once the
+    writer is closed.
+
+    The first batch sets the layer's columns, and later batches are conformed to them.
+    With `target_crs`, each batch is reprojected before it is written. If the CRS of
+    the geometries is not known, they cannot be, so they are written as received
+    without a CRS rather than labelled with one they are not in.
+
+    Args:
+        output_file (str): GeoPackage or GeoParquet (.parquet) file to write.
+        layer (str): Name of the layer within a GeoPackage.
+        crs (str): CRS of the geometries, or None to use the one GDAL read from the
+            first response.
+        append (bool): Whether to add to an existing GeoPackage layer rather than
+            replacing it. GeoParquet files are always replaced.
+        target_crs (str): CRS to reproject the geometries to, or None to keep them.
+    """
+
+    def __init__(self, output_file, layer, crs=None, append=False, target_crs=None):
+        self.output_file = output_file
+        self.layer = layer
+        self.crs = crs
+        self.append = append
+        self.target_crs = target_crs
+        self.schema = None
+        self.transformer = None
+        self.parquet = None
+        self.features = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start(self, meta, batch):
+        """Takes the layer's columns, geometry and CRS from its first batch."""
+        self.schema = batch.schema
+        self.geometry_name = meta["geometry_name"] or "wkb_geometry"
+        self.geometry_type = meta["geometry_type"]
+        crs = self.crs or meta.get("crs")
+        if self.target_crs and not crs:
+            # Labelling the features with the target CRS would misplace them
+            print(
+                f"No CRS known for '{self.layer}', it is written as received "
+                f"and not reprojected to {self.target_crs}"
+            )
+        elif self.target_crs:
+            if not CRS.from_user_input(crs).equals(self.target_crs):
+                self.transformer = Transformer.from_crs(
+                    crs, self.target_crs, always_xy=True
+                )
+            crs = self.target_crs
+        self.crs = crs
+
+    def write(self, batches):
+        """
+        Writes (metadata, record batch) pairs, with the metadata from
+        pyogrio.open_arrow for the response the batch was parsed from, and commits
+        them to a GeoPackage before returning.
+
+        Returns:
+            int: Number of features written.
+        """
+        batches = iter(batches)
+        first = next(batches, None)
+        if first is None:
+            return 0
+        if self.schema is None:
+            self.start(*first)
+        written = 0
+
+        def stream():
+            nonlocal written
+            for _, batch in chain([first], batches):
+                batch = conform_batch(batch, self.schema)
+                if self.transformer:
+                    batch = reproject_batch(batch, self.geometry_name, self.transformer)
+                yield batch
+                written += batch.num_rows
+
+        if self.output_file.endswith(".parquet"):
+            if self.parquet is None:
+                metadata = geoparquet_metadata(
+                    self.geometry_name, self.geometry_type, self.crs
+                )
+                self.parquet = pq.ParquetWriter(
+                    self.output_file,
+                    self.schema.with_metadata({b"geo": json.dumps(metadata).encode()}),
+                    compression="zstd",
+                )
+            for batch in stream():
+                self.parquet.write_batch(batch)
+        else:
+            last_fid = (
+                last_feature_id(self.output_file, self.layer) if self.append else 0
+            )
+            try:
+                pyogrio.write_arrow(
+                    pa.RecordBatchReader.from_batches(self.schema, stream()),
+                    self.output_file,
+                    layer=self.layer,
+                    driver="GPKG",
+                    geometry_name=self.geometry_name,
+                    geometry_type=self.geometry_type,
+                    crs=self.crs,
+                    append=self.append,
+                    layer_options={"FID": GPKG_FID},
+                )
+            except BaseException:
+                if written:
+                    try:
+                        delete_features_after(self.output_file, self.layer, last_fid)
+                    except sqlite3.Error as e:
+                        print(f"Could not remove the partly written batches: {e}")
+                raise
+            self.append = True
+        self.features += written
+        return written
+
+    def close(self):
+        """Finishes a GeoParquet file. GeoPackage layers are already committed."""
+        if self.parquet is not None:
+            self.parquet.close()
+            self.parquet = None
+
+
+def write_layer(batches, output_file, layer, crs=None, append=False, target_crs=None):
+    """
+    Writes a layer from a stream of (metadata, record batch) pairs in one go, with
+    a single transaction for a GeoPackage layer. See LayerWriter for the arguments.
+
+    Returns:
+        int: Number of features written.
+    """
+    with LayerWriter(output_file, layer, crs, append, target_crs) as writer:
+        return writer.write(batches)
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import shapely
+
+
+def find_overlapping_pairs(geoms, rows, codes, sample_size=5):
+    """
+    Counts the pairs of geometries whose interiors intersect, which covers partial
+    overlaps, duplicates and containment but not polygons that only share an edge.
+
+    Exact duplicates always overlap each other, so each group of them, given by
+    `codes`, is put in an STRtree once and the pairs within it are counted
+    arithmetically. The tree is queried against itself, so only groups whose bounding
+    boxes intersect are compared, and a pair of overlapping groups counts every pair
+    of their rows. Many coincident points or copies of one geometry therefore cost
+    no more than one.
+
+    Args:
+        geoms (numpy.ndarray): Geometries of the layer.
+        rows (numpy.ndarray): Positions of the valid geometries to compare.
+        codes (numpy.ndarray): Duplicate group of each of `rows`.
+        sample_size (int): Number of example pairs to return.
+
+    Returns:
+        tuple: The number of overlapping pairs, and up to `sample_size` of them as
+            pairs of positions.
+    """
+    sizes = np.bincount(codes)
+    groups = rows[np.unique(codes, return_index=True)[1]]
+    tree = shapely.STRtree(geoms[groups])
+    left, right = tree.query(geoms[groups], predicate="intersects")
+    pairs = left < right
+    left, right = left[pairs], right[pairs]
+    pairs = shapely.relate_pattern(
+        geoms[groups[left]], geoms[groups[right]], "T********"
+    )
+    left, right = left[pairs], right[pairs]
+    count = int((sizes * (sizes - 1) // 2).sum() + (sizes[left] * sizes[right]).sum())
+
+    samples = []
+    for code in np.flatnonzero(sizes > 1)[:sample_size]:
+        members = rows[codes == code]
+        samples.extend((members[0], other) for other in members[1 : sample_size + 1])
+    samples.extend(zip(groups[left[:sample_size]], groups[right[:sample_size]]))
+    return count, samples[:sample_size]
+
+
+def check_geometry_quality(gdf, sample_size=5):
+    """
+    Finds missing, empty, invalid, self-intersecting, duplicate and overlapping
+    geometries in a layer.
+
+    Validity checks use vectorised shapely predicates. Exact duplicates are found by
+    hashing the WKB of the normalised geometries. Overlapping pairs are counted by
+    find_overlapping_pairs.
+
+    Args:
+        gdf (GeoDataFrame): Layer to check.
+        sample_size (int): Number of example offenders kept per check.
+
+    Returns:
+        dict: Counts per check and sample offenders, identified by row index.
+    """
+    geoms = np.asarray(gdf.geometry.values)
+    labels = gdf.index.to_numpy()
+
+    missing = shapely.is_missing(geoms)
+    empty = ~missing & shapely.is_empty(geoms)
+    present = ~missing & ~empty
+    valid = present & shapely.is_valid(geoms)
+    invalid = present & ~valid
+
+    reasons = np.full(len(geoms), None, dtype=object)
+    reasons[invalid] = shapely.is_valid_reason(geoms[invalid])
+    # Polygons report self-intersections as invalidity, lines as not being simple
+    lines = valid & np.isin(shapely.get_type_id(geoms), (1, 2, 5))
+    self_intersecting = (
+        invalid
+        & pd.Series(reasons).str.contains("Self-intersection", na=False).to_numpy()
+    )
+    self_intersecting[lines] |= ~shapely.is_simple(geoms[lines])
+
+    present_rows = np.flatnonzero(present)
+    wkb = pd.Series(shapely.to_wkb(shapely.normalize(geoms[present_rows])))
+    duplicate_rows = present_rows[wkb.duplicated(keep="first").to_numpy()]
+
+    in_valid = valid[present_rows]
+    codes, _ = pd.factorize(wkb[in_valid])
+    overlapping_count, overlapping_pairs = find_overlapping_pairs(
+        geoms, present_rows[in_valid], codes, sample_size
+    )
+
+    return {
+        "checked": len(geoms),
+        "missing": int(missing.sum()),
+        "empty": int(empty.sum()),
+        "invalid": int(invalid.sum()),
+        "self_intersecting": int(self_intersecting.sum()),
+        "duplicates": len(duplicate_rows),
+        "overlapping_pairs": overlapping_count,
+        "samples": {
+            "invalid": [
+                {"row": labels[row].item(), "reason": reasons[row]}
+                for row in np.flatnonzero(invalid)[:sample_size]
+            ],
+            "self_intersecting": [
+                labels[row].item()
+                for row in np.flatnonzero(self_intersecting)[:sample_size]
+            ],
+            "duplicates": [labels[row].item() for row in duplicate_rows[:sample_size]],
+            "overlapping_pairs": [
+                [labels[a].item(), labels[b].item()] for a, b in overlapping_pairs
+            ],
+        },
+    }
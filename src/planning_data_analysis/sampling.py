@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+GEOMETRY_TYPE = "geometry_type"
+
+# Working columns added to the sample while it is being drawn
+KEY_COLUMN = "_sample_key"
+ROW_COLUMN = "_sample_row"
+STRATUM_COLUMN = "_sample_stratum"
+
+# Stratum of the rows whose own stratum was found after the sample had room for more
+OTHER_STRATUM = "\0other"
+
+
+def keep_lowest_keys(rows, per_stratum):
+    """Keeps the `per_stratum` rows with the lowest random keys in each stratum."""
+    rank = rows.groupby(STRATUM_COLUMN, sort=False)[KEY_COLUMN].rank(method="first")
+    return rows[rank <= per_stratum]
+
+
+def fold_strata(strata, known, max_strata):
+    """
+    Adds strata not seen before to `known` (a dict, to keep the order they were found
+    in) until it holds `max_strata`, and maps the strata beyond those to OTHER_STRATUM.
+    """
+    for value in pd.unique(strata):
+        if value not in known and len(known) < max_strata:
+            known[value] = None
+    return np.where(pd.Series(strata).isin(known).to_numpy(), strata, OTHER_STRATUM)
+
+
+def sample_batches(batches, sample_size=50, stratify_by=None, seed=42):
+    """
+    Draws a uniform random sample from feature batches in one streaming pass.
+
+    Every row gets a random key from a generator with a fixed seed, and only the rows
+    with the `sample_size` lowest keys seen so far are kept (a bottom-k reservoir), so
+    memory depends on the sample size rather than the layer size and the same input
+    always gives the same sample.
+
+    With `stratify_by` the sample is split evenly between strata, at least one row
+    each, so rare values or geometry types are still shown. Each stratum keeps a
+    reservoir of its share, which shrinks as more strata are found, so the sample and
+    the rows held never exceed `sample_size`. Strata found once `sample_size - 1`
+    others have been are sampled together as one.
+
+    Args:
+        batches (iterable): DataFrames or GeoDataFrames covering the layer.
+        sample_size (int): Number of rows to draw.
+        stratify_by (str): "geometry_type", a column name, or None for a uniform sample.
+        seed (int): Random seed.
+
+    Returns:
+        DataFrame: The sampled rows in their original order, indexed by row number, or
+            None if there were no rows.
+    """
+    rng = np.random.default_rng(seed)
+    sample = None
+    offset = 0
+    known = {}
+    other = False
+    per_stratum = sample_size
+    for batch in batches:
+        batch = batch.reset_index(drop=True)
+        if stratify_by == GEOMETRY_TYPE:
+            strata = batch.geom_type.fillna("None").to_numpy()
+        elif stratify_by:
+            strata = batch[stratify_by].astype(str).to_numpy()
+        else:
+            strata = np.zeros(len(batch), dtype=int)
+        if stratify_by:
+            strata = fold_strata(strata, known, sample_size - 1)
+            other = other or bool((strata == OTHER_STRATUM).any())
+            per_stratum = max(1, sample_size // max(1, len(known) + other))
+        batch[KEY_COLUMN] = rng.random(len(batch))
+        batch[ROW_COLUMN] = np.arange(offset, offset + len(batch))
+        batch[STRATUM_COLUMN] = strata
+        offset += len(batch)
+
+        batch = keep_lowest_keys(batch, per_stratum)
+        if sample is not None:
+            batch = pd.concat([sample, batch], ignore_index=True)
+        sample = keep_lowest_keys(batch, per_stratum)
+
+    if sample is None or sample.empty:
+        return None
+
+    return (
+        sample.sort_values(ROW_COLUMN)
+        .set_index(ROW_COLUMN)
+        .rename_axis(None)
+        .drop(columns=[KEY_COLUMN, STRATUM_COLUMN])
+    )
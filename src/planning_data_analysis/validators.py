@@ -19,4 +19,42 @@ def validate_url(ctx, param, value):
     parsed = urlparse(value)
     if parsed.scheme and parsed.netloc:
         return value
-    raise click.BadParameter(f"'{value}' must be a valid URL.")
\ No newline at end of file
+    raise click.BadParameter(f"'{value}' must be a valid URL.")
+
+def validate_k(ctx, param, value):
+    """
+    Validate the number of clusters.
+    Accepts a single integer, "min:max" for a range to sweep, or "auto" for 2:20.
+    """
+    value = str(value).strip().lower()
+    if value == "auto":
+        return (2, 20)
+    try:
+        if ":" in value:
+            k_min, k_max = (int(part) for part in value.split(":", 1))
+            if 2 <= k_min <= k_max:
+                return (k_min, k_max)
+        elif int(value) >= 2:
+            return int(value)
+    except ValueError:
+        pass
+    raise click.BadParameter(
+        f"'{value}' must be an integer >= 2, a range 'min:max' or 'auto'."
+    )
+
+def validate_crs(ctx, param, value):
+    """
+    Validate a coordinate reference system such as "EPSG:27700".
+    Accepts anything pyproj understands, or nothing.
+    """
+    if value is None:
+        return value
+    # Imported here so the CLI can start without loading pyproj
+    from pyproj import CRS
+    from pyproj.exceptions import CRSError
+
+    try:
+        CRS.from_user_input(value)
+    except CRSError:
+        raise click.BadParameter(f"'{value}' must be a CRS such as 'EPSG:27700'.")
+    return value
@@ -1,8 +1,263 @@
+import hashlib
+import json
+import math
 import os
+import tempfile
+import threading
+import time
 import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
+from itertools import islice
+from urllib.parse import urlparse
 
-import geopandas as gpd
+import numpy as np
+import pyarrow as pa
+import pyogrio
 import requests
+from pyproj import CRS
+from pyproj.exceptions import CRSError
+
+from planning_data_analysis.geo_writers import (
+    LayerWriter,
+    count_saved_features,
+    layer_output,
+    write_layer,
+)
+
+# Seconds to wait for a WFS server to respond
+REQUEST_TIMEOUT = 300
+
+# Bytes read from a response at a time while it is written to disk
+CHUNK_SIZE = 1 << 20
+
+WFS_NAMESPACE = "http://www.opengis.net/wfs/2.0"
+OWS_NAMESPACE = "http://www.opengis.net/ows/1.1"
+
+# BBOX tiles are given in WGS84 latitude/longitude order, and not split below this
+# size in degrees
+TILE_CRS = "urn:ogc:def:crs:EPSG::4326"
+MIN_TILE_SIZE = 1e-6
+
+# Harvest progress kept in the output directory
+CHECKPOINT_FILE = "wfs_checkpoint.json"
+
+# GetFeature output formats GDAL can read, most compact first, matched against the
+# formats a server offers, the file suffix responses are saved with, and whether the
+# features keep their ids
+OUTPUT_FORMATS = [
+    ("flatgeobuf", ".fgb", False),
+    ("json", ".json", True),
+    ("gml", ".gml", True),
+]
+DEFAULT_OUTPUT_FORMAT = "application/json"
+
+
+def fetch_capabilities(capabilities_url, cache_dir=None):
+    """
+    Downloads a GetCapabilities document to a file, streaming it to disk.
+
+    With `cache_dir`, the document is kept there with its ETag and Last-Modified
+    headers. The next fetch sends them back as If-None-Match/If-Modified-Since, and if
+    the server answers 304 Not Modified the cached copy is used without downloading
+    it again.
+
+    Returns:
+    -------
+    tuple
+        Path of the document, and whether it is a temporary file the caller must
+        remove, or (None, False) if it could not be fetched
+    """
+    headers = {}
+    if cache_dir:
+        key = hashlib.sha256(capabilities_url.encode()).hexdigest()[:16]
+        path = os.path.join(cache_dir, f"wfs_capabilities_{key}.xml")
+        validators_path = f"{path}.json"
+        if os.path.exists(path) and os.path.exists(validators_path):
+            with open(validators_path) as f:
+                validators = json.load(f)
+            if validators.get("etag"):
+                headers["If-None-Match"] = validators["etag"]
+            if validators.get("last_modified"):
+                headers["If-Modified-Since"] = validators["last_modified"]
+    else:
+        path = tempfile.NamedTemporaryFile(suffix=".xml", delete=False).name
+
+    try:
+        with requests.get(
+            capabilities_url, headers=headers, timeout=REQUEST_TIMEOUT, stream=True
+        ) as response:
+            if response.status_code == 304:
+                print("Capabilities not modified, using the cached copy")
+                return path, False
+            if response.status_code != 200:
+                print(
+                    f"Error fetching capabilities: {response.status_code} - "
+                    f"{response.text}"
+                )
+                return None, False
+            # Write to a temporary file first so a failed download cannot replace
+            # a good cached copy
+            with open(f"{path}.tmp", "wb") as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+            os.replace(f"{path}.tmp", path)
+            validators = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+    except requests.RequestException as e:
+        print(f"Error fetching capabilities: {e}")
+        return None, False
+
+    if cache_dir:
+        with open(validators_path, "w") as f:
+            json.dump(validators, f)
+    return path, not cache_dir
+
+
+def normalise_crs(name):
+    """
+    Turns a CRS name from a capabilities document, such as
+    urn:ogc:def:crs:EPSG::27700, into an authority code like EPSG:27700, or returns it
+    unchanged if pyproj does not recognise it.
+    """
+    try:
+        authority = CRS.from_user_input(name).to_authority()
+    except CRSError:
+        return name
+    return ":".join(authority) if authority else name
+
+
+def get_wfs_layer_metadata(capabilities_url, cache_dir=None):
+    """
+    Fetch and parse WFS GetCapabilities response to get the available layers, a
+    fingerprint of each layer's metadata, its default CRS, WGS84 extent and output
+    formats, and whether the server pages results and caps the number of features
+    per response.
+
+    The document is parsed incrementally with ElementTree.iterparse, and each
+    FeatureType element is cleared once it has been read, so large capabilities
+    documents are never held in memory whole.
+
+    Parameters:
+    ----------
+    capabilities_url : str
+        URL for the WFS GetCapabilities request
+    cache_dir : str
+        Directory to cache the document in, revalidated with its ETag, or None to
+        download it every time
+
+    Returns:
+    -------
+    dict
+        Metadata of each available layer by name: a "fingerprint" hash of its
+        FeatureType element that changes whenever the layer's metadata does, its
+        default "crs" or None, its "bbox" as (min lon, min lat, max lon, max lat) or
+        None, "paging" False if the server does not implement startIndex, the server's
+        "count_limit" or None, and the GetFeature "formats" offered for the layer
+    """
+    path, temporary = fetch_capabilities(capabilities_url, cache_dir)
+    if path is None:
+        return {}
+
+    constraints = {}
+    formats = []
+    layers = {}
+    operation = None
+    try:
+        for event, elem in ET.iterparse(path, events=("start", "end")):
+            if elem.tag == f"{{{OWS_NAMESPACE}}}Operation":
+                operation = elem.get("name") if event == "start" else None
+            if event != "end":
+                continue
+
+            if elem.tag == f"{{{OWS_NAMESPACE}}}Constraint":
+                # Service constraints on paging and the number of features per response
+                constraints[elem.get("name")] = elem.findtext(
+                    f"{{{OWS_NAMESPACE}}}DefaultValue"
+                )
+            elif (
+                elem.tag == f"{{{OWS_NAMESPACE}}}Parameter"
+                and elem.get("name") == "outputFormat"
+                and operation in (None, "GetFeature")
+            ):
+                # GetFeature output formats, unless a layer lists its own
+                formats.extend(
+                    value.text.strip()
+                    for value in elem.iter(f"{{{OWS_NAMESPACE}}}Value")
+                    if value.text
+                )
+            elif elem.tag == f"{{{WFS_NAMESPACE}}}FeatureType":
+                name = elem.findtext(f"{{{WFS_NAMESPACE}}}Name")
+                default_crs = elem.findtext(f"{{{WFS_NAMESPACE}}}DefaultCRS")
+                if name:
+                    layers[name] = {
+                        "fingerprint": hashlib.sha256(ET.tostring(elem)).hexdigest(),
+                        "crs": (
+                            normalise_crs(default_crs.strip()) if default_crs else None
+                        ),
+                        "bbox": parse_wgs84_bbox(elem),
+                        "formats": [
+                            value.text.strip()
+                            for value in elem.iter(f"{{{WFS_NAMESPACE}}}Format")
+                            if value.text
+                        ],
+                    }
+                elem.clear()
+    except ET.ParseError as e:
+        print(f"Error parsing capabilities: {e}")
+        return {}
+    finally:
+        if temporary:
+            os.remove(path)
+
+    paging = (constraints.get("ImplementsResultPaging") or "TRUE").upper() != "FALSE"
+    try:
+        count_limit = int(constraints["CountDefault"])
+    except (KeyError, TypeError, ValueError):
+        count_limit = None
+    for metadata in layers.values():
+        metadata["paging"] = paging
+        metadata["count_limit"] = count_limit
+        metadata["formats"] = metadata["formats"] or formats
+    return layers
+
+
+def parse_wgs84_bbox(feature_type):
+    """Returns a FeatureType's WGS84BoundingBox as a tuple, or None if it has none."""
+    bbox = feature_type.find(f"{{{OWS_NAMESPACE}}}WGS84BoundingBox")
+    if bbox is None:
+        return None
+    try:
+        lower = bbox.findtext(f"{{{OWS_NAMESPACE}}}LowerCorner").split()
+        upper = bbox.findtext(f"{{{OWS_NAMESPACE}}}UpperCorner").split()
+        return tuple(float(value) for value in (*lower, *upper))
+    except (AttributeError, ValueError):
+        return None
+
+
+def choose_output_format(formats, need_ids=False):
+    """
+    Picks the most compact GetFeature output format a server offers.
+
+    FlatGeobuf drops feature ids, which repeated pages and features on tile edges are
+    found by, so with `need_ids` only formats that keep them are picked.
+
+    Returns:
+    -------
+    tuple
+        The format as the server names it and the file suffix to save responses with,
+        or GeoJSON if none of the offered formats is known
+    """
+    for key, suffix, keeps_ids in OUTPUT_FORMATS:
+        if need_ids and not keeps_ids:
+            continue
+        for output_format in formats or []:
+            if key in output_format.lower():
+                return output_format, suffix
+    return DEFAULT_OUTPUT_FORMAT, ".json"
 
 
 def get_wfs_capabilities(capabilities_url):
@@ -19,88 +274,873 @@ def get_wfs_capabilities(capabilities_url):
     list
         List of available layer names
     """
-    response = requests.get(capabilities_url)
-    if response.status_code == 200:
-        # Parse the XML response
-        root = ET.fromstring(response.text)
-
-        # Find all layers (FeatureType Name tags)
-        namespaces = {"wfs": "http://www.opengis.net/wfs/2.0"}
-        layers = [
-            elem.text
-            for elem in root.findall(
-                ".//{http://www.opengis.net/wfs/2.0}FeatureType/{http://www.opengis.net/wfs/2.0}Name",
-                namespaces,
-            )
-        ]
+    layers = list(get_wfs_layer_metadata(capabilities_url))
 
-        # Print the list of layers
-        print("Available layers:")
-        for layer in layers:
-            print(layer)
-        return layers
-    else:
-        print(f"Error fetching capabilities: {response.status_code} - {response.text}")
-        return []
+    # Print the list of layers
+    print("Available layers:")
+    for layer in layers:
+        print(layer)
+    return layers
 
 
-def collect_wfs_data(wfs_url, layer_name, output_dir):
+class HarvestCheckpoint:
     """
-    Collect data for a specific WFS layer and save it as a GeoPackage.
+    Progress of a harvest saved to a JSON file in the output directory after every
+    page, so an interrupted harvest can carry on where it stopped.
+
+    For each layer it records the feature count and capabilities fingerprint the
+    harvest started from, the number of features committed to the GeoPackage, the
+    startIndex of the next page and whether the layer is complete.
+    """
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, CHECKPOINT_FILE)
+        self.lock = threading.Lock()
+        self.layers = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    self.layers = json.load(f).get("layers", {})
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable checkpoint '{self.path}': {e}")
+
+    def get(self, layer_name):
+        """Returns the saved progress of a layer, or an empty dict."""
+        with self.lock:
+            return dict(self.layers.get(layer_name, {}))
+
+    def update(self, layer_name, **progress):
+        """Updates the progress of a layer and saves the checkpoint."""
+        with self.lock:
+            self.layers.setdefault(layer_name, {}).update(progress)
+            # Write to a temporary file first so a crash cannot leave it half written
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump({"layers": self.layers}, f, indent=2)
+            os.replace(temp_path, self.path)
+
+
+class RequestLimiter:
+    """
+    Caps the number of WFS requests in flight, both overall and per host, across every
+    layer being harvested.
+    """
+
+    def __init__(self, max_requests=8, max_host_requests=4):
+        self.requests = threading.BoundedSemaphore(max_requests)
+        self.max_host_requests = max_host_requests
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def limit(self, url):
+        """Holds a request slot for `url`'s host and a global one while in the block."""
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = threading.BoundedSemaphore(self.max_host_requests)
+            host_requests = self.hosts[host]
+        # Always take the host slot first so layers cannot deadlock each other
+        with host_requests, self.requests:
+            yield
+
+
+def create_session(workers=4):
+    """Creates a requests session whose connection pool fits `workers` threads."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_feature_count(session, wfs_url, layer_name, limiter=None):
+    """
+    Counts a layer's features with a resultType=hits GetFeature request.
+
+    Returns:
+    -------
+    int
+        The numberMatched reported by the server, or None if it is not available
+    """
+    params = {
+        "service": "WFS",
+        "version": "2.0.0",
+        "request": "GetFeature",
+        "typeName": layer_name,
+        "resultType": "hits",
+    }
+    try:
+        with limiter.limit(wfs_url) if limiter else nullcontext():
+            r = session.get(wfs_url, params=params, timeout=REQUEST_TIMEOUT)
+        r.raise_for_status()
+        number_matched = ET.fromstring(r.content).get("numberMatched")
+        return int(number_matched)
+    except (requests.RequestException, ET.ParseError, TypeError, ValueError) as e:
+        print(f"Could not count features of '{layer_name}': {e}")
+        return None
+
+
+def download_feature_page(
+    session,
+    wfs_url,
+    layer_name,
+    start_index=None,
+    count=None,
+    limiter=None,
+    bbox=None,
+    output_format=DEFAULT_OUTPUT_FORMAT,
+    srs_name=None,
+):
+    """
+    Downloads one page of a layer's features, streaming the response to a temporary
+    file so large pages are not held in memory.
 
     Parameters:
     ----------
+    session : requests.Session
+        Session to send the request with
     wfs_url : str
         Base URL for the WFS service
     layer_name : str
         Name of the layer to collect
-    output_dir : str
-        Directory to save the output file
-    """
-    print(f"\nProcessing layer: {layer_name}")
+    start_index : int
+        Index of the first feature, or None for the whole layer
+    count : int
+        Maximum number of features, or None for the server default
+    limiter : RequestLimiter
+        Shared limit on requests in flight, or None for no limit
+    bbox : tuple
+        Only fetch features within (min lon, min lat, max lon, max lat), or None
+    output_format : str
+        GetFeature output format, see choose_output_format
+    srs_name : str
+        CRS to ask for the features in, or None for the server default
 
-    # Specify parameters for the layer
+    Returns:
+    -------
+    tuple
+        Path of the file holding the response, which the caller must remove, and its
+        size in bytes
+    """
     params = {
         "service": "WFS",
         "version": "2.0.0",
         "request": "GetFeature",
         "typeName": layer_name,
-        "outputFormat": "application/json",
+        "outputFormat": output_format,
     }
+    if start_index is not None:
+        params["startIndex"] = start_index
+    if count is not None:
+        params["count"] = count
+    if bbox is not None:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        params["bbox"] = f"{min_lat},{min_lon},{max_lat},{max_lon},{TILE_CRS}"
+    if srs_name is not None:
+        params["srsName"] = srs_name
+    _, suffix = choose_output_format([output_format])
+
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as page:
+        try:
+            with limiter.limit(wfs_url) if limiter else nullcontext():
+                with session.get(
+                    wfs_url, params=params, timeout=REQUEST_TIMEOUT, stream=True
+                ) as r:
+                    r.raise_for_status()
+                    for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                        page.write(chunk)
+        except BaseException:
+            page.close()
+            os.remove(page.name)
+            raise
+        return page.name, page.tell()
+
+
+def feature_ids(batch, fid_column=None):
+    """
+    Returns the column identifying the features of a batch: gml_id in GML, an id
+    attribute such as string GeoJSON ids, or the FIDs GDAL takes from integer GeoJSON
+    ids. Returns None if the batch has none of these. FIDs that just number the
+    features from 0 are ignored, as GDAL also numbers features that have no id.
+    """
+    for name in ("gml_id", "id"):
+        if name in batch.schema.names:
+            return batch.column(name)
+    if fid_column in batch.schema.names:
+        fids = batch.column(fid_column)
+        if not np.array_equal(fids.to_numpy(), np.arange(len(fids))):
+            return fids
+    return None
+
+
+def drop_fids(batch, fid_column):
+    """Drops the FID column read alongside GeoJSON features, if there is one."""
+    if fid_column in batch.schema.names:
+        return batch.drop_columns([fid_column])
+    return batch
+
+
+def drop_seen_features(batch, ids, seen_ids):
+    """
+    Drops features whose id is in `seen_ids`, and adds the ids of the remaining
+    features to it.
+    """
+    keep = []
+    for value in ids.to_pylist():
+        keep.append(value not in seen_ids)
+        seen_ids.add(value)
+    return batch.filter(pa.array(keep))
+
+
+def page_read_options(page_file):
+    """
+    Returns the pyogrio options for reading a downloaded page. GeoJSON pages are read
+    with their FIDs, as GDAL only keeps integer GeoJSON ids as FIDs, and GML pages
+    without writing a .gfs schema file next to them. Other drivers take neither.
+    """
+    if page_file.endswith(".json"):
+        return {"return_fids": True}
+    if page_file.endswith(".gml"):
+        return {"WRITE_GFS": "NO"}
+    return {}
+
 
-    # Fetch data
-    r = requests.get(wfs_url, params=params)
+def iter_page_features(page_file, batch_size, page):
+    """
+    Yields the features of a downloaded page, parsed incrementally by GDAL in record
+    batches of `batch_size`, so only one batch is in memory at a time whatever the
+    size of the page.
+
+    The number of features received and the id of the first feature are stored in
+    `page`. A page that starts with the same feature as page["previous_id"] repeats
+    the previous page, from a server that ignores startIndex. It is marked as
+    page["repeated"] and none of its features are yielded.
+    """
+    with pyogrio.open_arrow(
+        page_file,
+        batch_size=batch_size,
+        use_pyarrow=True,
+        **page_read_options(page_file),
+    ) as (meta, reader):
+        fid_column = meta["fid_column"]
+        for batch in reader:
+            if not page["received"] and batch.num_rows:
+                ids = feature_ids(batch, fid_column)
+                page["first_id"] = None if ids is None else ids[0].as_py()
+                if page["first_id"] is not None and page["first_id"] == page.get(
+                    "previous_id"
+                ):
+                    page["repeated"] = True
+                    return
+            page["received"] += batch.num_rows
+            yield meta, drop_fids(batch, fid_column)
+
+
+def guard_stream(batches, failure):
+    """
+    Ends a stream of batches cleanly at the first error, which is kept in `failure`,
+    so the writer commits what it received and the error is reported as it was raised
+    rather than as a failed stream.
+    """
+    try:
+        yield from batches
+    except Exception as e:
+        failure.append(e)
+
+
+def discard_pages(futures):
+    """Cancels page downloads and removes the pages that were already downloaded."""
+    for future in futures:
+        if not future.cancel() and not future.exception():
+            os.remove(future.result()[0])
+
+
+def harvest_pages(
+    session,
+    wfs_url,
+    layer_name,
+    feature_count,
+    start_index,
+    harvest,
+    stats,
+    page_size,
+    workers,
+    limiter,
+    batch_size,
+    count_limit,
+    output_format,
+    checkpoint,
+    stop_when_truncated,
+    srs_name=None,
+):
+    """
+    Fetches a layer in pages of `page_size` features using count/startIndex, starting
+    from `start_index`, and yields each page in order as a stream of its features for
+    the writer to commit.
 
-    if r.status_code == 200:
+    A page that brings fewer features than it should means the server capped the
+    count, and a page that starts with the same feature as the one before means it
+    ignored startIndex. Repeated pages are not written. The number of features a page
+    returns is stored as harvest["truncated"], and if `stop_when_truncated` is set
+    harvesting stops there so the layer can be fetched in tiles instead.
+
+    The writer asks for the next page only once it has committed the previous one, so
+    harvest["saved"] and the checkpoint are advanced past a page only once it is in
+    the layer. Pages are requested in `srs_name` if it is given.
+    """
+    if feature_count is None:
+        print("Feature count not available, fetching the layer in one request")
+        pages = iter([(None, None)])
+    else:
+        print(
+            f"{feature_count} features, fetching in pages of {page_size} "
+            f"with {workers} workers as {output_format}"
+        )
+        pages = (
+            (start, page_size) for start in range(start_index, feature_count, page_size)
+        )
+
+    def submit(executor, start, count):
+        return start, executor.submit(
+            download_feature_page,
+            session,
+            wfs_url,
+            layer_name,
+            start,
+            count,
+            limiter,
+            output_format=output_format,
+            srs_name=srs_name,
+        )
+
+    previous = {"first_id": None, "received": None}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Keep a bounded window of pages in flight and write them back in order
+        in_flight = deque(
+            submit(executor, start, count) for start, count in islice(pages, workers)
+        )
         try:
-            response_json = r.json()
-            data = gpd.GeoDataFrame.from_features(
-                response_json["features"], crs="EPSG:3067"
+            while in_flight:
+                start, future = in_flight.popleft()
+                page, size = future.result()
+                for next_start, count in islice(pages, 1):
+                    in_flight.append(submit(executor, next_start, count))
+                stats["bytes"] += size
+                counts = {"received": 0, "previous_id": previous["first_id"]}
+                try:
+                    yield iter_page_features(page, batch_size, counts)
+                finally:
+                    os.remove(page)
+                received = counts["received"]
+                stats["features"] += received
+                harvest["saved"] += received
+
+                if counts.get("repeated"):
+                    print(
+                        f"Page of '{layer_name}' starting at {start} repeats the "
+                        "previous page, the server ignores startIndex"
+                    )
+                    harvest["truncated"] = previous["received"]
+                    if stop_when_truncated:
+                        return
+                else:
+                    if start is None:
+                        truncated = count_limit is not None and received >= count_limit
+                    else:
+                        truncated = received < min(page_size, feature_count - start)
+                    if truncated:
+                        print(
+                            f"Page of '{layer_name}' starting at {start or 0} brought "
+                            f"{received} features, the server caps the count"
+                        )
+                        harvest["truncated"] = received
+                        if stop_when_truncated:
+                            return
+                    previous.update(first_id=counts.get("first_id"), received=received)
+
+                if checkpoint and start is not None:
+                    checkpoint.update(
+                        layer_name,
+                        features=harvest["saved"],
+                        next_start_index=start + page_size,
+                    )
+                print(f"Saved {harvest['saved']} features of '{layer_name}'")
+        finally:
+            # Remove pages downloaded after a failure or stop that will not be written
+            discard_pages(future for _, future in in_flight)
+
+
+def split_tile(tile, parts=2):
+    """Splits a (min lon, min lat, max lon, max lat) tile into a parts x parts grid."""
+    min_lon, min_lat, max_lon, max_lat = tile
+    width = (max_lon - min_lon) / parts
+    height = (max_lat - min_lat) / parts
+    return [
+        (
+            min_lon + column * width,
+            min_lat + row * height,
+            min_lon + (column + 1) * width,
+            min_lat + (row + 1) * height,
+        )
+        for row in range(parts)
+        for column in range(parts)
+    ]
+
+
+def harvest_tiles(
+    session,
+    wfs_url,
+    layer_name,
+    bbox,
+    feature_count,
+    harvest,
+    stats,
+    tile_limit,
+    workers,
+    limiter,
+    batch_size,
+    output_format,
+    srs_name=None,
+):
+    """
+    Fetches a layer in BBOX tiles of its WGS84 extent, for servers that cannot page,
+    and yields their new features for the writer.
+
+    The extent is split into a grid sized so each tile should hold about half of
+    `tile_limit` features. Up to `workers` tiles are downloaded at once, each asking
+    for at most `tile_limit` features. A tile that comes back full may have been cut
+    short by the server, so it is discarded and split into four smaller tiles.
+
+    Servers may also cap responses below `tile_limit` without saying so. A tile that
+    brings as many features as the largest tile so far is taken to be at that cap:
+    it is split, the cap becomes the tile limit, and the tiles already written with
+    that many features are fetched again in parts. The same happens if the tiles
+    bring fewer features than `feature_count`, and if features are still missing
+    once no tile can be split further, a warning says how many were saved.
+
+    Features on tile edges are returned by every tile they touch, so features are
+    de-duplicated on their id before they are written, keeping the ids of the layer
+    until it is done. Features without ids cannot be, and are written as returned,
+    so tiles already written are not fetched again. Tiles are always given in WGS84,
+    while features are requested in `srs_name` if it is given.
+    """
+    parts = 1
+    if feature_count:
+        parts = max(1, math.ceil(math.sqrt(2 * feature_count / tile_limit)))
+    tiles = split_tile(bbox, parts)
+    print(
+        f"Fetching '{layer_name}' in BBOX tiles of up to {tile_limit} features, "
+        f"starting from {len(tiles)} tiles with {workers} workers as {output_format}"
+    )
+
+    seen_ids = set()
+    without_ids = False
+    # Tiles written with the most features any tile brought, which may have been cut
+    # short by a cap the server does not advertise
+    largest = {"count": 0, "tiles": []}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+
+        def submit(tile):
+            return executor.submit(
+                download_feature_page,
+                session,
+                wfs_url,
+                layer_name,
+                count=tile_limit,
+                limiter=limiter,
+                bbox=tile,
+                output_format=output_format,
+                srs_name=srs_name,
             )
 
-            # Display and process data
-            print(data.head())
-            print(f"CRS: {data.crs}")
+        def split(tile):
+            """Queues the four parts of a tile, if it is not too small to split."""
+            if tile[2] - tile[0] <= MIN_TILE_SIZE:
+                print(
+                    f"Tile {tile} of '{layer_name}' is at the server limit "
+                    "and too small to split, it may be incomplete"
+                )
+                return False
+            pending.update((submit(part), part) for part in split_tile(tile))
+            return True
+
+        def split_largest():
+            """Fetches the tiles written at the largest count again, in parts."""
+            if without_ids:
+                print(
+                    f"{len(largest['tiles'])} tiles of '{layer_name}' may be "
+                    "incomplete, they cannot be fetched again without ids"
+                )
+            else:
+                for tile in largest["tiles"]:
+                    split(tile)
+            largest["tiles"] = []
+
+        pending = {submit(tile): tile for tile in tiles}
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    tile = pending.pop(future)
+                    page, size = future.result()
+                    stats["bytes"] += size
+                    try:
+                        # Tiles are at most one response, so are read whole to count
+                        # them before anything is written
+                        meta, table = pyogrio.read_arrow(
+                            page, **page_read_options(page)
+                        )
+                    finally:
+                        os.remove(page)
+
+                    received = table.num_rows
+                    if received and received == largest["count"] < tile_limit:
+                        print(
+                            f"Tiles of '{layer_name}' stop at {received} features, "
+                            "the server caps the count"
+                        )
+                        tile_limit = received
+                        split_largest()
+                    if received >= tile_limit and split(tile):
+                        continue
+                    ids = feature_ids(table, meta["fid_column"])
+                    if ids is not None:
+                        table = drop_seen_features(table, ids, seen_ids)
+                    elif received and not without_ids:
+                        without_ids = True
+                        print(
+                            f"Features of '{layer_name}' have no ids, features on "
+                            "tile edges may be saved more than once"
+                        )
+                    table = drop_fids(table, meta["fid_column"])
+                    for batch in table.to_batches(max_chunksize=batch_size):
+                        yield meta, batch
+                    stats["features"] += table.num_rows
+                    harvest["saved"] += table.num_rows
+                    if received > largest["count"]:
+                        largest.update(count=received, tiles=[tile])
+                    print(
+                        f"Saved {harvest['saved']} features of '{layer_name}', "
+                        f"{len(pending)} tiles to go"
+                    )
+
+                if (
+                    not pending
+                    and feature_count
+                    and harvest["saved"] < feature_count
+                    and largest["tiles"]
+                ):
+                    print(
+                        f"Saved {harvest['saved']} of {feature_count} features of "
+                        f"'{layer_name}', splitting the largest tiles in case the "
+                        "server caps the count"
+                    )
+                    tile_limit = largest["count"]
+                    split_largest()
+        finally:
+            discard_pages(pending)
 
-            # Create output directory if it doesn't exist
-            os.makedirs(output_dir, exist_ok=True)
+    if feature_count and harvest["saved"] < feature_count:
+        print(
+            f"Saved {harvest['saved']} of {feature_count} features of '{layer_name}', "
+            "the layer may be incomplete"
+        )
 
-            # Save to file
-            output_file = os.path.join(
-                output_dir, f"{layer_name.replace(':', '_')}.gpkg"
+
+def collect_wfs_data(
+    wfs_url,
+    layer_name,
+    output_dir,
+    page_size=10000,
+    workers=4,
+    feature_count=None,
+    limiter=None,
+    batch_size=20000,
+    metadata=None,
+    checkpoint=None,
+    tiling="auto",
+    writer="gpkg",
+    target_crs=None,
+):
+    """
+    Collect data for a specific WFS layer and save it as a GeoPackage.
+
+    The layer is pre-counted with a resultType=hits request and fetched in pages of
+    `page_size` features using count/startIndex, in the most compact output format the
+    server offers for it (FlatGeobuf, then GeoJSON, then GML). FlatGeobuf is only used
+    when no pages or tiles have to be de-duplicated, as it drops feature ids. Up to
+    `workers` pages are downloaded at once, each streamed to a temporary file. Pages
+    are then parsed incrementally in order, in batches of `batch_size` features, and
+    each page is streamed into one write that commits it, so peak memory depends on
+    the batch size rather than the page or layer size. Layers whose feature count is not available
+    are fetched in a single request.
+
+    Features are requested in the layer's default CRS from the capabilities and tagged
+    with it, or with the CRS GDAL reads from the response if the default is not known.
+    With `target_crs`, they are reprojected batch by batch as they are written.
+
+    Servers that do not implement startIndex, or that return fewer features than
+    asked for, would leave the layer truncated. With `tiling` "auto" the layer is
+    then fetched again in BBOX tiles of its extent instead, see harvest_tiles;
+    "always" goes straight to tiles and "never" only warns.
+
+    With a checkpoint, progress is saved after every committed page, except for
+    GeoParquet files, which are only complete once closed. A layer whose feature count
+    and capabilities fingerprint match its last complete harvest is skipped, and an
+    interrupted harvest continues from the next page if they still match and the
+    output holds exactly the features committed so far. Otherwise the layer is
+    downloaded again from the start. Tiled harvests and GeoParquet files always start
+    over.
+
+    Parameters:
+    ----------
+    wfs_url : str
+        Base URL for the WFS service
+    layer_name : str
+        Name of the layer to collect
+    output_dir : str
+        Directory to save the output file
+    page_size : int
+        Number of features per GetFeature request
+    workers : int
+        Maximum number of pages downloaded at the same time
+    feature_count : int
+        Number of features if already counted, otherwise it is requested
+    limiter : RequestLimiter
+        Shared limit on requests in flight, or None for no limit
+    batch_size : int
+        Number of features parsed and written at a time
+    metadata : dict
+        The layer's capabilities metadata from get_wfs_layer_metadata, or None if
+        not known
+    checkpoint : HarvestCheckpoint
+        Saved progress to resume from and update, or None to always start over
+    tiling : str
+        When to fetch the layer in BBOX tiles: "auto", "always" or "never"
+    writer : str
+        How to save the layer: "gpkg" for a GeoPackage per layer, "single-gpkg" for a
+        layer in one shared GeoPackage, or "parquet" for a GeoParquet file per layer
+    target_crs : str
+        CRS to reproject the features to, or None to keep their own
+
+    Returns:
+    -------
+    dict
+        Layer name, features saved, bytes downloaded and seconds taken, and whether the
+        layer was skipped as unchanged or fetched in tiles
+    """
+    print(f"\nProcessing layer: {layer_name}")
+    started = time.perf_counter()
+    stats = {"layer": layer_name, "features": 0, "bytes": 0, "seconds": 0.0}
+    metadata = metadata or {}
+    fingerprint = metadata.get("fingerprint")
+    bbox = metadata.get("bbox")
+    count_limit = metadata.get("count_limit")
+    crs = metadata.get("crs")
+
+    # Create output directory if it doesn't exist
+    os.makedirs(output_dir, exist_ok=True)
+    output_file, output_layer = layer_output(output_dir, layer_name, writer)
+
+    # Pages and tiles never ask for more features than the server will return
+    if count_limit:
+        page_size = min(page_size, count_limit)
+    tiles = tiling == "always" or (
+        tiling == "auto" and not metadata.get("paging", True)
+    )
+    if tiles and bbox is None:
+        print(f"No extent for '{layer_name}' in the capabilities, it cannot be tiled")
+        tiles = False
+
+    session = create_session(workers)
+    if feature_count is None:
+        feature_count = get_feature_count(session, wfs_url, layer_name, limiter)
+    # Only a layer fetched in one request that cannot fall back to tiles has no
+    # repeated pages or tile edges to de-duplicate by feature id
+    output_format, _ = choose_output_format(
+        metadata.get("formats"),
+        need_ids=(
+            tiles or feature_count is not None or (tiling == "auto" and bool(bbox))
+        ),
+    )
+
+    # Features already committed to the output, and the page to continue from
+    harvest = {"saved": 0, "truncated": None}
+    start_index = 0
+    progress = checkpoint.get(layer_name) if checkpoint else {}
+    unchanged = (
+        feature_count is not None
+        and progress.get("feature_count") == feature_count
+        and progress.get("fingerprint") == fingerprint
+        and progress.get("target_crs") == target_crs
+        and count_saved_features(output_file, output_layer) == progress.get("features")
+    )
+    if unchanged and progress.get("complete"):
+        print(f"Layer '{layer_name}' is unchanged since the last harvest, skipping")
+        session.close()
+        stats["skipped"] = True
+        return stats
+    if (
+        unchanged
+        and progress.get("next_start_index")
+        and not tiles
+        and writer != "parquet"
+    ):
+        harvest["saved"] = progress["features"]
+        start_index = progress["next_start_index"]
+        print(f"Resuming from feature {start_index} of {feature_count}")
+    elif checkpoint:
+        checkpoint.update(
+            layer_name,
+            feature_count=feature_count,
+            fingerprint=fingerprint,
+            target_crs=target_crs,
+            features=0,
+            next_start_index=0,
+            complete=False,
+        )
+
+    failure = []
+    try:
+        if not tiles:
+            with LayerWriter(
+                output_file,
+                output_layer,
+                crs=crs,
+                append=harvest["saved"] > 0,
+                target_crs=target_crs,
+            ) as layer_writer:
+                for page in harvest_pages(
+                    session,
+                    wfs_url,
+                    layer_name,
+                    feature_count,
+                    start_index,
+                    harvest,
+                    stats,
+                    page_size,
+                    workers,
+                    limiter,
+                    batch_size,
+                    count_limit,
+                    output_format,
+                    # A GeoParquet file has nothing to resume from until it is closed
+                    checkpoint if writer != "parquet" else None,
+                    stop_when_truncated=tiling == "auto" and bbox is not None,
+                    srs_name=crs,
+                ):
+                    layer_writer.write(page)
+        truncated = harvest["truncated"] if tiling == "auto" and bbox else None
+        if tiles or truncated is not None:
+            if truncated is not None:
+                print(f"Fetching '{layer_name}' again in BBOX tiles")
+                stats["features"] = harvest["saved"] = 0
+                if checkpoint:
+                    checkpoint.update(layer_name, features=0, next_start_index=0)
+            stats["tiled"] = True
+            write_layer(
+                guard_stream(
+                    harvest_tiles(
+                        session,
+                        wfs_url,
+                        layer_name,
+                        bbox,
+                        feature_count,
+                        harvest,
+                        stats,
+                        # A short page shows how many features the server returns at most
+                        min(page_size, truncated or page_size),
+                        workers,
+                        limiter,
+                        batch_size,
+                        output_format,
+                        srs_name=crs,
+                    ),
+                    failure,
+                ),
+                output_file,
+                output_layer,
+                crs=crs,
+                target_crs=target_crs,
             )
-            data.to_file(output_file, driver="GPKG")
-            print(f"Layer '{layer_name}' saved to '{output_file}'")
-        except Exception as e:
-            print(f"Error processing layer '{layer_name}': {e}")
-    else:
-        print(f"Error fetching layer '{layer_name}': {r.status_code} - {r.text}")
+        if failure:
+            raise failure[0]
+        if checkpoint:
+            checkpoint.update(layer_name, features=harvest["saved"], complete=True)
+    except Exception as e:
+        print(f"Error processing layer '{layer_name}': {e}")
+        stats["error"] = str(e)
+    finally:
+        session.close()
+        stats["seconds"] = time.perf_counter() - started
+
+    if harvest["saved"] and "error" not in stats:
+        print(f"Layer '{layer_name}' saved to '{output_file}'")
+    elif "error" not in stats:
+        print(f"No features returned for layer '{layer_name}'")
+    return stats
+
 
+def print_throughput(layer_stats, seconds):
+    """Prints features/s and MB/s per layer and for the whole harvest."""
 
-def collect_wfs_layers(capabilities_url, wfs_url, output_dir):
+    def rates(features, size, elapsed):
+        elapsed = max(elapsed, 1e-9)
+        return (
+            f"{features:>10} features {size / 1e6:>9.1f} MB {elapsed:>8.1f} s "
+            f"{features / elapsed:>10.0f} features/s {size / 1e6 / elapsed:>7.2f} MB/s"
+        )
+
+    print("\nHarvest throughput:")
+    for stats in layer_stats:
+        status = " (failed)" if "error" in stats else ""
+        if stats.get("skipped"):
+            status = " (unchanged)"
+        elif stats.get("tiled"):
+            status += " (tiled)"
+        print(
+            f"{stats['layer']}: "
+            f"{rates(stats['features'], stats['bytes'], stats['seconds'])}{status}"
+        )
+    print(
+        "Total: "
+        + rates(
+            sum(stats["features"] for stats in layer_stats),
+            sum(stats["bytes"] for stats in layer_stats),
+            seconds,
+        )
+    )
+
+
+def collect_wfs_layers(
+    capabilities_url,
+    wfs_url,
+    output_dir,
+    page_size=10000,
+    workers=4,
+    parallel_layers=2,
+    max_requests=8,
+    max_host_requests=4,
+    batch_size=20000,
+    resume=True,
+    tiling="auto",
+    writer="gpkg",
+    target_crs=None,
+):
     """
     Collect data from all available WFS layers.
 
+    Every layer is counted first, then up to `parallel_layers` layers are harvested at
+    once, largest first so the longest downloads are not left until the end. Requests
+    from all layers share a limit overall and per host. Throughput per layer and in
+    total is printed at the end.
+
+    Progress is checkpointed in `output_dir`, so a re-run skips layers that are
+    unchanged since they were last harvested and continues interrupted ones. The
+    capabilities document is cached there too, and only downloaded again if the
+    server reports it has changed.
+
     Parameters:
     ----------
     capabilities_url : str
@@ -109,14 +1149,95 @@ def collect_wfs_layers(capabilities_url, wfs_url, output_dir):
         Base URL for the WFS service
     output_dir : str
         Directory to save the output files
+    page_size : int
+        Number of features per GetFeature request
+    workers : int
+        Maximum number of pages downloaded at the same time for each layer
+    parallel_layers : int
+        Maximum number of layers harvested at the same time
+    max_requests : int
+        Maximum number of requests in flight across all layers
+    max_host_requests : int
+        Maximum number of requests in flight to one host
+    batch_size : int
+        Number of features written to the GeoPackage at a time
+    resume : bool
+        Whether to use the checkpoint from earlier runs, rather than downloading every
+        layer from the start
+    tiling : str
+        When to fetch layers in BBOX tiles: "auto" if the server cannot page them,
+        "always" or "never"
+    writer : str
+        How to save layers: "gpkg" for a GeoPackage per layer, "single-gpkg" for one
+        GeoPackage with every layer, or "parquet" for a GeoParquet file per layer
+    target_crs : str
+        CRS to reproject every layer to, or None to keep each layer's own
+
+    Returns:
+    -------
+    list
+        Throughput stats for each layer, in the order they were harvested
     """
+    started = time.perf_counter()
+
     # Get available layers
-    layers = get_wfs_capabilities(capabilities_url)
+    os.makedirs(output_dir, exist_ok=True)
+    metadata = get_wfs_layer_metadata(capabilities_url, cache_dir=output_dir)
+    layers = list(metadata)
+    print("Available layers:")
+    for layer in layers:
+        print(layer)
 
     if not layers:
         print("No layers available to process.")
-        return
+        return []
+
+    if writer == "single-gpkg" and parallel_layers > 1:
+        # SQLite allows one writer at a time, so layers sharing a file take turns
+        print("Harvesting one layer at a time into a single GeoPackage")
+        parallel_layers = 1
+
+    checkpoint = HarvestCheckpoint(output_dir) if resume else None
+    limiter = RequestLimiter(max_requests, max_host_requests)
+    session = create_session(max_requests)
+    with ThreadPoolExecutor(max_workers=max_requests) as executor:
+        counts = dict(
+            zip(
+                layers,
+                executor.map(
+                    lambda layer_name: get_feature_count(
+                        session, wfs_url, layer_name, limiter
+                    ),
+                    layers,
+                ),
+            )
+        )
+    session.close()
+
+    # Largest layers first, layers that could not be counted last
+    layers = sorted(layers, key=lambda layer_name: -(counts[layer_name] or -1))
+
+    with ThreadPoolExecutor(max_workers=parallel_layers) as executor:
+        layer_stats = list(
+            executor.map(
+                lambda layer_name: collect_wfs_data(
+                    wfs_url,
+                    layer_name,
+                    output_dir,
+                    page_size,
+                    workers,
+                    feature_count=counts[layer_name],
+                    limiter=limiter,
+                    batch_size=batch_size,
+                    metadata=metadata[layer_name],
+                    checkpoint=checkpoint,
+                    tiling=tiling,
+                    writer=writer,
+                    target_crs=target_crs,
+                ),
+                layers,
+            )
+        )
 
-    # Process each layer
-    for layer_name in layers:
-        collect_wfs_data(wfs_url, layer_name, output_dir)
+    print_throughput(layer_stats, time.perf_counter() - started)
+    return layer_stats
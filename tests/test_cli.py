@@ -0,0 +1,78 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from click.testing import CliRunner
+
+from planning_data_analysis.cli import cli
+
+# Run in a fresh interpreter, as the other tests have already imported everything
+HELP_CHILD = """
+import json, sys
+from planning_data_analysis.cli import cli
+try:
+    cli.main(sys.argv[1:], standalone_mode=False)
+except SystemExit:
+    pass
+print(json.dumps(sorted({name.split(".")[0] for name in sys.modules})))
+"""
+
+HEAVY_MODULES = {
+    "geopandas",
+    "matplotlib",
+    "numpy",
+    "pandas",
+    "playwright",
+    "pyogrio",
+    "requests",
+    "shapely",
+    "sklearn",
+}
+
+
+def test_streaming_clusters_reject_embed(tmp_path):
+    input_csv = tmp_path / "reasons.csv"
+    input_csv.write_text("Invalid Reason Details\nFee missing\n")
+
+    result = CliRunner().invoke(
+        cli,
+        [
+            "analyze-clusters",
+            "--input",
+            str(input_csv),
+            "--output",
+            str(tmp_path / "clusters"),
+            "--streaming",
+            "--embed",
+            "fast",
+        ],
+    )
+
+    assert result.exit_code == 2
+    assert "--embed cannot be used with --streaming" in result.output
+    assert not (tmp_path / "clusters").exists()
+
+
+@pytest.mark.parametrize(
+    "args", [["--help"], ["analyze-clusters", "--help"], ["collect-wfs", "--help"]]
+)
+def test_help_loads_no_heavy_modules(args):
+    src = os.path.join(os.path.dirname(__file__), os.pardir, "src")
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, [src, os.environ.get("PYTHONPATH")])),
+    )
+
+    result = subprocess.run(
+        [sys.executable, "-c", HELP_CHILD, *args],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+
+    assert result.stdout.startswith("Usage:")
+    loaded = set(json.loads(result.stdout.splitlines()[-1]))
+    assert not loaded & HEAVY_MODULES
@@ -0,0 +1,240 @@
+import os
+
+import joblib
+
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse
+from sklearn.cluster import KMeans
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from planning_data_analysis.cluster_analysis import (
+    MODEL_FILE,
+    REASON_COLUMN,
+    analyze_clusters_streaming,
+    check_saved_model,
+    classify_reasons,
+    collapse_duplicates,
+    embed_fast,
+    embed_tsne,
+    load_cluster_model,
+    normalise_reason,
+    reduce_dimensions,
+    save_cluster_model,
+    select_k,
+)
+
+REASONS = [
+    "Fee of 120 paid, 240 required",
+    "Fee of 80 paid, 240 required",
+    "Location plan missing red line boundary",
+    "Location plan does not show the red line boundary",
+    "Ownership certificate B not served on the owner",
+    "Ownership certificate not completed",
+]
+
+
+TEMPLATES = [
+    "Fee of {} paid but the planning fee is higher",
+    "Location plan {} missing the red line boundary",
+    "Ownership certificate {} not signed by the applicant",
+]
+
+
+def write_reasons(path, repeats=40):
+    """Writes a CSV of templated reasons, cycling through TEMPLATES."""
+    reasons = [
+        TEMPLATES[index % len(TEMPLATES)].format(100 + index)
+        for index in range(repeats * len(TEMPLATES))
+    ]
+    pd.DataFrame({REASON_COLUMN: reasons}).to_csv(path, index=False)
+    return reasons
+
+
+def fit(reasons, n_clusters=3):
+    vectorizer = TfidfVectorizer(stop_words="english")
+    matrix = vectorizer.fit_transform(reasons)
+    kmeans = KMeans(n_clusters=n_clusters, random_state=42)
+    return vectorizer, kmeans, kmeans.fit_predict(matrix)
+
+
+def test_saved_model_matches_a_fresh_refit(tmp_path, capsys):
+    vectorizer, kmeans, _ = fit(REASONS)
+    model_path = save_cluster_model(str(tmp_path), vectorizer, kmeans.cluster_centers_)
+    _, _, refit_clusters = fit(REASONS)
+
+    assert check_saved_model(model_path, REASONS, refit_clusters) == len(REASONS)
+    assert "Warning" not in capsys.readouterr().out
+
+
+def test_saved_model_that_differs_from_a_refit_is_reported(tmp_path, capsys):
+    vectorizer, kmeans, refit_clusters = fit(REASONS)
+    # Centroids in a different order number the clusters differently
+    model_path = save_cluster_model(
+        str(tmp_path), vectorizer, np.roll(kmeans.cluster_centers_, 1, axis=0)
+    )
+
+    assert check_saved_model(model_path, REASONS, refit_clusters) == 0
+    assert "Warning: saved model labels differ" in capsys.readouterr().out
+
+
+def test_reduce_dimensions_keeps_rows_without_densifying_large_vocabularies():
+    matrix = scipy.sparse.random(200, 1000, density=0.01, format="csr", random_state=0)
+
+    embedding = reduce_dimensions(matrix, n_components=20)
+
+    assert embedding.shape == (200, 20)
+
+
+def test_reduce_dimensions_densifies_tiny_vocabularies():
+    matrix = scipy.sparse.csr_matrix(np.array([[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]]))
+
+    embedding = reduce_dimensions(matrix)
+
+    assert np.array_equal(embedding, matrix.toarray())
+
+
+@pytest.mark.parametrize("dedup", [False, True])
+def test_streaming_clusters_every_reason_in_chunks(tmp_path, dedup):
+    reasons = write_reasons(tmp_path / "reasons.csv")
+
+    analyze_clusters_streaming(
+        str(tmp_path / "reasons.csv"),
+        str(tmp_path),
+        n_clusters=3,
+        chunksize=25,
+        batch_size=16,
+        dedup=dedup,
+    )
+
+    clustered = pd.read_csv(tmp_path / "Clustered_Invalid_Reason_Details.csv")
+    assert clustered[REASON_COLUMN].tolist() == reasons
+    # Every reason from one template lands in the same cluster, and each template in
+    # its own
+    template = np.arange(len(reasons)) % len(TEMPLATES)
+    assert clustered.groupby(template)["Cluster"].nunique().eq(1).all()
+    assert clustered["Cluster"].nunique() == len(TEMPLATES)
+    assert os.path.exists(tmp_path / MODEL_FILE)
+
+
+def test_streaming_needs_a_reason_per_cluster(tmp_path, capsys):
+    write_reasons(tmp_path / "reasons.csv", repeats=1)
+
+    analyze_clusters_streaming(
+        str(tmp_path / "reasons.csv"), str(tmp_path), n_clusters=5, chunksize=2
+    )
+
+    assert "Not enough invalid reasons to fit 5 clusters" in capsys.readouterr().out
+    assert not os.path.exists(tmp_path / MODEL_FILE)
+
+
+def test_classify_reasons_matches_the_clusters_it_was_trained_on(tmp_path):
+    write_reasons(tmp_path / "reasons.csv")
+    analyze_clusters_streaming(
+        str(tmp_path / "reasons.csv"), str(tmp_path), n_clusters=3, chunksize=25
+    )
+    clustered = pd.read_csv(tmp_path / "Clustered_Invalid_Reason_Details.csv")
+
+    output_csv = tmp_path / "classified" / "classified.csv"
+    classify_reasons(
+        str(tmp_path / MODEL_FILE),
+        str(tmp_path / "reasons.csv"),
+        str(output_csv),
+        chunksize=7,
+    )
+
+    classified = pd.read_csv(output_csv)
+    assert classified[REASON_COLUMN].tolist() == clustered[REASON_COLUMN].tolist()
+    assert classified["Cluster"].tolist() == clustered["Cluster"].tolist()
+    assert classified["Theme"].notna().all()
+
+
+def test_load_cluster_model_rejects_other_versions(tmp_path):
+    vectorizer, kmeans, _ = fit(REASONS)
+    model_path = save_cluster_model(str(tmp_path), vectorizer, kmeans.cluster_centers_)
+    model = joblib.load(model_path)
+    model["format_version"] = -1
+    joblib.dump(model, model_path)
+
+    with pytest.raises(ValueError, match="Unsupported cluster model version -1"):
+        load_cluster_model(model_path)
+
+
+def test_select_k_picks_the_number_of_templates(tmp_path):
+    reasons = write_reasons(tmp_path / "reasons.csv")
+    matrix = TfidfVectorizer(stop_words="english").fit_transform(reasons)
+
+    assert select_k(matrix, 2, 6, str(tmp_path), workers=2) == len(TEMPLATES)
+    sweep = pd.read_csv(tmp_path / "k_sweep.csv")
+    assert sweep["k"].tolist() == [2, 3, 4, 5, 6]
+    assert os.path.exists(tmp_path / "k_sweep.png")
+
+
+def test_select_k_needs_more_than_one_cluster(tmp_path):
+    matrix = TfidfVectorizer().fit_transform(["Fee not paid"] * 20)
+
+    with pytest.raises(ValueError, match="gives more than one cluster"):
+        select_k(matrix, 2, 4, str(tmp_path), workers=1)
+
+
+def test_select_k_needs_enough_reasons(tmp_path):
+    matrix = TfidfVectorizer().fit_transform(REASONS[:3])
+
+    with pytest.raises(ValueError, match="Not enough reasons to sweep k from 4 to 6"):
+        select_k(matrix, 4, 6, str(tmp_path), workers=1)
+
+
+def test_normalise_reason_ignores_numbers_case_and_spacing():
+    assert normalise_reason("Fee of  £120 paid,\t240 REQUIRED") == normalise_reason(
+        "fee of £80 paid, 1000 required"
+    )
+
+
+def test_collapse_duplicates_groups_near_duplicates():
+    reasons = [
+        "Fee of 120 paid, 240 required",
+        "fee of 80 paid,  240 required",
+        "Fee of 80 paid, 240 required",
+        "Location plan missing the red line boundary around the site",
+        "Location plan missing the red line boundary around the whole site",
+        "Ownership certificate not completed",
+    ]
+
+    representatives, weights, row_group = collapse_duplicates(reasons, threshold=0.5)
+
+    assert row_group[0] == row_group[1] == row_group[2]
+    assert row_group[3] == row_group[4]
+    assert len(set(row_group[[0, 3, 5]])) == 3
+    assert len(representatives) == len(weights) == 3
+    assert weights[row_group].tolist() == [3, 3, 3, 2, 2, 1]
+    assert representatives[row_group[0]] == normalise_reason(reasons[0])
+
+
+def test_collapse_duplicates_keeps_distinct_reasons_apart():
+    representatives, weights, row_group = collapse_duplicates(REASONS, threshold=0.95)
+
+    # The two fee reasons only differ by a number, so they normalise to one text
+    assert row_group[0] == row_group[1]
+    assert len(representatives) == len(REASONS) - 1
+    assert weights.sum() == len(REASONS)
+
+
+def test_embed_tsne_places_a_single_row_at_the_origin():
+    assert np.array_equal(embed_tsne(np.ones((1, 5))), np.zeros((1, 2)))
+
+
+def test_embed_fast_places_every_row_near_its_cluster():
+    rng = np.random.default_rng(0)
+    centres = np.array([[0.0] * 5, [50.0] * 5])
+    clusters = np.repeat([0, 1], 300)
+    embedding = centres[clusters] + rng.normal(size=(600, 5))
+
+    coordinates = embed_fast(embedding, clusters, sample_size=100)
+
+    assert coordinates.shape == (600, 2)
+    assert np.isfinite(coordinates).all()
+    # Rows placed from their neighbours stay closer to their own cluster's centre
+    means = np.array([coordinates[clusters == c].mean(axis=0) for c in (0, 1)])
+    distances = np.linalg.norm(coordinates[:, None] - means[None], axis=2)
+    assert (distances.argmin(axis=1) == clusters).all()
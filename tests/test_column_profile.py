@@ -0,0 +1,102 @@
+import json
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+
+from planning_data_analysis.column_profile import (
+    HyperLogLog,
+    canonical_text,
+    profile_batches,
+)
+
+
+def test_hyperloglog_estimates_within_its_error():
+    hashes = np.random.default_rng(0).integers(0, 2**63, 100000, dtype=np.uint64) * 2
+    sketch = HyperLogLog()
+    sketch.update(hashes)
+    sketch.update(hashes[:50000])
+
+    assert sketch.estimate() == pytest.approx(100000, rel=0.05)
+
+
+def test_hyperloglog_merge_matches_one_sketch():
+    hashes = np.random.default_rng(1).integers(0, 2**63, 20000, dtype=np.uint64)
+    whole, first, second = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    whole.update(hashes)
+    first.update(hashes[:12000])
+    second.update(hashes[8000:])
+    first.merge(second)
+
+    assert first.estimate() == whole.estimate()
+
+
+def test_small_distinct_counts_are_exact():
+    profile = profile_batches([pd.DataFrame({"code": ["a", "b", "c", "a"]})])
+
+    assert profile.to_dict()["columns"][0]["distinct_estimate"] == 3
+
+
+def test_equal_values_count_once_whatever_their_dtype():
+    batches = [
+        pd.DataFrame({"value": pd.Series([1, 2, 3], dtype="int64")}),
+        pd.DataFrame({"value": pd.Series([1.0, 2.0, 3.0, None])}),
+        pd.DataFrame({"value": pd.Series([1, 2, 3], dtype="Int64")}),
+        pd.DataFrame({"value": pd.Series([1, 2.0, 3], dtype=object)}),
+    ]
+
+    column = profile_batches(batches).to_dict()["columns"][0]
+
+    assert column["distinct_estimate"] == 3
+    assert column["nulls"] == 1
+
+
+def test_canonical_text_keeps_fractions_and_dates_apart():
+    assert canonical_text(pd.Series([1.5, 2.0])).tolist() == ["1.5", "2"]
+    dates = pd.Series(pd.to_datetime(["2024-01-01 00:00", "2024-01-01 12:00"]))
+    assert canonical_text(dates).nunique() == 2
+    assert canonical_text(dates.astype("datetime64[s]")).tolist() == (
+        canonical_text(dates).tolist()
+    )
+
+
+def test_profile_batches_matches_profiling_the_whole_layer():
+    gdf = gpd.GeoDataFrame(
+        {
+            "reference": [f"A{index}" for index in range(9)] + [None],
+            "area": [1.5, None, 3.0, 10.0, -2.0, 4.0, 4.0, None, 8.0, 0.0],
+        },
+        geometry=[shapely.Point(index, -index) for index in range(9)] + [None],
+    )
+    whole = profile_batches([gdf]).to_dict()
+
+    batched = profile_batches(
+        [gdf.iloc[start : start + 3] for start in range(0, 10, 3)]
+    )
+
+    assert batched.to_dict() == whole
+    assert whole["row_count"] == 10
+    assert whole["bounds"] == [0.0, -8.0, 8.0, 0.0]
+    assert whole["empty_geometries"] == 1
+    reference, area = whole["columns"]
+    assert (reference["nulls"], reference["distinct_estimate"]) == (1, 9)
+    assert (reference["min_length"], reference["max_length"]) == (2, 2)
+    assert (area["nulls"], area["distinct_estimate"], area["min"], area["max"]) == (
+        2,
+        7,
+        -2.0,
+        10.0,
+    )
+    json.dumps(whole)
+
+
+def test_profile_ranges_columns_as_text_when_batches_disagree():
+    profile = profile_batches(
+        [pd.DataFrame({"code": [10, 2]}), pd.DataFrame({"code": ["0A", "B"]})]
+    )
+
+    (code,) = profile.to_dict()["columns"]
+    assert (code["min"], code["max"]) == ("0A", "B")
+    assert code["distinct_estimate"] == 4
@@ -0,0 +1,102 @@
+import os
+import shutil
+
+import pytest
+
+from planning_data_analysis.eda_catalog import (
+    lookup_analysis,
+    open_catalog,
+    store_analysis,
+)
+
+OPTIONS = {"renderer": "static", "summary": "full", "dataset": "sites"}
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    """An input layer, its written assets and a catalog that has stored its analysis."""
+    input_dir = tmp_path / "input"
+    output_dir = tmp_path / "output"
+    input_dir.mkdir()
+    output_dir.mkdir()
+    layer = input_dir / "sites.shp"
+    for extension, content in (("shp", "shapes"), ("dbf", "table"), ("prj", "crs")):
+        layer.with_suffix(f".{extension}").write_text(content)
+
+    geojson_file = output_dir / "sites_sample.geojson"
+    plot_file = output_dir / "sites_plot.png"
+    geojson_file.write_text("{}")
+    plot_file.write_bytes(b"png")
+    result = (
+        "sites.shp",
+        {"record_count": 3, "geojson_file": str(geojson_file)},
+        str(output_dir / "sites_report.docx"),
+        str(plot_file),
+        (str(output_dir / "map_sites.html"), str(plot_file)),
+    )
+
+    connection = open_catalog(str(output_dir))
+    store_analysis(connection, str(output_dir), str(layer), OPTIONS, result)
+    yield connection, output_dir, layer, result
+    connection.close()
+
+
+def lookup(catalog, options=OPTIONS):
+    connection, output_dir, layer, _ = catalog
+    return lookup_analysis(connection, str(output_dir), str(layer), options)
+
+
+def test_unchanged_file_is_reused_without_rendering_its_map(catalog):
+    *_, result = catalog
+
+    assert lookup(catalog) == result[:4] + (None,)
+
+
+def test_touched_file_with_the_same_content_is_reused(catalog):
+    _, _, layer, result = catalog
+    stat = os.stat(layer)
+    os.utime(layer, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert lookup(catalog) == result[:4] + (None,)
+    # The new modification time is recorded so the next lookup skips hashing
+    assert lookup(catalog) is not None
+
+
+def test_changed_sidecar_is_analysed_again(catalog):
+    _, _, layer, _ = catalog
+    stat = os.stat(layer)
+    layer.with_suffix(".dbf").write_text("tabla")
+    os.utime(layer, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert lookup(catalog) is None
+
+
+def test_changed_options_are_analysed_again(catalog):
+    assert lookup(catalog, dict(OPTIONS, renderer="browser")) is None
+
+
+def test_missing_asset_is_analysed_again(catalog):
+    _, output_dir, _, _ = catalog
+    os.remove(output_dir / "sites_sample.geojson")
+
+    assert lookup(catalog) is None
+
+
+def test_missing_screenshot_is_rendered_again_from_its_map(catalog):
+    _, output_dir, _, result = catalog
+    (output_dir / "map_sites.html").write_text("<html></html>")
+    os.remove(output_dir / "sites_plot.png")
+
+    assert lookup(catalog) == result
+
+
+def test_moved_output_directory_is_still_reused(catalog, tmp_path):
+    connection, output_dir, layer, _ = catalog
+    moved_dir = tmp_path / "moved"
+    shutil.copytree(output_dir, moved_dir)
+    shutil.rmtree(output_dir)
+
+    cached = lookup_analysis(connection, str(moved_dir), str(layer), OPTIONS)
+
+    assert cached[1]["geojson_file"] == str(moved_dir / "sites_sample.geojson")
+    assert cached[3] == str(moved_dir / "sites_plot.png")
@@ -0,0 +1,81 @@
+import geopandas as gpd
+import numpy as np
+import shapely
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PathCollection
+from matplotlib.figure import Figure
+from matplotlib.path import Path
+from PIL import Image
+
+from planning_data_analysis.eda_render import (
+    polygon_paths,
+    render_overview_map,
+    render_static_map,
+)
+
+SQUARE_WITH_HOLE = shapely.Polygon(
+    [(0, 0), (0, 10), (10, 10), (10, 0)], holes=[[(4, 4), (6, 4), (6, 6), (4, 6)]]
+)
+
+
+def test_polygon_paths_draw_holes_unfilled():
+    (path,) = polygon_paths(np.array([SQUARE_WITH_HOLE]))
+
+    assert (path.codes == Path.MOVETO).sum() == 2
+    assert (path.codes == Path.CLOSEPOLY).sum() == 2
+
+    fig = Figure(figsize=(1, 1), dpi=100)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.set_xlim(0, 10)
+    ax.set_ylim(0, 10)
+    ax.axis("off")
+    ax.add_collection(PathCollection([path], facecolor="black", edgecolor="none"))
+    canvas.draw()
+    pixels = np.asarray(canvas.buffer_rgba())
+    # Path.contains_point ignores winding, so check the filled pixels instead
+    assert pixels[20, 20, :3].tolist() == [0, 0, 0]
+    assert pixels[50, 50, :3].tolist() == [255, 255, 255]
+
+
+def test_render_static_map_draws_every_geometry_type(tmp_path):
+    gdf = gpd.GeoDataFrame(
+        geometry=[
+            shapely.MultiPolygon([SQUARE_WITH_HOLE, shapely.box(20, 20, 25, 25)]),
+            shapely.LineString([(0, 20), (10, 30)]),
+            shapely.Point(30, 0),
+            shapely.Polygon(),
+            None,
+        ],
+        crs="EPSG:27700",
+    )
+    image_file = tmp_path / "map.png"
+
+    render_static_map(gdf, str(image_file), title="Mixed", figsize=(4, 4), dpi=50)
+
+    assert Image.open(image_file).size == (200, 200)
+
+
+def test_render_overview_map_counts_features_across_batches(tmp_path):
+    batches = [
+        gpd.GeoDataFrame(geometry=[shapely.Point(x, x) for x in range(5)]),
+        gpd.GeoDataFrame(geometry=[shapely.LineString([(0, 4), (4, 0)]), None]),
+    ]
+    image_file = tmp_path / "overview.png"
+
+    count = render_overview_map(
+        iter(batches), (0, 0, 4, 4), str(image_file), grid_size=8
+    )
+
+    assert count == 6
+    assert image_file.exists()
+
+
+def test_render_overview_map_handles_a_single_point(tmp_path):
+    batch = gpd.GeoDataFrame(geometry=[shapely.Point(1, 1)], crs="EPSG:4326")
+    image_file = tmp_path / "overview.png"
+
+    assert (
+        render_overview_map([batch], (1, 1, 1, 1), str(image_file), crs=batch.crs) == 1
+    )
+    assert image_file.exists()
@@ -0,0 +1,245 @@
+import asyncio
+import os
+
+import geopandas as gpd
+import pytest
+import shapely
+from docx import Document
+from planning_data_analysis import eda_report
+from planning_data_analysis.eda_report import (
+    analyse_geospatial_file,
+    check_geospatial_file,
+    create_overview_map,
+    find_geospatial_files,
+    load_geospatial_file,
+    process_dataset,
+    summarise_geospatial_file,
+)
+
+POINTS_CSV = """reference,latitude,longitude
+A1,51.50,-0.12
+A2,,
+A3,53.48,-2.24
+"""
+
+
+def write_polygons(path, count=120):
+    """Writes a GeoPackage of square polygons in British National Grid."""
+    gpd.GeoDataFrame(
+        {
+            "reference": [f"REF{index:04d}" for index in range(count)],
+            "area": [float(index) for index in range(count)],
+        },
+        geometry=[shapely.box(index, 0, index + 1, 1) for index in range(count)],
+        crs="EPSG:27700",
+    ).to_file(path, driver="GPKG")
+
+
+def test_csv_with_missing_coordinates_is_analysed(tmp_path):
+    (tmp_path / "points.csv").write_text(POINTS_CSV)
+    gdf = load_geospatial_file(str(tmp_path), "points.csv")
+
+    summary = analyse_geospatial_file(
+        gdf, str(tmp_path / "sample.geojson"), str(tmp_path), "points.csv"
+    )
+
+    assert summary["geometry_type"] == "Point"
+    assert summary["record_count"] == 3
+    assert summary["crs"] == "EPSG:4326"
+
+
+def test_csv_metadata_summary_detects_geometry(tmp_path):
+    (tmp_path / "points.csv").write_text(POINTS_CSV)
+
+    summary, sample = summarise_geospatial_file(
+        str(tmp_path), "points.csv", str(tmp_path / "sample.geojson")
+    )
+
+    assert summary["geometry_type"] == "Point"
+    assert summary["crs"] == "EPSG:4326"
+    assert summary["record_count"] == 3
+    assert summary["features"] == "reference, latitude, longitude, geometry"
+    assert len(sample) == 3
+
+
+def test_metadata_summary_matches_a_full_load(tmp_path):
+    write_polygons(tmp_path / "sites.gpkg")
+    gdf = load_geospatial_file(str(tmp_path), "sites.gpkg")
+    full = analyse_geospatial_file(
+        gdf, str(tmp_path / "full.geojson"), str(tmp_path), "sites.gpkg"
+    )
+
+    summary, sample = summarise_geospatial_file(
+        str(tmp_path), "sites.gpkg", str(tmp_path / "fast.geojson"), sample_size=10
+    )
+
+    for key in ("geometry_type", "record_count", "features", "file_size"):
+        assert summary[key] == full[key]
+    assert summary["crs"] == gdf.crs.to_string()
+    assert len(sample) == 10
+    assert len(gpd.read_file(summary["geojson_file"])) == 10
+
+
+def test_csv_overview_uses_the_extent_of_its_points(tmp_path):
+    (tmp_path / "points.csv").write_text(POINTS_CSV)
+    image_file = str(tmp_path / "overview.png")
+
+    assert create_overview_map(str(tmp_path), "points.csv", image_file) == image_file
+    assert os.path.exists(image_file)
+
+
+def test_csv_geometry_checks(tmp_path):
+    (tmp_path / "points.csv").write_text(POINTS_CSV + "A4,51.50,-0.12\n")
+
+    quality = check_geospatial_file(str(tmp_path), "points.csv")
+
+    assert quality["checked"] == 4
+    assert quality["missing"] == 1
+    assert quality["duplicates"] == 1
+
+
+class FakeBrowser:
+    """Stands in for a Chromium browser, recording pages and screenshots."""
+
+    def __init__(self):
+        self.open_pages = 0
+        self.most_open_pages = 0
+        self.screenshots = []
+        self.closed = False
+
+    async def new_page(self):
+        self.open_pages += 1
+        self.most_open_pages = max(self.most_open_pages, self.open_pages)
+        return FakePage(self)
+
+    async def close(self):
+        self.closed = True
+
+
+class FakePage:
+    def __init__(self, browser):
+        self.browser = browser
+
+    async def goto(self, url):
+        if url.endswith("broken.html"):
+            raise RuntimeError("page crashed")
+
+    async def wait_for_function(self, script, timeout):
+        await asyncio.sleep(0.01)
+
+    async def screenshot(self, path, full_page):
+        self.browser.screenshots.append(path)
+
+    async def close(self):
+        self.browser.open_pages -= 1
+
+
+def fake_playwright(browsers):
+    class Chromium:
+        async def launch(self):
+            browsers.append(FakeBrowser())
+            return browsers[-1]
+
+    class Playwright:
+        chromium = Chromium()
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            return False
+
+    return Playwright
+
+
+def test_render_maps_shares_one_browser_and_bounds_open_pages(monkeypatch):
+    browsers = []
+    monkeypatch.setattr(eda_report, "async_playwright", fake_playwright(browsers))
+    map_files = [(f"map{index}.html", f"map{index}.png") for index in range(10)]
+    map_files.append(("broken.html", "broken.png"))
+
+    asyncio.run(eda_report.render_maps(map_files, max_pages=3))
+
+    assert len(browsers) == 1
+    browser = browsers[0]
+    assert sorted(browser.screenshots) == sorted(
+        image_file for _, image_file in map_files[:-1]
+    )
+    assert browser.most_open_pages == 3
+    # The page that failed to load is closed as well
+    assert browser.open_pages == 0
+    assert browser.closed
+
+
+def write_dataset(folder):
+    """Writes a dataset folder with two GeoPackages and a CSV of points."""
+    folder.mkdir()
+    write_polygons(folder / "sites.gpkg")
+    write_polygons(folder / "plots.gpkg", count=5)
+    (folder / "points.csv").write_text(POINTS_CSV)
+    return str(folder)
+
+
+def report_sections(path):
+    """Returns the file section headings of a report, in order."""
+    return [
+        paragraph.text
+        for paragraph in Document(path).paragraphs
+        if paragraph.text.endswith(" Analysis:")
+    ]
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_process_dataset_reports_files_in_order(tmp_path, workers):
+    input_dir = write_dataset(tmp_path / "dataset")
+    output_dir = tmp_path / "output"
+
+    asyncio.run(
+        process_dataset(
+            "dataset",
+            input_dir,
+            str(output_dir),
+            renderer="static",
+            profile=True,
+            workers=workers,
+        )
+    )
+
+    assert report_sections(output_dir / "dataset_final_analysis_report.docx") == [
+        f"{geospatial_file} Analysis:"
+        for geospatial_file in find_geospatial_files(input_dir)
+    ]
+    assert (output_dir / "dataset_points.csv_plot.png").exists()
+    assert (output_dir / "dataset_sites.gpkg_profile.json").exists()
+
+
+@pytest.mark.parametrize("per_file_reports", [False, True])
+def test_merged_report_has_one_heading_and_every_plot(tmp_path, per_file_reports):
+    input_dir = write_dataset(tmp_path / "dataset")
+    output_dir = tmp_path / "output"
+
+    asyncio.run(
+        process_dataset(
+            "dataset",
+            input_dir,
+            str(output_dir),
+            renderer="static",
+            per_file_reports=per_file_reports,
+        )
+    )
+
+    merged = Document(output_dir / "dataset_final_analysis_report.docx")
+    titles = [p.text for p in merged.paragraphs if p.style.name == "Title"]
+    assert titles == ["dataset Analysis Report"]
+    assert len(merged.inline_shapes) == 3
+
+    reports = sorted(output_dir.glob("dataset_*.*_analysis_report.docx"))
+    if per_file_reports:
+        assert len(reports) == 3
+        assert [report_sections(report) for report in reports] == [
+            ["plots.gpkg Analysis:"],
+            ["points.csv Analysis:"],
+            ["sites.gpkg Analysis:"],
+        ]
+    else:
+        assert reports == []
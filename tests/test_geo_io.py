@@ -0,0 +1,82 @@
+import geopandas as gpd
+import pandas as pd
+import pytest
+
+from planning_data_analysis.geo_io import (
+    infer_csv_dtypes,
+    iter_feature_batches,
+    read_csv_info,
+    read_csv_layer,
+)
+
+SITES_CSV = """reference,code,units,approved,easting,northing
+S1,007,10,true,530000,180000
+S2,012,12,false,531000,181000
+S3,NULL,3,true,,
+"""
+
+
+def test_csv_keeps_leading_zeros_and_nullable_types(tmp_path):
+    (tmp_path / "sites.csv").write_text(SITES_CSV)
+
+    gdf = read_csv_layer(str(tmp_path / "sites.csv"))
+
+    assert gdf["code"].tolist()[:2] == ["007", "012"]
+    assert gdf["code"].isna().tolist() == [False, False, True]
+    assert str(gdf["units"].dtype) == "Int64"
+    assert str(gdf["approved"].dtype) == "boolean"
+    assert gdf["approved"].tolist() == [True, False, True]
+    assert gdf.crs.to_string() == "EPSG:27700"
+    assert gdf.geometry.isna().tolist() == [False, False, True]
+    assert gdf.geometry.iloc[0].coords[0] == (530000, 180000)
+
+
+@pytest.mark.parametrize(
+    "wkt, crs",
+    [("POINT (-0.12 51.5)", "EPSG:4326"), ("POINT (530000 180000)", None)],
+)
+def test_csv_wkt_column_is_parsed(tmp_path, wkt, crs):
+    (tmp_path / "sites.csv").write_text(f'reference,WKT\nS1,"{wkt}"\nS2,not wkt\n')
+
+    gdf = read_csv_layer(str(tmp_path / "sites.csv"))
+
+    assert list(gdf.columns) == ["reference", "geometry"]
+    assert gdf.geometry.iloc[0].wkt == wkt
+    assert gdf.geometry.iloc[1] is None
+    assert (gdf.crs.to_string() if gdf.crs else None) == crs
+
+
+def test_csv_without_geometry_columns_stays_a_dataframe(tmp_path):
+    (tmp_path / "table.csv").write_text("reference,units\nS1,3\n")
+
+    df = read_csv_layer(str(tmp_path / "table.csv"))
+
+    assert not isinstance(df, gpd.GeoDataFrame)
+    assert read_csv_info(str(tmp_path / "table.csv"))["geometry_type"] is None
+
+
+def test_text_after_the_sample_demotes_the_column(tmp_path, capsys):
+    rows = [f"S{index},{index}" for index in range(10000)] + ["S10000,unknown"]
+    (tmp_path / "sites.csv").write_text("reference,units\n" + "\n".join(rows) + "\n")
+    file_path = str(tmp_path / "sites.csv")
+    assert infer_csv_dtypes(file_path)["units"] == "Int64"
+
+    df = read_csv_layer(file_path)
+
+    assert df["units"].tolist()[-2:] == ["9999", "unknown"]
+    assert "do not fit" in capsys.readouterr().out
+
+
+def test_csv_batches_match_reading_the_whole_file(tmp_path):
+    (tmp_path / "sites.csv").write_text(SITES_CSV)
+    file_path = str(tmp_path / "sites.csv")
+
+    batches = list(iter_feature_batches(file_path, batch_size=2))
+
+    assert [len(batch) for batch in batches] == [2, 1]
+    pd.testing.assert_frame_equal(
+        pd.concat(batches, ignore_index=True), read_csv_layer(file_path)
+    )
+    info = read_csv_info(file_path, batch_size=2)
+    assert info["features"] == 3
+    assert info["total_bounds"] == (530000, 180000, 531000, 181000)
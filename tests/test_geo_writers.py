@@ -0,0 +1,78 @@
+import geopandas as gpd
+import pyarrow as pa
+import pytest
+import shapely
+
+from planning_data_analysis.geo_writers import (
+    LayerWriter,
+    count_saved_features,
+    write_layer,
+)
+
+META = {"geometry_name": "geometry", "geometry_type": "Point", "crs": "EPSG:4326"}
+
+
+def point_batch(start, count, **columns):
+    """A record batch of points like the ones parsed from a WFS page."""
+    points = [shapely.Point(index / 100, 51) for index in range(start, start + count)]
+    arrays = {name: pa.array(values) for name, values in columns.items()}
+    arrays["index"] = pa.array(range(start, start + count))
+    arrays["geometry"] = pa.array(shapely.to_wkb(points), pa.binary())
+    return pa.RecordBatch.from_pydict(arrays)
+
+
+def test_pages_with_different_columns_are_written_to_one_layer(tmp_path):
+    output_file = str(tmp_path / "layer.gpkg")
+
+    with LayerWriter(output_file, "layer") as writer:
+        writer.write([(META, point_batch(0, 2, name=["a", "b"]))])
+        writer.write([(META, point_batch(2, 2, extra=[1.5, 2.5]))])
+
+    gdf = gpd.read_file(output_file)
+    assert gdf["index"].tolist() == [0, 1, 2, 3]
+    assert gdf["name"].tolist()[:2] == ["a", "b"]
+    assert gdf["name"].isna().tolist() == [False, False, True, True]
+    assert "extra" not in gdf.columns
+    assert gdf.crs.to_string() == "EPSG:4326"
+    assert count_saved_features(output_file, "layer") == 4
+
+
+def test_failed_write_keeps_only_the_pages_before_it(tmp_path):
+    output_file = str(tmp_path / "layer.gpkg")
+
+    def failing_page():
+        yield META, point_batch(2, 2)
+        yield META, point_batch(4, 2)
+        raise ConnectionError("connection lost")
+
+    with LayerWriter(output_file, "layer") as writer:
+        writer.write([(META, point_batch(0, 2))])
+        # pyogrio raises its own error for a stream that fails
+        with pytest.raises(Exception, match="stream"):
+            writer.write(failing_page())
+
+    assert count_saved_features(output_file, "layer") == 2
+    assert gpd.read_file(output_file)["index"].tolist() == [0, 1]
+
+
+def test_geoparquet_is_reprojected_and_readable(tmp_path):
+    output_file = str(tmp_path / "layer.parquet")
+
+    written = write_layer(
+        [(META, point_batch(0, 3)), (META, point_batch(3, 3))],
+        output_file,
+        "layer",
+        target_crs="EPSG:27700",
+    )
+
+    gdf = gpd.read_parquet(output_file)
+    assert written == count_saved_features(output_file) == 6
+    assert gdf.crs.to_epsg() == 27700
+    assert gdf["index"].tolist() == list(range(6))
+    expected = gpd.GeoSeries([shapely.Point(0.03, 51)], crs="EPSG:4326").to_crs(27700)
+    assert gdf.geometry.iloc[3].equals_exact(expected.iloc[0], 1e-6)
+
+
+def test_missing_output_has_no_saved_features(tmp_path):
+    assert count_saved_features(str(tmp_path / "layer.gpkg"), "layer") == 0
+    assert count_saved_features(str(tmp_path / "layer.parquet")) == 0
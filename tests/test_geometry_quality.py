@@ -0,0 +1,91 @@
+import geopandas as gpd
+import numpy as np
+import pytest
+import shapely
+from shapely.geometry import LineString, Point, Polygon, box
+
+from planning_data_analysis.geometry_quality import check_geometry_quality
+
+
+def test_counts_each_kind_of_problem():
+    gdf = gpd.GeoDataFrame(
+        geometry=[
+            None,
+            Polygon(),
+            Polygon([(0, 0), (2, 2), (2, 0), (0, 2)]),
+            LineString([(0, 0), (1, 1), (1, 0), (0, 1)]),
+            box(10, 10, 11, 11),
+        ]
+    )
+
+    quality = check_geometry_quality(gdf)
+
+    assert quality["checked"] == 5
+    assert quality["missing"] == 1
+    assert quality["empty"] == 1
+    assert quality["invalid"] == 1
+    assert quality["self_intersecting"] == 2
+    assert quality["samples"]["self_intersecting"] == [2, 3]
+
+
+def test_overlaps_include_duplicates_and_containment_but_not_shared_edges():
+    gdf = gpd.GeoDataFrame(
+        geometry=[
+            box(0, 0, 2, 2),
+            box(0, 0, 2, 2),
+            box(0.5, 0.5, 1, 1),
+            box(2, 0, 3, 2),
+            box(10, 10, 11, 11),
+        ]
+    )
+
+    quality = check_geometry_quality(gdf)
+
+    assert quality["duplicates"] == 1
+    # 0/1 are duplicates, and both contain 2, while 3 only shares an edge with them
+    assert quality["overlapping_pairs"] == 3
+    assert {
+        tuple(sorted(pair)) for pair in quality["samples"]["overlapping_pairs"]
+    } <= {
+        (0, 1),
+        (0, 2),
+        (1, 2),
+    }
+
+
+@pytest.mark.parametrize("copies", [1, 2, 500])
+def test_coincident_points_are_counted_as_pairs(copies):
+    points = [Point(0, 0)] * copies + [Point(5, 5)] * 3 + [Point(9, 9)]
+    gdf = gpd.GeoDataFrame(geometry=points)
+
+    quality = check_geometry_quality(gdf)
+
+    assert quality["overlapping_pairs"] == copies * (copies - 1) // 2 + 3
+    samples = quality["samples"]["overlapping_pairs"]
+    assert 0 < len(samples) <= 5
+    assert all(points[a] == points[b] for a, b in samples)
+
+
+def test_layer_without_valid_geometries():
+    quality = check_geometry_quality(gpd.GeoDataFrame(geometry=[None, Point()]))
+
+    assert quality["overlapping_pairs"] == 0
+    assert quality["samples"]["overlapping_pairs"] == []
+
+
+def test_overlap_count_matches_comparing_every_pair():
+    rng = np.random.default_rng(0)
+    corners = rng.uniform(0, 100, (300, 2))
+    boxes = [box(x, y, x + rng.uniform(1, 8), y + 3) for x, y in corners]
+    # Repeat some boxes, so duplicates and overlaps between them are both counted
+    boxes += [boxes[index] for index in rng.integers(0, 300, 60)]
+    gdf = gpd.GeoDataFrame(geometry=boxes, index=np.arange(len(boxes)) * 10)
+
+    quality = check_geometry_quality(gdf)
+
+    geoms = np.asarray(boxes)
+    overlaps = shapely.relate_pattern(geoms[:, None], geoms[None, :], "T********")
+    assert quality["overlapping_pairs"] == np.triu(overlaps, k=1).sum()
+    # Sample pairs are reported by index label
+    for a, b in quality["samples"]["overlapping_pairs"]:
+        assert overlaps[a // 10, b // 10]
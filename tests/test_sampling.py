@@ -0,0 +1,86 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+
+from planning_data_analysis.sampling import GEOMETRY_TYPE, sample_batches
+
+
+def batches_of(df, batch_size):
+    return [
+        df.iloc[start : start + batch_size] for start in range(0, len(df), batch_size)
+    ]
+
+
+@pytest.fixture
+def layer():
+    """1000 rows with a common and a rare category."""
+    return pd.DataFrame(
+        {
+            "value": np.arange(1000),
+            "category": ["common"] * 995 + ["rare"] * 5,
+        }
+    )
+
+
+def test_reservoir_sample_is_the_same_whatever_the_batch_size(layer):
+    sample = sample_batches(batches_of(layer, 1000), sample_size=50)
+
+    for batch_size in (7, 100, 333):
+        pd.testing.assert_frame_equal(
+            sample_batches(batches_of(layer, batch_size), sample_size=50), sample
+        )
+    assert len(sample) == 50
+    assert sample.index.is_monotonic_increasing
+    assert sample["value"].tolist() == sample.index.tolist()
+    assert list(sample.columns) == ["value", "category"]
+    # Rows are drawn from across the layer, not just its start
+    assert sample.index.max() > 500
+
+
+def test_seed_changes_the_reservoir_sample(layer):
+    first = sample_batches(batches_of(layer, 100), sample_size=50, seed=1)
+    second = sample_batches(batches_of(layer, 100), sample_size=50, seed=2)
+
+    assert first.index.tolist() != second.index.tolist()
+
+
+def test_stratified_sample_shares_rows_between_strata(layer):
+    sample = sample_batches(
+        batches_of(layer, 100), sample_size=10, stratify_by="category"
+    )
+
+    assert sample["category"].value_counts().to_dict() == {"common": 5, "rare": 5}
+
+
+def test_stratified_sample_never_exceeds_its_size():
+    layer = pd.DataFrame({"value": np.arange(500), "category": np.arange(500) % 40})
+
+    sample = sample_batches(
+        batches_of(layer, 64), sample_size=10, stratify_by="category"
+    )
+
+    assert len(sample) <= 10
+    assert sample["category"].nunique() == len(sample)
+
+
+def test_geometry_type_strata_include_rare_types():
+    gdf = gpd.GeoDataFrame(
+        geometry=[shapely.Point(index, 0) for index in range(200)]
+        + [shapely.LineString([(0, 0), (1, 1)]), None]
+    )
+
+    sample = sample_batches(
+        batches_of(gdf, 50), sample_size=6, stratify_by=GEOMETRY_TYPE
+    )
+
+    assert sample.geom_type.fillna("None").value_counts().to_dict() == {
+        "Point": 2,
+        "LineString": 1,
+        "None": 1,
+    }
+
+
+def test_empty_layer_has_no_sample():
+    assert sample_batches([pd.DataFrame({"value": []})]) is None
@@ -0,0 +1,584 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import geopandas as gpd
+import pytest
+
+from planning_data_analysis import wfs_collect
+
+
+def grid_features(size, step):
+    """Points on a regular lon/lat grid, with string ids like a GeoServer layer."""
+    coordinates = [(x * step, y * step) for x in range(size) for y in range(size)]
+    return [
+        {
+            "type": "Feature",
+            "id": f"layer.{index}",
+            "properties": {"index": index},
+            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+        }
+        for index, (lon, lat) in enumerate(coordinates)
+    ]
+
+
+@pytest.fixture
+def fake_server(monkeypatch, tmp_path):
+    """
+    Serves GetFeature responses from a list of features, or from a list per layer in
+    `server["layers"]`, returning at most `server["cap"]` features per request
+    whatever count is asked for, without advertising the cap. The server ignores
+    startIndex with `server["ignore_start_index"]`, and the connection drops on the
+    request for startIndex `server["fail_at"]`. Requested output formats are
+    recorded in `server["output_formats"]`.
+    """
+    server = {
+        "features": [],
+        "layers": {},
+        "cap": None,
+        "ignore_start_index": False,
+        "fail_at": None,
+        "requests": 0,
+        "output_formats": set(),
+    }
+
+    def download_feature_page(
+        session,
+        wfs_url,
+        layer_name,
+        start_index=None,
+        count=None,
+        limiter=None,
+        bbox=None,
+        output_format=None,
+        srs_name=None,
+    ):
+        server["requests"] += 1
+        server["output_formats"].add(output_format)
+        if start_index is not None and start_index == server["fail_at"]:
+            raise ConnectionError(f"connection lost at {start_index}")
+        features = server["layers"].get(layer_name, server["features"])
+        if bbox is not None:
+            min_lon, min_lat, max_lon, max_lat = bbox
+            features = [
+                feature
+                for feature in features
+                if min_lon <= feature["geometry"]["coordinates"][0] <= max_lon
+                and min_lat <= feature["geometry"]["coordinates"][1] <= max_lat
+            ]
+        if not server["ignore_start_index"]:
+            features = features[start_index or 0 :]
+        for limit in (count, server["cap"]):
+            if limit is not None:
+                features = features[:limit]
+        path = tmp_path / f"page_{server['requests']}.json"
+        path.write_text(json.dumps({"type": "FeatureCollection", "features": features}))
+        return str(path), path.stat().st_size
+
+    monkeypatch.setattr(wfs_collect, "download_feature_page", download_feature_page)
+    return server
+
+
+def harvest_tile_ids(feature_count, tile_limit, bbox=(0, 0, 1, 1)):
+    harvest = {"saved": 0, "truncated": None}
+    stats = {"features": 0, "bytes": 0}
+    ids = []
+    for _, batch in wfs_collect.harvest_tiles(
+        None,
+        "http://wfs.example",
+        "layer",
+        bbox,
+        feature_count,
+        harvest,
+        stats,
+        tile_limit,
+        2,
+        None,
+        1000,
+        "application/json",
+    ):
+        ids.extend(batch.column("id").to_pylist())
+    return ids, harvest
+
+
+def saved_indexes(output_dir, layer_name="layer"):
+    """Returns the index attribute of every feature saved for a layer, in order."""
+    path = output_dir / f"{layer_name}.gpkg"
+    return gpd.read_file(path)["index"].tolist() if path.exists() else []
+
+
+def test_tiles_split_until_below_the_tile_limit(fake_server):
+    fake_server["features"] = grid_features(40, 0.025)
+
+    ids, harvest = harvest_tile_ids(1600, tile_limit=500)
+
+    assert sorted(ids) == sorted(f"layer.{index}" for index in range(1600))
+    assert harvest["saved"] == 1600
+
+
+@pytest.mark.parametrize("feature_count", [1600, 400])
+def test_tiles_capped_below_the_tile_limit_are_split(fake_server, feature_count):
+    size = int(feature_count**0.5)
+    fake_server["features"] = grid_features(size, 1 / size)
+    fake_server["cap"] = 100
+
+    ids, harvest = harvest_tile_ids(feature_count, tile_limit=1000)
+
+    assert len(ids) == len(set(ids)) == feature_count
+    assert harvest["saved"] == feature_count
+
+
+def test_tiles_warn_when_features_are_missing(fake_server, capsys):
+    fake_server["features"] = grid_features(10, 0.1)
+
+    ids, harvest = harvest_tile_ids(120, tile_limit=1000)
+
+    assert len(ids) == 100
+    assert "Saved 100 of 120 features of 'layer'" in capsys.readouterr().out
+
+
+def test_split_tile_covers_the_tile_without_gaps():
+    tiles = wfs_collect.split_tile((-2, 50, 2, 54), parts=2)
+
+    assert tiles == [(-2, 50, 0, 52), (0, 50, 2, 52), (-2, 52, 0, 54), (0, 52, 2, 54)]
+
+
+def test_features_on_tile_edges_are_saved_once(fake_server, tmp_path):
+    fake_server["features"] = grid_features(11, 0.1)
+
+    stats = wfs_collect.collect_wfs_data(
+        "http://wfs.example",
+        "layer",
+        str(tmp_path / "output"),
+        page_size=50,
+        feature_count=121,
+        metadata={"bbox": (0, 0, 1, 1)},
+        tiling="always",
+    )
+
+    assert sorted(saved_indexes(tmp_path / "output")) == list(range(121))
+    assert stats["tiled"]
+
+
+def test_layer_without_an_extent_is_paged_instead_of_tiled(
+    fake_server, tmp_path, capsys
+):
+    fake_server["features"] = grid_features(5, 0.2)
+
+    stats = wfs_collect.collect_wfs_data(
+        "http://wfs.example",
+        "layer",
+        str(tmp_path / "output"),
+        feature_count=25,
+        tiling="always",
+    )
+
+    assert "it cannot be tiled" in capsys.readouterr().out
+    assert "tiled" not in stats
+    assert saved_indexes(tmp_path / "output") == list(range(25))
+
+
+FORMATS = ["application/flatgeobuf", "application/json", "text/xml; subtype=gml/3.2"]
+
+
+def test_flatgeobuf_is_the_most_compact_format():
+    assert wfs_collect.choose_output_format(FORMATS) == (
+        "application/flatgeobuf",
+        ".fgb",
+    )
+
+
+def test_formats_without_ids_are_skipped_when_ids_are_needed():
+    assert wfs_collect.choose_output_format(FORMATS, need_ids=True) == (
+        "application/json",
+        ".json",
+    )
+    assert wfs_collect.choose_output_format(FORMATS[::2], need_ids=True) == (
+        "text/xml; subtype=gml/3.2",
+        ".gml",
+    )
+
+
+def test_pages_are_fetched_concurrently_and_written_in_order(fake_server, tmp_path):
+    fake_server["features"] = grid_features(30, 0.03)
+
+    stats = wfs_collect.collect_wfs_data(
+        "http://wfs.example",
+        "layer",
+        str(tmp_path / "output"),
+        page_size=64,
+        workers=4,
+        feature_count=900,
+        batch_size=10,
+        tiling="never",
+    )
+
+    assert saved_indexes(tmp_path / "output") == list(range(900))
+    assert stats["features"] == 900
+    assert "error" not in stats
+    assert fake_server["requests"] == 15
+
+
+def test_repeated_pages_are_not_written(fake_server, tmp_path, capsys):
+    fake_server["features"] = grid_features(10, 0.1)
+    fake_server["ignore_start_index"] = True
+
+    wfs_collect.collect_wfs_data(
+        "http://wfs.example",
+        "layer",
+        str(tmp_path / "output"),
+        page_size=40,
+        feature_count=100,
+        tiling="never",
+    )
+
+    assert saved_indexes(tmp_path / "output") == list(range(40))
+    assert "the server ignores startIndex" in capsys.readouterr().out
+
+
+def test_capped_pages_fall_back_to_tiles(fake_server, tmp_path):
+    fake_server["features"] = grid_features(20, 0.05)
+    fake_server["cap"] = 50
+
+    stats = wfs_collect.collect_wfs_data(
+        "http://wfs.example",
+        "layer",
+        str(tmp_path / "output"),
+        page_size=200,
+        feature_count=400,
+        metadata={"bbox": (0, 0, 1, 1)},
+    )
+
+    assert sorted(saved_indexes(tmp_path / "output")) == list(range(400))
+    assert stats["tiled"]
+
+
+def test_layers_are_harvested_largest_first(fake_server, monkeypatch, tmp_path):
+    fake_server["layers"] = {
+        "small": grid_features(5, 0.2),
+        "large": grid_features(20, 0.05),
+        "medium": grid_features(10, 0.1),
+    }
+    monkeypatch.setattr(
+        wfs_collect,
+        "get_wfs_layer_metadata",
+        lambda capabilities_url, cache_dir=None: {
+            name: {} for name in fake_server["layers"]
+        },
+    )
+    monkeypatch.setattr(
+        wfs_collect,
+        "get_feature_count",
+        lambda session, wfs_url, layer_name, limiter=None: len(
+            fake_server["layers"][layer_name]
+        ),
+    )
+
+    layer_stats = wfs_collect.collect_wfs_layers(
+        "http://wfs.example?request=GetCapabilities",
+        "http://wfs.example",
+        str(tmp_path),
+        page_size=30,
+        parallel_layers=2,
+        tiling="never",
+    )
+
+    assert [stats["layer"] for stats in layer_stats] == ["large", "medium", "small"]
+    for name, features in fake_server["layers"].items():
+        assert saved_indexes(tmp_path, name) == list(range(len(features)))
+
+
+def test_request_limiter_caps_requests_per_host_and_overall():
+    limiter = wfs_collect.RequestLimiter(max_requests=3, max_host_requests=2)
+    lock = threading.Lock()
+    in_flight = {"a": 0, "b": 0, "total": 0}
+    most = {"a": 0, "b": 0, "total": 0}
+
+    def request(host):
+        with limiter.limit(f"http://{host}.example/wfs"):
+            with lock:
+                for key in (host, "total"):
+                    in_flight[key] += 1
+                    most[key] = max(most[key], in_flight[key])
+            time.sleep(0.01)
+            with lock:
+                for key in (host, "total"):
+                    in_flight[key] -= 1
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(request, ["a", "b"] * 10))
+
+    assert most["a"] == most["b"] == 2
+    assert most["total"] == 3
+
+
+def write_page(path, features):
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": features}))
+    return str(path)
+
+
+def test_pages_are_parsed_in_batches(tmp_path):
+    page_file = write_page(tmp_path / "page.json", grid_features(5, 0.2))
+    page = {"received": 0, "previous_id": None}
+
+    batches = [
+        batch for _, batch in wfs_collect.iter_page_features(page_file, 10, page)
+    ]
+
+    assert [batch.num_rows for batch in batches] == [10, 10, 5]
+    assert page["received"] == 25
+    assert page["first_id"] == "layer.0"
+    assert "repeated" not in page
+
+
+def test_page_starting_with_the_previous_first_feature_is_skipped(tmp_path):
+    page_file = write_page(tmp_path / "page.json", grid_features(5, 0.2))
+    page = {"received": 0, "previous_id": "layer.0"}
+
+    assert list(wfs_collect.iter_page_features(page_file, 10, page)) == []
+    assert page["repeated"]
+    assert page["received"] == 0
+
+
+def test_integer_ids_are_kept_and_gdal_numbering_is_not(tmp_path):
+    features = grid_features(2, 1)
+    for index, feature in enumerate(features):
+        feature["id"] = 100 + index
+    page = {"received": 0}
+
+    ((meta, batch),) = wfs_collect.iter_page_features(
+        write_page(tmp_path / "ids.json", features), 10, page
+    )
+
+    assert page["first_id"] == 100
+    # The FID column GDAL reads the ids into is not written as an attribute
+    assert meta["fid_column"] not in batch.schema.names
+    for feature in features:
+        del feature["id"]
+    page = {"received": 0}
+    list(
+        wfs_collect.iter_page_features(
+            write_page(tmp_path / "no_ids.json", features), 10, page
+        )
+    )
+    assert page["first_id"] is None
+
+
+def harvest_with_checkpoint(output_dir, feature_count=500):
+    return wfs_collect.collect_wfs_data(
+        "http://wfs.example",
+        "layer",
+        str(output_dir),
+        page_size=100,
+        workers=1,
+        feature_count=feature_count,
+        checkpoint=wfs_collect.HarvestCheckpoint(str(output_dir)),
+        tiling="never",
+    )
+
+
+def test_interrupted_harvest_resumes_from_the_next_page(fake_server, tmp_path):
+    fake_server["features"] = grid_features(25, 0.04)[:500]
+    fake_server["fail_at"] = 300
+
+    stats = harvest_with_checkpoint(tmp_path)
+
+    assert "connection lost at 300" in stats["error"]
+    assert saved_indexes(tmp_path) == list(range(300))
+    progress = wfs_collect.HarvestCheckpoint(str(tmp_path)).get("layer")
+    assert (progress["features"], progress["next_start_index"]) == (300, 300)
+    assert not progress["complete"]
+
+    fake_server["fail_at"] = None
+    fake_server["requests"] = 0
+    stats = harvest_with_checkpoint(tmp_path)
+
+    assert "error" not in stats
+    assert fake_server["requests"] == 2
+    assert saved_indexes(tmp_path) == list(range(500))
+    assert wfs_collect.HarvestCheckpoint(str(tmp_path)).get("layer")["complete"]
+
+
+def test_complete_unchanged_layer_is_skipped(fake_server, tmp_path):
+    fake_server["features"] = grid_features(25, 0.04)[:500]
+    harvest_with_checkpoint(tmp_path)
+    fake_server["requests"] = 0
+
+    assert harvest_with_checkpoint(tmp_path)["skipped"]
+    assert fake_server["requests"] == 0
+
+
+def test_changed_layer_is_harvested_again(fake_server, tmp_path):
+    fake_server["features"] = grid_features(25, 0.04)[:500]
+    harvest_with_checkpoint(tmp_path)
+    fake_server["features"] = grid_features(25, 0.04)[:450]
+
+    stats = harvest_with_checkpoint(tmp_path, feature_count=450)
+
+    assert "skipped" not in stats
+    assert saved_indexes(tmp_path) == list(range(450))
+
+
+def test_output_out_of_step_with_the_checkpoint_starts_over(fake_server, tmp_path):
+    fake_server["features"] = grid_features(25, 0.04)[:500]
+    fake_server["fail_at"] = 300
+    harvest_with_checkpoint(tmp_path)
+    (tmp_path / "layer.gpkg").unlink()
+    fake_server["fail_at"] = None
+
+    harvest_with_checkpoint(tmp_path)
+
+    assert saved_indexes(tmp_path) == list(range(500))
+
+
+@pytest.mark.parametrize(
+    "feature_count, bbox, output_format",
+    [
+        (None, None, "application/flatgeobuf"),
+        (25, None, "application/json"),
+        (None, (0, 0, 1, 1), "application/json"),
+    ],
+)
+def test_flatgeobuf_is_only_requested_when_ids_are_not_needed(
+    fake_server, monkeypatch, tmp_path, feature_count, bbox, output_format
+):
+    fake_server["features"] = grid_features(5, 0.2)
+    monkeypatch.setattr(
+        wfs_collect,
+        "get_feature_count",
+        lambda session, wfs_url, layer_name, limiter=None: feature_count,
+    )
+
+    wfs_collect.collect_wfs_data(
+        "http://wfs.example",
+        "layer",
+        str(tmp_path / "output"),
+        metadata={"formats": FORMATS, "bbox": bbox},
+        tiling="never" if bbox is None else "auto",
+    )
+
+    assert fake_server["output_formats"] == {output_format}
+
+
+CAPABILITIES = """<?xml version="1.0"?>
+<wfs:WFS_Capabilities xmlns:wfs="http://www.opengis.net/wfs/2.0"
+    xmlns:ows="http://www.opengis.net/ows/1.1">
+  <ows:OperationsMetadata>
+    <ows:Operation name="DescribeFeatureType">
+      <ows:Parameter name="outputFormat">
+        <ows:AllowedValues><ows:Value>application/gml+xml</ows:Value></ows:AllowedValues>
+      </ows:Parameter>
+    </ows:Operation>
+    <ows:Operation name="GetFeature">
+      <ows:Parameter name="outputFormat">
+        <ows:AllowedValues>
+          <ows:Value>application/json</ows:Value>
+          <ows:Value>application/flatgeobuf</ows:Value>
+        </ows:AllowedValues>
+      </ows:Parameter>
+    </ows:Operation>
+    <ows:Constraint name="ImplementsResultPaging">
+      <ows:NoValues/><ows:DefaultValue>FALSE</ows:DefaultValue>
+    </ows:Constraint>
+    <ows:Constraint name="CountDefault">
+      <ows:NoValues/><ows:DefaultValue>5000</ows:DefaultValue>
+    </ows:Constraint>
+  </ows:OperationsMetadata>
+  <wfs:FeatureTypeList>
+    <wfs:FeatureType>
+      <wfs:Name>planning:sites</wfs:Name>
+      <wfs:DefaultCRS>urn:ogc:def:crs:EPSG::27700</wfs:DefaultCRS>
+      <ows:WGS84BoundingBox>
+        <ows:LowerCorner>-2.5 50.5</ows:LowerCorner>
+        <ows:UpperCorner>1.5 53.0</ows:UpperCorner>
+      </ows:WGS84BoundingBox>
+    </wfs:FeatureType>
+    <wfs:FeatureType>
+      <wfs:Name>planning:zones</wfs:Name>
+      <wfs:OutputFormats><wfs:Format>text/xml; subtype=gml/3.2</wfs:Format></wfs:OutputFormats>
+    </wfs:FeatureType>
+  </wfs:FeatureTypeList>
+</wfs:WFS_Capabilities>
+"""
+
+
+@pytest.fixture
+def capabilities_server(monkeypatch):
+    """
+    Serves `server["document"]` with an ETag, answering 304 Not Modified when the
+    request sends the current ETag back. Request headers are kept in
+    `server["headers"]`.
+    """
+    server = {"document": CAPABILITIES, "headers": []}
+
+    class Response:
+        def __init__(self, status_code, body=b""):
+            self.status_code = status_code
+            self.body = body
+            self.text = body.decode()
+            self.headers = {"ETag": f'"{hash(server["document"])}"'}
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            return False
+
+        def iter_content(self, chunk_size):
+            for start in range(0, len(self.body), chunk_size):
+                yield self.body[start : start + chunk_size]
+
+    def get(url, headers=None, timeout=None, stream=False):
+        server["headers"].append(headers)
+        etag = f'"{hash(server["document"])}"'
+        if (headers or {}).get("If-None-Match") == etag:
+            return Response(304)
+        return Response(200, server["document"].encode())
+
+    monkeypatch.setattr(wfs_collect.requests, "get", get)
+    return server
+
+
+def test_capabilities_give_each_layer_its_crs_extent_and_formats(
+    capabilities_server,
+):
+    metadata = wfs_collect.get_wfs_layer_metadata("http://wfs.example/capabilities")
+
+    sites, zones = metadata["planning:sites"], metadata["planning:zones"]
+    assert sites["crs"] == "EPSG:27700"
+    assert sites["bbox"] == (-2.5, 50.5, 1.5, 53.0)
+    assert sites["formats"] == ["application/json", "application/flatgeobuf"]
+    assert zones["crs"] is None
+    assert zones["bbox"] is None
+    assert zones["formats"] == ["text/xml; subtype=gml/3.2"]
+    for layer in (sites, zones):
+        assert layer["paging"] is False
+        assert layer["count_limit"] == 5000
+    assert sites["fingerprint"] != zones["fingerprint"]
+
+
+def test_cached_capabilities_are_revalidated(capabilities_server, tmp_path, capsys):
+    url = "http://wfs.example/capabilities"
+    first = wfs_collect.get_wfs_layer_metadata(url, cache_dir=str(tmp_path))
+
+    assert wfs_collect.get_wfs_layer_metadata(url, cache_dir=str(tmp_path)) == first
+    assert "using the cached copy" in capsys.readouterr().out
+    assert capabilities_server["headers"][1]["If-None-Match"]
+
+    capabilities_server["document"] = CAPABILITIES.replace("53.0", "54.0")
+    changed = wfs_collect.get_wfs_layer_metadata(url, cache_dir=str(tmp_path))
+
+    assert changed["planning:sites"]["bbox"] == (-2.5, 50.5, 1.5, 54.0)
+    assert (
+        changed["planning:sites"]["fingerprint"]
+        != first["planning:sites"]["fingerprint"]
+    )
+    assert changed["planning:zones"] == first["planning:zones"]
+
+
+def test_unparseable_capabilities_have_no_layers(capabilities_server, capsys):
+    capabilities_server["document"] = "<wfs:WFS_Capabilities"
+
+    assert wfs_collect.get_wfs_layer_metadata("http://wfs.example/capabilities") == {}
+    assert "Error parsing capabilities" in capsys.readouterr().out